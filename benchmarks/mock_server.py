@@ -0,0 +1,297 @@
+""" Local stand-in for the Mercury API, used by the benchmarks
+
+Serves a generated fleet from memory:
+
+    POST api/inventory/computers/query   GET api/inventory/computers/<id>
+    POST api/active/computers/query      GET api/active/computers/<id>
+    POST api/rpc/jobs                    GET api/rpc/jobs/<id>[/status|/tasks]
+
+Queries support {}, {"mercury_id": <id>}, {"mercury_id": {"$in": [...]}} and
+equality on other top level fields. Pagination follows offset_id and limit,
+projection is applied to top level fields. Jobs target every matching device
+and their tasks complete at evenly spaced times over job_duration seconds.
+
+    $ python benchmarks/mock_server.py --port 9005 --fleet-size 5000
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+INVENTORY = 'api/inventory/computers'
+ACTIVE = 'api/active/computers'
+JOBS = 'api/rpc/jobs'
+
+
+def generate_fleet(size, payload_size=0, seed=0):
+    """ Build inventory records
+
+    :param size: The number of devices
+    :param payload_size: Approximate bytes of filler added to each record,
+    standing in for dmi, pci and lldp data
+    :param seed: Seed for the generated values
+    :return: list of inventory dictionaries, sorted by _id
+    """
+    rng = random.Random(seed)
+    fleet = []
+    for i in range(size):
+        mercury_id = '01{:038x}'.format(rng.getrandbits(152))
+        fleet.append({
+            '_id': '{:024x}'.format(i),
+            'mercury_id': mercury_id,
+            'time_updated': 1500000000 + i,
+            'dmi': {
+                'sys_vendor': rng.choice(['HP', 'Dell Inc.', 'Supermicro']),
+                'product_name': rng.choice(['ProLiant DL360 Gen9',
+                                            'PowerEdge R630', 'X10DRi'])
+            },
+            'interfaces': [
+                {'devname': 'lo', 'address_info': [],
+                 'predictable_names': {}},
+                {'devname': 'eth0',
+                 'address_info': [{
+                     'addr': '10.{}.{}.{}'.format(i // 62500,
+                                                  (i // 250) % 250,
+                                                  i % 250 + 1),
+                     'netmask': '255.255.255.0'}],
+                 'predictable_names': {'predictable_id': 'eno1'}}
+            ],
+            'active': {'rpc_address': '10.255.{}.{}'.format(
+                (i // 250) % 250, i % 250 + 1)},
+            'filler': 'x' * payload_size
+        })
+    return fleet
+
+
+def matches(record, query):
+    for key, wanted in query.items():
+        value = record.get(key)
+        if isinstance(wanted, dict):
+            if '$in' in wanted and value not in wanted['$in']:
+                return False
+            if '$ne' in wanted and value == wanted['$ne']:
+                return False
+        elif value != wanted:
+            return False
+    return True
+
+
+def project(record, projection):
+    if not projection:
+        return record
+    fields = set(projection.split(',')) | {'_id'}
+    return dict((k, v) for k, v in record.items() if k in fields)
+
+
+class MockMercury(object):
+    def __init__(self, fleet_size=1000, payload_size=0, latency=0.0,
+                 job_duration=0.5, seed=0):
+        """
+
+        :param fleet_size: The number of devices in inventory
+        :param payload_size: Filler bytes per inventory record
+        :param latency: Seconds added to every response
+        :param job_duration: Seconds for every task of a job to complete
+        :param seed: Seed for the generated fleet
+        """
+        self.fleet = generate_fleet(fleet_size, payload_size, seed)
+        self.by_id = dict((r['mercury_id'], r) for r in self.fleet)
+        self.active = [{'_id': r['_id'], 'mercury_id': r['mercury_id'],
+                        'rpc_address': r['active']['rpc_address'],
+                        'capabilities': {'echo': {}, 'run': {}}}
+                       for r in self.fleet]
+        self.active_by_id = dict((r['mercury_id'], r) for r in self.active)
+        self.latency = latency
+        self.job_duration = job_duration
+        self.jobs = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = None
+
+    # Inventory and active
+
+    def query(self, records, body, params):
+        limit = int(params.get('limit', 100))
+        offset_id = params.get('offset_id')
+        query = body.get('query') or {}
+        items = []
+        for record in records:
+            if offset_id and record['_id'] <= offset_id:
+                continue
+            if matches(record, query):
+                items.append(project(record, params.get('projection')))
+                if len(items) >= limit:
+                    break
+        return 200, {'items': items, 'limit': limit}
+
+    # Jobs
+
+    def submit(self, body):
+        targets = [r['mercury_id'] for r in self.fleet
+                   if matches(r, body.get('query') or {})]
+        if not targets:
+            return 400, {'message': 'Query did not match any active targets'}
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        step = self.job_duration / len(targets)
+        self.jobs[job_id] = {
+            'job_id': job_id,
+            'instruction': body.get('instruction'),
+            'time_created': now,
+            'targets': targets,
+            'completes': [now + step * (i + 1) for i in range(len(targets))]
+        }
+        return 200, {'job_id': job_id, 'targets': len(targets)}
+
+    def job_status(self, job):
+        now = time.time()
+        done = sum(1 for t in job['completes'] if t <= now)
+        return {'job_id': job['job_id'],
+                'time_created': job['time_created'],
+                'task_count': len(job['targets']),
+                'has_failures': False,
+                'time_completed': (job['completes'][-1]
+                                   if done == len(job['targets']) else None)}
+
+    def job_tasks(self, job):
+        now = time.time()
+        tasks = []
+        for i, (mercury_id, completes) in enumerate(
+                zip(job['targets'], job['completes'])):
+            complete = completes <= now
+            tasks.append({
+                '_id': '{}-{}'.format(job['job_id'], i),
+                'task_id': '{}-{}'.format(job['job_id'], i),
+                'job_id': job['job_id'],
+                'mercury_id': mercury_id,
+                'action': 'run', 'args': [], 'kwargs': {},
+                'backend': 'mock', 'host': '127.0.0.1', 'port': 9003,
+                'method': 'run', 'progress': 1 if complete else 0,
+                'status': 'SUCCESS' if complete else 'DISPATCHED',
+                'time_started': job['time_created'],
+                'time_updated': completes if complete else job['time_created'],
+                'time_completed': completes if complete else None,
+                'timeout': 0, 'ttl_time_completed': None,
+                'message': {'returncode': 0, 'stdout': 'ok\n',
+                            'stderr': ''} if complete else None,
+                'traceback': None
+            })
+        return {'tasks': tasks}
+
+    def route(self, method, path, params, body):
+        path = path.strip('/')
+        for service, records, by_id in (
+                (INVENTORY, self.fleet, self.by_id),
+                (ACTIVE, self.active, self.active_by_id)):
+            if path == service + '/query' and method == 'POST':
+                return self.query(records, body, params)
+            if path.startswith(service + '/') and method == 'GET':
+                record = by_id.get(path[len(service) + 1:])
+                if record:
+                    return 200, project(record, params.get('projection'))
+                return 404, {'message': 'Not found'}
+
+        if path == JOBS and method == 'POST':
+            return self.submit(body)
+        if path.startswith(JOBS + '/') and method == 'GET':
+            parts = path[len(JOBS) + 1:].split('/')
+            job = self.jobs.get(parts[0])
+            if not job:
+                return 404, {'message': 'Not found'}
+            if len(parts) == 1:
+                return 200, dict(self.job_status(job),
+                                 instruction=job['instruction'])
+            if parts[1] == 'status':
+                return 200, self.job_status(job)
+            if parts[1] == 'tasks':
+                return 200, self.job_tasks(job)
+        return 404, {'message': 'Not found'}
+
+    def handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def _handle(self, method):
+                url = urlparse(self.path)
+                params = dict((k, v[0]) for k, v in
+                              parse_qs(url.query).items())
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else {}
+                with mock._lock:
+                    mock.requests += 1
+                if mock.latency:
+                    time.sleep(mock.latency)
+                code, data = mock.route(method, url.path, params, body)
+                payload = json.dumps(data).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self, host='127.0.0.1', port=0):
+        """ Serve from a background thread
+
+        :return: The base url of the server
+        """
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self.url
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9005)
+    parser.add_argument('--fleet-size', type=int, default=1000)
+    parser.add_argument('--payload-size', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--job-duration', type=float, default=0.5)
+    namespace = parser.parse_args()
+
+    mock = MockMercury(fleet_size=namespace.fleet_size,
+                       payload_size=namespace.payload_size,
+                       latency=namespace.latency,
+                       job_duration=namespace.job_duration)
+    mock.server = ThreadingHTTPServer((namespace.host, namespace.port),
+                                      mock.handler())
+    print('Serving {} devices on {}'.format(namespace.fleet_size, mock.url))
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
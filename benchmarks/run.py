@@ -0,0 +1,219 @@
+""" Run the SDK benchmarks against a local mock Mercury API
+
+Each scenario is repeated --runs times after a warm up run. Latency
+percentiles and throughput are reported per scenario, and with --baseline
+the results are compared to a previous --save, exiting non zero if a
+scenario's median or p95 regressed by more than --tolerance.
+
+    $ python benchmarks/run.py --save baseline.json
+    $ python benchmarks/run.py --baseline baseline.json
+    $ python benchmarks/run.py -s pagination -s tasks_decode --fleet-size 10000
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+from collections import OrderedDict
+
+from mock_server import MockMercury
+
+SCENARIOS = OrderedDict()
+COMPARED = ('p50', 'p95')
+
+
+def scenario(f):
+    SCENARIOS[f.__name__] = f
+    return f
+
+
+def percentile(ordered, q):
+    """ Nearest rank percentile of a sorted list """
+    if not ordered:
+        return None
+    rank = max(0, min(len(ordered) - 1, int(round(q * len(ordered))) - 1))
+    return ordered[rank]
+
+
+@scenario
+def pagination(mock, runs):
+    """ iter_query over the whole fleet, the items are inventory records """
+    from mercury_sdk.http.inventory import InventoryComputers
+
+    with InventoryComputers(mock.url) as client:
+        for _ in range(runs):
+            started = time.perf_counter()
+            count = sum(1 for _ in client.iter_query(
+                {}, projection=['mercury_id', 'interfaces', 'dmi']))
+            yield time.perf_counter() - started, count
+
+
+@scenario
+def submit_join(mock, runs):
+    """ Start a job on 100 devices and join it, the items are jobs. Tasks
+    complete over 100ms.
+    """
+    from mercury_sdk.http.rpc import JobInterfaceBase
+    from mercury_sdk.rpc.job import SimpleJob
+
+    query = {'mercury_id': {'$in': [r['mercury_id']
+                                    for r in mock.fleet[:100]]}}
+    mock.job_duration = .1
+    with JobInterfaceBase(mock.url) as client:
+        for _ in range(runs):
+            started = time.perf_counter()
+            job = SimpleJob(client, query, 'echo', job_args=['benchmark'])
+            job.start()
+            job.join(poll_interval=.01, max_interval=.05)
+            yield time.perf_counter() - started, 1
+
+
+@scenario
+def tasks_decode(mock, runs):
+    """ Fetch and index the tasks of a job which targeted the whole fleet,
+    the items are tasks
+    """
+    from mercury_sdk.http.rpc import JobInterfaceBase
+    from mercury_sdk.rpc.job import SimpleJob
+    from mercury_sdk.rpc.task import TaskSet
+
+    mock.job_duration = 0
+    with JobInterfaceBase(mock.url) as client:
+        job = SimpleJob(client, {}, 'echo')
+        job.start()
+        job.join(poll_interval=.01)
+        for _ in range(runs):
+            started = time.perf_counter()
+            task_set = TaskSet.from_response(client.tasks(job.job_id))
+            task_set.filter(returncode=0).column('mercury_id')
+            yield time.perf_counter() - started, len(task_set)
+
+
+@scenario
+def ansible_build(mock, runs):
+    """ Build the ansible inventory of the whole fleet, the items are hosts
+    """
+    from mercury_sdk.http.inventory import InventoryComputers
+    from mercury_sdk.mcli.ansible.inventory import build_ansible_inventory
+
+    with InventoryComputers(mock.url) as client:
+        for _ in range(runs):
+            started = time.perf_counter()
+            inventory = build_ansible_inventory(client, '{}')
+            yield time.perf_counter() - started, inventory.count('\n') + 1
+
+
+@scenario
+def cli_startup(mock, runs):
+    """ mcli --version in a fresh interpreter """
+    from startup import run_mcli
+
+    for _ in range(runs):
+        elapsed, _ = run_mcli(['--version'])
+        yield elapsed, 1
+
+
+def run_scenario(name, mock, runs):
+    # The first run warms connections, caches and imports
+    samples = list(SCENARIOS[name](mock, runs + 1))[1:]
+    durations = sorted(elapsed for elapsed, _ in samples)
+    items = sum(count for _, count in samples)
+    total = sum(durations)
+    return OrderedDict([
+        ('runs', len(durations)),
+        ('mean', total / len(durations)),
+        ('p50', percentile(durations, .5)),
+        ('p90', percentile(durations, .9)),
+        ('p95', percentile(durations, .95)),
+        ('p99', percentile(durations, .99)),
+        ('max', durations[-1]),
+        ('items_per_second', items / total if total else None)
+    ])
+
+
+def compare(results, baseline, tolerance):
+    """ Print the change of each compared percentile
+
+    :return: A list of (scenario, percentile) which regressed
+    """
+    regressions = []
+    print('\nCompared to baseline (tolerance {:.0%}):'.format(tolerance))
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            print('  {:<14} no baseline'.format(name))
+            continue
+        changes = []
+        for key in COMPARED:
+            change = (result[key] - previous[key]) / previous[key]
+            flag = ''
+            if change > tolerance:
+                flag = ' REGRESSION'
+                regressions.append((name, key))
+            changes.append('{} {:+.1%}{}'.format(key, change, flag))
+        print('  {:<14} {}'.format(name, ', '.join(changes)))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-s', '--scenario', action='append',
+                        choices=list(SCENARIOS),
+                        help='Run only this scenario, may be repeated')
+    parser.add_argument('-n', '--runs', type=int, default=10)
+    parser.add_argument('--fleet-size', type=int, default=2000)
+    parser.add_argument('--payload-size', type=int, default=512,
+                        help='Filler bytes per inventory record')
+    parser.add_argument('--latency', type=float, default=0.001,
+                        help='Seconds added to every response')
+    parser.add_argument('--baseline', help='Compare to a saved result')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed slow down before a scenario is '
+                             'reported as a regression')
+    parser.add_argument('--save', help='Write the results to this file')
+    namespace = parser.parse_args()
+
+    mock = MockMercury(fleet_size=namespace.fleet_size,
+                       payload_size=namespace.payload_size,
+                       latency=namespace.latency)
+    mock.start()
+
+    print('fleet={} payload={}B latency={}ms runs={} python={}'.format(
+        namespace.fleet_size, namespace.payload_size,
+        namespace.latency * 1000, namespace.runs,
+        platform.python_version()))
+    print('{:<14} {:>9} {:>9} {:>9} {:>9} {:>12}'.format(
+        'scenario', 'p50', 'p95', 'p99', 'max', 'items/s'))
+
+    results = OrderedDict()
+    try:
+        for name in namespace.scenario or SCENARIOS:
+            result = results[name] = run_scenario(name, mock, namespace.runs)
+            print('{:<14} {:>7.1f}ms {:>7.1f}ms {:>7.1f}ms {:>7.1f}ms '
+                  '{:>12.1f}'.format(name, result['p50'] * 1000,
+                                     result['p95'] * 1000,
+                                     result['p99'] * 1000,
+                                     result['max'] * 1000,
+                                     result['items_per_second']))
+    finally:
+        mock.stop()
+
+    if namespace.save:
+        with open(namespace.save, 'w') as fp:
+            json.dump({'parameters': {
+                'fleet_size': namespace.fleet_size,
+                'payload_size': namespace.payload_size,
+                'latency': namespace.latency,
+                'runs': namespace.runs},
+                'results': results}, fp, indent=2)
+
+    if namespace.baseline:
+        with open(namespace.baseline) as fp:
+            baseline = json.load(fp)
+        if compare(results, baseline, namespace.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
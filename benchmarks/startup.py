@@ -0,0 +1,64 @@
+""" Measure mcli start up time
+
+Runs `mcli --version` (or any mcli arguments) in fresh interpreters and
+reports the wall time distribution, then lists the slowest imports reported
+by python -X importtime.
+
+    $ python benchmarks/startup.py
+    $ python benchmarks/startup.py -n 50 -- --no-auth rpc job --help
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+ENTRY_POINT = 'from mercury_sdk.mcli.main import main; main()'
+
+
+def run_mcli(args, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', ENTRY_POINT] + list(args)
+    started = time.perf_counter()
+    process = subprocess.run(command, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, universal_newlines=True)
+    return time.perf_counter() - started, process.stderr
+
+
+def slowest_imports(stderr, count):
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        imports.append((int(cumulative_us), name.rstrip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--runs', type=int, default=20)
+    parser.add_argument('--top', type=int, default=15,
+                        help='The number of imports to list')
+    parser.add_argument('mcli_args', nargs='*', default=['--version'])
+    namespace = parser.parse_args()
+
+    # Warm the file system cache
+    run_mcli(namespace.mcli_args)
+
+    timings = sorted(run_mcli(namespace.mcli_args)[0]
+                     for _ in range(namespace.runs))
+    print('mcli {}: runs={} min={:.1f}ms median={:.1f}ms max={:.1f}ms'.format(
+        ' '.join(namespace.mcli_args), namespace.runs, timings[0] * 1000,
+        statistics.median(timings) * 1000, timings[-1] * 1000))
+
+    _, stderr = run_mcli(namespace.mcli_args, importtime=True)
+    print('\nSlowest imports (cumulative):')
+    for cumulative_us, name in slowest_imports(stderr, namespace.top):
+        print('{:>10.1f}ms {}'.format(cumulative_us / 1000, name))
+
+
+if __name__ == '__main__':
+    main()
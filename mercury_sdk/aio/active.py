@@ -0,0 +1,6 @@
+from mercury_sdk.aio.query import AsyncQueryInterfaceBase
+from mercury_sdk.http.active import ActiveComputers
+
+
+class AsyncActiveComputers(AsyncQueryInterfaceBase):
+    SERVICE_URI = ActiveComputers.SERVICE_URI
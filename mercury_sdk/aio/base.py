@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from mercury_sdk.http.base import (DEFAULT_BACKOFF_FACTOR, DEFAULT_POOL_SIZE,
+                                   DEFAULT_RETRIES, DEFAULT_TIMEOUT,
+                                   RETRY_STATUS_CODES, HTTPClientBase,
+                                   RequestTimeout, error_response)
+from mercury_sdk.metrics import hooks
+
+log = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = ('get', 'head', 'options')
+
+
+def require_aiohttp():
+    if aiohttp is None:
+        raise RuntimeError('The asyncio client requires aiohttp, install '
+                           'mercury-sdk[aio]')
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE, verify_ssl=True):
+    """ Create an aiohttp session backed by a keep-alive connection pool
+
+    :param pool_size: The maximum number of simultaneous connections
+    :param verify_ssl: Verify server certificates
+    :return: aiohttp.ClientSession
+    """
+    require_aiohttp()
+    connector = aiohttp.TCPConnector(limit=pool_size,
+                                     ssl=None if verify_ssl else False)
+    return aiohttp.ClientSession(connector=connector)
+
+
+def client_timeout(timeout):
+    """ Translate a requests style timeout to an aiohttp.ClientTimeout
+
+    :param timeout: A number, a (connect, read) tuple or None
+    :return: aiohttp.ClientTimeout
+    """
+    if isinstance(timeout, (tuple, list)):
+        connect, read = timeout
+    else:
+        connect = read = timeout
+    return aiohttp.ClientTimeout(total=None, connect=connect, sock_read=read)
+
+
+class AsyncInterfaceBase(HTTPClientBase):
+    """ asyncio twin of mercury_sdk.http.base.InterfaceBase """
+
+    def __init__(self, target, max_items=100, auth_token=None,
+                 additional_headers=None, verify_ssl=True, serializer=None,
+                 session=None, pool_size=DEFAULT_POOL_SIZE,
+                 retries=DEFAULT_RETRIES,
+                 backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 timeout=DEFAULT_TIMEOUT, hooks=None):
+        """ Async client constructor
+
+        See HTTPClientBase for the common arguments.
+
+        :param session: An aiohttp.ClientSession to share between clients.
+        When omitted, the client creates and owns its own session the first
+        time a request is made from within the running event loop.
+        :param pool_size: Connection pool size of an owned session
+        :param retries: Retries for connection errors and 502/503/504
+        :param backoff_factor: Backoff factor applied between retries
+        :param timeout: The default timeout of each request, in seconds, or a
+        (connect, read) tuple. None waits forever.
+        :raises: RuntimeError if aiohttp is not installed
+        """
+        require_aiohttp()
+        super(AsyncInterfaceBase, self).__init__(
+            target, max_items=max_items, auth_token=auth_token,
+            additional_headers=additional_headers, verify_ssl=verify_ssl,
+            serializer=serializer, hooks=hooks)
+
+        self._owns_session = session is None
+        self._session = session
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = create_session(self.pool_size, self.verify_ssl)
+        return self._session
+
+    async def close(self):
+        """ Release pooled connections, if the session belongs to us """
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _should_retry(self, method, attempt, status=None):
+        if attempt >= self.retries:
+            return False
+        if status is None:
+            return True
+        return status in RETRY_STATUS_CODES and method in IDEMPOTENT_METHODS
+
+    async def _backoff(self, attempt):
+        await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    async def _request(self,
+                       method,
+                       item='',
+                       data=None,
+                       params=None,
+                       extra_headers=None,
+                       timeout=None):
+        """
+
+        :param method:
+        :param item:
+        :param data:
+        :param params:
+        :param extra_headers:
+        :param timeout: Overrides the client timeout for this request
+        :raises: RequestTimeout if the request timed out
+        :return: The decoded response, or the check_error structure
+        """
+
+        if data is not None:
+            data = self.serializer.dumps(data)
+
+        headers = self.get_per_request_headers(extra_headers)
+        self.log_request(method, item, params, data, headers)
+
+        _timeout = client_timeout(self.timeout if timeout is None
+                                  else timeout)
+        url = self.join_endpoint(item)
+
+        instrumented = hooks.active(self.hooks)
+        if instrumented:
+            self.emit('request_start', method=method, url=url)
+            started = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                async with self.session.request(method,
+                                                url,
+                                                params=params,
+                                                data=data,
+                                                headers=headers,
+                                                timeout=_timeout) as r:
+                    body = await r.read()
+                    status = r.status
+            except asyncio.TimeoutError as e:
+                # The server may have acted on a request which timed out
+                # reading the response, only idempotent requests are retried
+                if method not in IDEMPOTENT_METHODS or \
+                        not self._should_retry(method, attempt):
+                    if instrumented:
+                        self._emit_request_end(method, url, started, data,
+                                               retries=attempt,
+                                               error='RequestTimeout')
+                    raise RequestTimeout(error_response(
+                        408, str(e) or 'Request timed out'))
+                log.warning('Request timed out, retrying request')
+            except aiohttp.ClientConnectionError as e:
+                # Nothing was sent when the connection could not be made,
+                # other connection errors, ie. a server disconnect, may
+                # follow a request which the server acted on
+                if not isinstance(e, aiohttp.ClientConnectorError) and \
+                        method not in IDEMPOTENT_METHODS or \
+                        not self._should_retry(method, attempt):
+                    if instrumented:
+                        self._emit_request_end(method, url, started, data,
+                                               retries=attempt,
+                                               error=e.__class__.__name__)
+                    raise
+                log.warning('Connection error, retrying request')
+            else:
+                if status < 400:
+                    break
+                if not self._should_retry(method, attempt, status):
+                    break
+                log.warning('Received %s, retrying request', status)
+            await self._backoff(attempt)
+            attempt += 1
+
+        if instrumented:
+            self._emit_request_end(method, url, started, data, status=status,
+                                   bytes_in=len(body), retries=attempt)
+
+        if status >= 400:
+            log.error('Encountered an HTTP exception: %s', status)
+            try:
+                error_data = self.serializer.loads(body)
+            except ValueError:
+                error_data = body.decode('utf-8', 'replace')
+            return error_response(status, error_data)
+
+        return self.decode_body(body, url=url)
+
+    async def get(self, item='', params=None, extra_headers=None,
+                  timeout=None):
+        """
+
+        :param item:
+        :param params:
+        :param extra_headers:
+        :param timeout:
+        :return:
+        """
+        return await self._request('get', item, params=params,
+                                   extra_headers=extra_headers,
+                                   timeout=timeout)
+
+    async def post(self, item='', data=None, params=None, extra_headers=None,
+                   timeout=None):
+        """
+
+        :param item:
+        :param data:
+        :param params:
+        :param extra_headers:
+        :param timeout:
+        :return:
+        """
+        return await self._request('post', item, data=data, params=params,
+                                   extra_headers=extra_headers,
+                                   timeout=timeout)
@@ -0,0 +1,6 @@
+from mercury_sdk.aio.query import AsyncQueryInterfaceBase
+from mercury_sdk.http.inventory import InventoryComputers
+
+
+class AsyncInventoryComputers(AsyncQueryInterfaceBase):
+    SERVICE_URI = InventoryComputers.SERVICE_URI
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import time
+
+from mercury_sdk.http.base import RequestTimeout
+from mercury_sdk.rpc.backoff import Backoff
+from mercury_sdk.rpc.task import TaskSet
+from mercury_sdk.rpc.job import (Job, JobCancelled, JobTimeout, Preprocessor,
+                                 RPCException, SimpleJob, SubmissionError,
+                                 error_message)
+
+log = logging.getLogger(__name__)
+
+
+class AsyncJob(Job):
+    """ Job driven by an AsyncJobInterfaceBase client
+
+    raw, status, tasks, task_set and is_running return awaitables, ie.
+    `await job.status`, and iter_tasks is an asynchronous generator,
+    `async for task in job.iter_tasks()`
+    """
+
+    async def start(self, timeout=None):
+        """ Start the job
+
+        :param timeout: Overrides the client's request timeout
+        """
+        submitted = time.perf_counter()
+        try:
+            if timeout is None:
+                r = await self.rpc_client.post(data=self.payload)
+            else:
+                r = await self.rpc_client.post(data=self.payload,
+                                               timeout=timeout)
+            self._set_started(r)
+        except Exception as e:
+            self._emit_submit(submitted, e)
+            raise
+        self._emit_submit(submitted)
+
+    @property
+    def task_set(self):
+        """ Awaitable, get the jobs tasks as a TaskSet """
+        return self._task_set()
+
+    async def _task_set(self):
+        if self.started:
+            r = await self.tasks
+            if r.get('error'):
+                raise RPCException(error_message(r))
+            return TaskSet.from_response(r)
+
+    @property
+    def is_running(self):
+        """ Awaitable, check if the job is running or not """
+        return self._is_running()
+
+    async def _is_running(self):
+        return self.started and not (await self.status)['time_completed']
+
+    async def join(self, timeout=None, poll_interval=2, max_interval=None,
+                   callback=None, raise_timeout=False):
+        """ Wait for the job to complete, see Job.join
+
+        Besides Job.cancel, which is checked between polls, cancelling the
+        awaiting task stops the join immediately.
+
+        :param timeout: Give up after this many seconds
+        :param poll_interval: The initial interval between status checks
+        :param max_interval: The longest interval between status checks
+        :param callback: Called with the final status when the job completes
+        :param raise_timeout: Raise JobTimeout rather than returning None
+        when the timeout is reached
+        :raises: RPCException if the status cannot be fetched
+        :raises: JobCancelled if cancel is called
+        :return: The status structure, or None if the timeout was reached
+        """
+        if self.started:
+            backoff = Backoff.for_timeout(poll_interval, timeout=timeout,
+                                          maximum=max_interval)
+            waiting_since = time.time()
+            polls = 0
+            status = None
+            while True:
+                if self.cancelled:
+                    raise JobCancelled(self.job_id)
+                polls += 1
+                try:
+                    status = await self._fetch(self.rpc_client.status,
+                                               backoff.deadline)
+                except RequestTimeout:
+                    if not backoff.expired:
+                        raise
+                else:
+                    if status.get('error'):
+                        raise RPCException(error_message(status))
+                    if status['time_completed']:
+                        self._emit_complete(polls, waiting_since)
+                        if callback:
+                            callback(status)
+                        return status
+                if backoff.expired:
+                    if raise_timeout:
+                        raise JobTimeout(self.job_id, timeout, status)
+                    return None
+                await asyncio.sleep(backoff.next())
+
+    async def iter_tasks(self, timeout=None, poll_interval=1,
+                         max_interval=None, raise_timeout=False):
+        """ Asynchronous generator yielding each task once, as soon as it
+        completes, see Job.iter_tasks
+
+        :param timeout: Give up after this many seconds
+        :param poll_interval: The initial interval between polls
+        :param max_interval: The longest interval between polls
+        :param raise_timeout: Raise JobTimeout rather than stopping when the
+        timeout is reached
+        :raises: RPCException if the tasks or status cannot be fetched
+        :raises: JobCancelled if cancel is called
+        """
+        if not self.started:
+            return
+
+        backoff = Backoff.for_timeout(poll_interval, timeout=timeout,
+                                      maximum=max_interval)
+        completed = set()
+        last_updated = {}
+        waiting_since = time.time()
+        polls = 0
+        while True:
+            if self.cancelled:
+                raise JobCancelled(self.job_id)
+            polls += 1
+            try:
+                r = await self._fetch(self.rpc_client.tasks, backoff.deadline)
+            except RequestTimeout:
+                if not backoff.expired:
+                    raise
+                r = {'tasks': []}
+            if r.get('error'):
+                raise RPCException(error_message(r))
+
+            finished, outstanding = self._new_completions(
+                r['tasks'], completed, last_updated)
+            for task in finished:
+                yield task
+
+            if len(completed) >= self.targets:
+                self._emit_complete(polls, waiting_since)
+                return
+            # Every known task is done, defer to the job for the rest
+            if not outstanding:
+                try:
+                    status = await self._fetch(self.rpc_client.status,
+                                               backoff.deadline)
+                except RequestTimeout:
+                    if not backoff.expired:
+                        raise
+                else:
+                    if status.get('error'):
+                        raise RPCException(error_message(status))
+                    if status['time_completed']:
+                        self._emit_complete(polls, waiting_since)
+                        return
+            if backoff.expired:
+                if raise_timeout:
+                    raise JobTimeout(self.job_id, timeout)
+                return
+            if finished:
+                backoff.reset()
+            await asyncio.sleep(backoff.next())
+
+    def join_async(self, timeout=None, poll_interval=2, max_interval=None,
+                   callback=None, raise_timeout=False):
+        """ Schedule join on the running event loop
+
+        :return: asyncio.Task which resolves to the join result
+        """
+        return asyncio.ensure_future(self.join(timeout=timeout,
+                                               poll_interval=poll_interval,
+                                               max_interval=max_interval,
+                                               callback=callback,
+                                               raise_timeout=raise_timeout))
+
+
+async def start_many(jobs, concurrency=8, timeout=None):
+    """ Start many AsyncJobs, at most concurrency submissions in flight, see
+    mercury_sdk.rpc.job.start_many
+
+    :raises: SubmissionError if any job could not be started, after every
+    job has been attempted
+    :return: The jobs, in the order given
+    """
+    jobs = list(jobs)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def start(job):
+        if job.started:
+            return
+        async with semaphore:
+            try:
+                await job.start(timeout=timeout)
+            except Exception as e:
+                log.debug('Could not start job: %s', e)
+                return e
+
+    errors = await asyncio.gather(*[start(job) for job in jobs])
+    failures = [(job, error) for job, error in zip(jobs, errors)
+                if error is not None]
+    if failures:
+        raise SubmissionError(jobs, failures)
+    return jobs
+
+
+class AsyncSimpleJob(AsyncJob, SimpleJob):
+    """ Creates an instruction in the standard form """
+
+
+class AsyncPreprocessor(AsyncJob, Preprocessor):
+    pass
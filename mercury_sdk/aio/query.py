@@ -0,0 +1,57 @@
+from mercury_sdk.aio.base import AsyncInterfaceBase
+from mercury_sdk.http.query import QueryInterfaceBase
+
+
+class AsyncQueryInterfaceBase(AsyncInterfaceBase):
+    """ asyncio twin of mercury_sdk.http.query.QueryInterfaceBase """
+
+    set_projection = staticmethod(QueryInterfaceBase.set_projection)
+    strip_empty = staticmethod(QueryInterfaceBase.strip_empty)
+
+    async def get(self, mercury_id=None, projection=None, params=None,
+                  extra_headers=None, timeout=None):
+        """
+        Override for get that add projection argument
+        :param mercury_id:
+        :param projection:
+        :param params:
+        :param extra_headers:
+        :param timeout:
+        :return:
+        """
+
+        params = params or {}
+
+        if projection:
+            self.set_projection(params, projection)
+        return await super(AsyncQueryInterfaceBase, self).get(
+            item=mercury_id, params=params, extra_headers=extra_headers,
+            timeout=timeout)
+
+    async def query(self, query, item='/query', projection=None, params=None,
+                    extra_headers=None, strip_empty_elements=False,
+                    timeout=None):
+        """
+
+        :param query:
+        :param item:
+        :param projection:
+        :param params:
+        :param extra_headers:
+        :param strip_empty_elements:
+        :param timeout:
+        :return:
+        """
+
+        params = params or {}
+
+        if projection:
+            self.set_projection(params, projection)
+
+        data = await self.post(item, data={'query': query}, params=params,
+                               extra_headers=extra_headers, timeout=timeout)
+
+        if strip_empty_elements and not data.get('error'):
+            self.strip_empty(data['items'])
+
+        return data
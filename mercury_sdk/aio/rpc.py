@@ -0,0 +1,67 @@
+from mercury_sdk.aio.base import AsyncInterfaceBase
+from mercury_sdk.http.rpc import JobInterfaceBase
+
+
+class AsyncJobInterfaceBase(AsyncInterfaceBase):
+    """ asyncio twin of mercury_sdk.http.rpc.JobInterfaceBase """
+    SERVICE_URI = JobInterfaceBase.SERVICE_URI
+
+    async def get(self, job_id='', params=None, extra_headers=None,
+                  timeout=None):
+        """
+
+        :param job_id:
+        :param params:
+        :param extra_headers:
+        :param timeout:
+        :return:
+        """
+        return await super(AsyncJobInterfaceBase, self).get(
+            item=job_id, params=params, extra_headers=extra_headers,
+            timeout=timeout)
+
+    async def status(self, job_id, timeout=None):
+        """
+
+        :param job_id:
+        :param timeout:
+        :return:
+        """
+        return await self.get('/{}/status'.format(job_id), timeout=timeout)
+
+    async def tasks(self, job_id, timeout=None):
+        """
+
+        :param job_id:
+        :param timeout:
+        :return:
+        """
+        return await self.get('/{}/tasks'.format(job_id), timeout=timeout)
+
+    async def submit(self, query, instruction, timeout=None):
+        """
+
+        :param query:
+        :param instruction:
+        :param timeout:
+        :return:
+        """
+        return await self.post(item=None,
+                               data={'query': query,
+                                     'instruction': instruction},
+                               timeout=timeout)
+
+    async def submit_many(self, submissions, concurrency=8, timeout=None):
+        """ Submit many jobs over this client's connection pool
+
+        :param submissions: An iterable of (query, instruction) pairs
+        :param concurrency: The maximum number of submissions in flight
+        :param timeout: Overrides the client timeout for each submission
+        :raises: mercury_sdk.rpc.job.SubmissionError if any submission
+        failed, the started jobs are available on the exception
+        :return: A started AsyncJob for each submission, in order
+        """
+        from mercury_sdk.aio.job import AsyncJob, start_many
+        return await start_many([AsyncJob(self, query, instruction)
+                                 for query, instruction in submissions],
+                                concurrency=concurrency, timeout=timeout)
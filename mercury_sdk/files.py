@@ -0,0 +1,61 @@
+""" Files shared between processes: atomic replacement and exclusive locks """
+import contextlib
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+def atomic_write(path, content):
+    """ Replace a file, readers see either the previous or the new content
+
+    The content is written to a temporary file in the same directory, which
+    is then renamed over path.
+
+    :param path: The file to write
+    :param content: bytes, or str which is encoded as UTF-8
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(content)
+        os.replace(tmp_path, path)
+    except (IOError, OSError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextlib.contextmanager
+def file_lock(path, blocking=True):
+    """ Hold an exclusive lock on a lock file, which is created if missing
+
+    Where fcntl is not available the lock is not enforced.
+
+    :param path: The lock file
+    :param blocking: Wait for the lock, otherwise yield False when another
+    process holds it
+    :return: Context manager yielding True when the lock is held
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if fcntl:
+            flags = fcntl.LOCK_EX if blocking else \
+                fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(fd, flags)
+            except (IOError, OSError):
+                if blocking:
+                    raise
+                yield False
+                return
+        yield True
+    finally:
+        os.close(fd)
@@ -1,9 +1,125 @@
 import logging
-import json
+import time
+
 import requests
 
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+
+from mercury_sdk.http.serializers import Truncated, get_serializer
+from mercury_sdk.metrics import hooks
+
 log = logging.getLogger(__name__)
 
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_CODES = (502, 503, 504)
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (10, 60)
+# The shortest timeout given to a request bounded by a deadline
+MIN_TIMEOUT = 0.1
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES,
+                   backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                   retry_methods=None):
+    """ Create a keep-alive session backed by a thread-safe connection pool
+
+    Connection errors are retried for every method, since the request never
+    reached the server. 502, 503 and 504 responses are only retried for
+    idempotent methods, so a job submission is never posted twice.
+
+    :param pool_size: The maximum number of connections kept per host
+    :param retries: The number of retries before giving up
+    :param backoff_factor: Sleep backoff_factor * 2 ** (retry - 1) seconds
+    between retries
+    :param retry_methods: Methods for which read errors and 502, 503 and 504
+    responses are retried, defaults to the idempotent methods
+    :return: requests.Session
+    """
+    retry_kwargs = {}
+    if retry_methods is not None:
+        retry_kwargs['allowed_methods'] = frozenset(
+            method.upper() for method in retry_methods)
+    retry = Retry(total=retries,
+                  connect=retries,
+                  read=retries,
+                  status=retries,
+                  backoff_factor=backoff_factor,
+                  status_forcelist=RETRY_STATUS_CODES,
+                  raise_on_status=False,
+                  **retry_kwargs)
+    adapter = HTTPAdapter(pool_connections=pool_size,
+                          pool_maxsize=pool_size,
+                          max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class MercuryClientException(Exception):
+    """ Raised where an error structure cannot be returned in place of data,
+    such as from within a generator. The structure is available as .error
+    """
+    def __init__(self, error):
+        self.error = error
+        super(MercuryClientException, self).__init__(
+            '{}: {}'.format(error.get('code'), error.get('data')))
+
+
+class RequestTimeout(MercuryClientException):
+    """ Raised when the server does not accept the connection or answer
+    within the request timeout. The error structure carries code 408.
+    """
+
+
+def is_timeout(exception):
+    """ Whether a requests exception was caused by a connect or read timeout,
+    including read timeouts which exhausted their retries
+    """
+    if isinstance(exception, requests.exceptions.Timeout):
+        return True
+    if isinstance(exception, requests.exceptions.ConnectionError):
+        reason = getattr(exception.args[0] if exception.args else None,
+                         'reason', None)
+        return isinstance(reason, ReadTimeoutError)
+    return False
+
+
+def bound_timeout(timeout, remaining):
+    """ Shorten a requests timeout so that it does not run past a deadline
+
+    :param timeout: A requests timeout, a number, a (connect, read) tuple or
+    None
+    :param remaining: Seconds left until the deadline
+    :return: A requests timeout
+    """
+    remaining = max(remaining, MIN_TIMEOUT)
+    if timeout is None:
+        return remaining
+    if isinstance(timeout, (tuple, list)):
+        return tuple(remaining if t is None else min(t, remaining)
+                     for t in timeout)
+    return min(timeout, remaining)
+
+
+def error_response(code, data):
+    """ The error structure returned by clients in place of a response
+
+    :param code: The HTTP status code
+    :param data: The decoded response body, or the raw text if the body
+    is not valid JSON
+    :return: dict
+    """
+    _response = {'error': True,
+                 'code': code,
+                 'data': data}
+    log.debug('Response: %s', _response)
+    return _response
+
 
 def check_error(f):
     """Decorator provides consistent formatting for client http errors."""
@@ -17,21 +133,18 @@ def check_error(f):
                 data = http_error.response.json()
             except ValueError:
                 data = http_error.response.text
-            _response = {'error': True,
-                         'code': http_error.response.status_code,
-                         'data': data}
-            log.debug('Response: %s', _response)
-            return _response
+            return error_response(http_error.response.status_code, data)
 
     return wrapper
 
 
-class InterfaceBase(object):
-    """ Base HTTP Interface class """
+class HTTPClientBase(object):
+    """ URL and header handling shared by the blocking and asyncio clients """
     SERVICE_URI = ''
 
     def __init__(self, target, max_items=100, auth_token=None,
-                 additional_headers=None, verify_ssl=True):
+                 additional_headers=None, verify_ssl=True, serializer=None,
+                 hooks=None):
         """ Base Constructor
 
         :param target: URL and base URI of the target service
@@ -42,6 +155,9 @@ class InterfaceBase(object):
 
             These can also be added for each request
         that support pagination.
+        :param serializer: The JSON backend, see serializers.get_serializer
+        :param hooks: Instrumentation hooks receiving the events of this
+        client, see mercury_sdk.metrics.hooks
         """
         self.target = target
         if self.SERVICE_URI:
@@ -58,6 +174,40 @@ class InterfaceBase(object):
 
         self.max_items = max_items
         self.verify_ssl = verify_ssl
+        self.serializer = get_serializer(serializer)
+        self.hooks = list(hooks or ())
+
+    def emit(self, event, **fields):
+        hooks.emit(self.hooks, event, service=self.SERVICE_URI, **fields)
+
+    def _emit_request_end(self, method, url, started, data, status=None,
+                         bytes_in=0, retries=0, error=None):
+        self.emit('request_end', method=method, url=url, status=status,
+                  elapsed=time.perf_counter() - started,
+                  bytes_out=len(data) if data else 0, bytes_in=bytes_in,
+                  retries=retries, error=error)
+
+    def decode_body(self, body, url=None):
+        """ Decode a response body, timing it when instrumented """
+        self.log_response(body)
+        if not hooks.active(self.hooks):
+            return self.serializer.loads(body)
+        started = time.perf_counter()
+        data = self.serializer.loads(body)
+        self.emit('decode', url=url, elapsed=time.perf_counter() - started,
+                  bytes_in=len(body))
+        return data
+
+    def log_request(self, method, item, params, data, headers):
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('Request: method=%s url=%s endpoint=%s params=%s '
+                      'data=%s headers=%s', method, self.base_url, item,
+                      params, Truncated(data), headers)
+
+    @staticmethod
+    def log_response(content):
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('Response: %s', Truncated(content))
 
     def join_endpoint(self, endpoint):
         """
@@ -84,13 +234,114 @@ class InterfaceBase(object):
         per_request_headers.update(extra_request_headers)
         return per_request_headers
 
+
+class InterfaceBase(HTTPClientBase):
+    """ Base HTTP Interface class """
+
+    def __init__(self, target, max_items=100, auth_token=None,
+                 additional_headers=None, verify_ssl=True, serializer=None,
+                 session=None, pool_size=DEFAULT_POOL_SIZE,
+                 retries=DEFAULT_RETRIES,
+                 backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 timeout=DEFAULT_TIMEOUT, hooks=None):
+        """ Blocking client constructor
+
+        See HTTPClientBase for the common arguments.
+
+        :param session: A requests.Session to share between clients. When
+        omitted, the client creates and owns its own pooled session.
+        :param pool_size: Connection pool size of an owned session
+        :param retries: Retries for connection errors and 502/503/504
+        :param backoff_factor: Backoff factor applied between retries
+        :param timeout: The default timeout of each request, in seconds, or a
+        (connect, read) tuple. None waits forever.
+        """
+        super(InterfaceBase, self).__init__(
+            target, max_items=max_items, auth_token=auth_token,
+            additional_headers=additional_headers, verify_ssl=verify_ssl,
+            serializer=serializer, hooks=hooks)
+
+        self._owns_session = session is None
+        self.session = session or create_session(pool_size=pool_size,
+                                                 retries=retries,
+                                                 backoff_factor=backoff_factor)
+        self.retries = retries
+        self.timeout = timeout
+
+    def close(self):
+        """ Release pooled connections, if the session belongs to us """
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _send(self, method, item='', data=None, params=None,
+              extra_headers=None, timeout=None):
+        """ Send a request and return the requests.Response
+
+        :param method:
+        :param item:
+        :param data:
+        :param params:
+        :param extra_headers:
+        :param timeout: Overrides the client timeout for this request
+        :raises: requests.exceptions.HTTPError for 4xx and 5xx responses
+        :raises: RequestTimeout if the request timed out
+        :return: requests.Response
+        """
+
+        if data is not None:
+            data = self.serializer.dumps(data)
+
+        headers = self.get_per_request_headers(extra_headers)
+        self.log_request(method, item, params, data, headers)
+        url = self.join_endpoint(item)
+
+        instrumented = hooks.active(self.hooks)
+        if instrumented:
+            self.emit('request_start', method=method, url=url)
+            started = time.perf_counter()
+        try:
+            r = self.session.request(
+                method,
+                url,
+                params=params,
+                data=data,
+                headers=headers,
+                verify=self.verify_ssl,
+                timeout=self.timeout if timeout is None else timeout)
+        except requests.exceptions.RequestException as e:
+            if instrumented:
+                self._emit_request_end(method, url, started, data,
+                                      error=e.__class__.__name__)
+            if is_timeout(e):
+                raise RequestTimeout(error_response(408, str(e)))
+            raise
+        if instrumented:
+            retries = getattr(r.raw, 'retries', None)
+            self._emit_request_end(
+                method, url, started, data, status=r.status_code,
+                bytes_in=len(r.content),
+                retries=len(retries.history) if retries else 0)
+        r.raise_for_status()
+        return r
+
+    def decode(self, r):
+        """ Decode the body of a requests.Response """
+        return self.decode_body(r.content, url=r.url)
+
     @check_error
     def _request(self,
                  method,
                  item='',
                  data=None,
                  params=None,
-                 extra_headers=None):
+                 extra_headers=None,
+                 timeout=None):
         """
 
         :param method:
@@ -98,46 +349,35 @@ class InterfaceBase(object):
         :param data:
         :param params:
         :param extra_headers:
+        :param timeout:
         :return:
         """
+        return self.decode(self._send(method, item, data=data, params=params,
+                                      extra_headers=extra_headers,
+                                      timeout=timeout))
 
-        if data is not None:
-            data = json.dumps(data)
-
-        headers = self.get_per_request_headers(extra_headers)
-        log.debug('Request: method=%s url=%s endpoint=%s params=%s data=%s '
-                  'headers=%s', method, self.base_url, item, params, data,
-                  headers)
-        r = requests.request(method,
-                             self.join_endpoint(item),
-                             params=params,
-                             data=data,
-                             headers=headers,
-                             verify=self.verify_ssl)
-        r.raise_for_status()
-        _response = r.json()
-        log.debug('Response: %s', _response)
-        return _response
-
-    def get(self, item='', params=None, extra_headers=None):
+    def get(self, item='', params=None, extra_headers=None, timeout=None):
         """
 
         :param item:
         :param params:
         :param extra_headers:
+        :param timeout:
         :return:
         """
         return self._request('get', item, params=params,
-                             extra_headers=extra_headers)
+                             extra_headers=extra_headers, timeout=timeout)
 
-    def post(self, item='', data=None, params=None, extra_headers=None):
+    def post(self, item='', data=None, params=None, extra_headers=None,
+             timeout=None):
         """
 
         :param item:
         :param data:
         :param params:
         :param extra_headers:
+        :param timeout:
         :return:
         """
         return self._request('post', item, data=data, params=params,
-                             extra_headers=extra_headers)
+                             extra_headers=extra_headers, timeout=timeout)
@@ -0,0 +1,160 @@
+""" On-disk response cache for the query endpoints
+
+Entries are keyed by a digest of the request url, method, body and params,
+expire after ttl seconds and are evicted least recently used first once the
+cache grows beyond max_entries or max_bytes. Expired entries which carry an
+ETag or Last-Modified header are revalidated with a conditional request
+rather than fetched again in full.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+
+from mercury_sdk.files import atomic_write
+from mercury_sdk.http.serializers import get_serializer
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_SUFFIX = '.json'
+
+
+class ResponseCache(object):
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_bytes=DEFAULT_MAX_BYTES, serializer=None):
+        """
+
+        :param path: The cache directory, created if it does not exist
+        :param ttl: Seconds an entry is served without revalidation
+        :param max_entries: The maximum number of entries to keep
+        :param max_bytes: The maximum combined size of all entries
+        :param serializer: The JSON backend used for entries
+        """
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.serializer = get_serializer(serializer)
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, 0o700)
+
+    @staticmethod
+    def key(url, method, data=None, params=None):
+        """ Digest identifying a request
+
+        :param url: The full request url
+        :param method: The HTTP method
+        :param data: The request body, ie. the query
+        :param params: The request parameters, ie. projection and limit
+        :return: str
+        """
+        material = json.dumps([url, method.lower(), data, params],
+                              sort_keys=True, default=str)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """ Read an entry, fresh or not, and mark it as recently used
+
+        :param key:
+        :return: The entry dictionary or None
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as fp:
+                entry = self.serializer.loads(fp.read())
+            os.utime(path)
+        except (IOError, OSError):
+            return None
+        except ValueError:
+            log.warning('Discarding corrupt cache entry: %s', path)
+            self.delete(key)
+            return None
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry['stored_at'] < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry):
+        """ Revalidation headers for an entry """
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, key, data, etag=None, last_modified=None):
+        """ Store an entry atomically and evict old entries
+
+        :param key:
+        :param data: The decoded response
+        :param etag: The ETag response header
+        :param last_modified: The Last-Modified response header
+        """
+        self._write(key, {
+            'stored_at': time.time(),
+            'etag': etag,
+            'last_modified': last_modified,
+            'data': data
+        })
+        self.evict()
+
+    def refresh(self, key, entry):
+        """ Restart the ttl of an entry which the server reported unmodified
+        """
+        entry['stored_at'] = time.time()
+        self._write(key, entry)
+
+    def _write(self, key, entry):
+        try:
+            atomic_write(self._entry_path(key), self.serializer.dumps(entry))
+        except (IOError, OSError):
+            log.warning('Could not write cache entry', exc_info=True)
+
+    def delete(self, key):
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(ENTRY_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """ Remove the least recently used entries until the cache is within
+        max_entries and max_bytes
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or
+                           total > self.max_bytes):
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -1,9 +1,84 @@
-from mercury_sdk.http.base import InterfaceBase
+import logging
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from mercury_sdk.http.base import (InterfaceBase, MercuryClientException,
+                                   check_error, error_response)
+
+log = logging.getLogger(__name__)
+
+# The query endpoints page on _id, the next page starts after offset_id
+PAGINATION_CURSOR = 'offset_id'
 
 
 class QueryInterfaceBase(InterfaceBase):
     """ Used for endpoints that support /query"""
 
+    def __init__(self, target, *args, cache=None, **kwargs):
+        """
+
+        :param target: URL and base URI of the target service
+        :param args: See InterfaceBase
+        :param cache: An optional http.cache.ResponseCache. When set, get
+        and query responses are served from the cache until they expire,
+        then revalidated with the server.
+        :param kwargs: See InterfaceBase
+        """
+        super(QueryInterfaceBase, self).__init__(target, *args, **kwargs)
+        self.cache = cache
+
+    @check_error
+    def _request(self,
+                 method,
+                 item='',
+                 data=None,
+                 params=None,
+                 extra_headers=None,
+                 timeout=None):
+        """ Serve get and query requests through the cache, if enabled
+
+        :param method:
+        :param item:
+        :param data:
+        :param params:
+        :param extra_headers:
+        :param timeout:
+        :return:
+        """
+        if not self.cache:
+            return self.decode(self._send(method, item, data=data,
+                                          params=params,
+                                          extra_headers=extra_headers,
+                                          timeout=timeout))
+
+        key = self.cache.key(self.join_endpoint(item), method, data, params)
+        entry = self.cache.get(key)
+        if entry:
+            if self.cache.is_fresh(entry):
+                log.debug('Cache hit: %s', key)
+                return entry['data']
+            conditional_headers = self.cache.conditional_headers(entry)
+            if conditional_headers:
+                extra_headers = dict(extra_headers or {},
+                                     **conditional_headers)
+
+        r = self._send(method, item, data=data, params=params,
+                       extra_headers=extra_headers, timeout=timeout)
+
+        if entry and r.status_code == 304:
+            log.debug('Cache revalidated: %s', key)
+            self.cache.refresh(key, entry)
+            return entry['data']
+
+        _response = self.decode(r)
+        self.cache.put(key, _response,
+                       etag=r.headers.get('ETag'),
+                       last_modified=r.headers.get('Last-Modified'))
+        return _response
+
     @staticmethod
     def set_projection(params, projection):
         """
@@ -15,13 +90,14 @@ class QueryInterfaceBase(InterfaceBase):
         params.update({'projection': ','.join(projection)})
 
     def get(self, mercury_id=None, projection=None, params=None,
-            extra_headers=None):
+            extra_headers=None, timeout=None):
         """
         Override for get that add projection argument
         :param mercury_id:
         :param projection:
         :param params:
         :param extra_headers:
+        :param timeout:
         :return:
         """
 
@@ -31,7 +107,63 @@ class QueryInterfaceBase(InterfaceBase):
             self.set_projection(params, projection)
         return super(QueryInterfaceBase, self).get(item=mercury_id,
                                                    params=params,
-                                                   extra_headers=extra_headers)
+                                                   extra_headers=extra_headers,
+                                                   timeout=timeout)
+
+    def get_many(self, mercury_ids, projection=None, concurrency=4,
+                 params=None, extra_headers=None, timeout=None):
+        """ Fetch many devices by mercury_id
+
+        The ids are collapsed into {"mercury_id": {"$in": [...]}} queries of
+        up to max_items ids each. A single query is made for short lists,
+        longer lists are split and queried over at most concurrency threads.
+
+        :param mercury_ids: An iterable of mercury_ids
+        :param projection:
+        :param concurrency: The maximum number of queries in flight
+        :param params:
+        :param extra_headers:
+        :param timeout: The timeout of each query
+        :return: A list with a result for each input id, in input order.
+        Ids which could not be fetched are given the check_error structure,
+        a query which timed out (408) or could not connect (503) fails only
+        the ids of its chunk.
+        """
+        mercury_ids = list(mercury_ids)
+        unique_ids = list(OrderedDict.fromkeys(mercury_ids))
+        if projection and 'mercury_id' not in projection:
+            projection = list(projection) + ['mercury_id']
+
+        def fetch(chunk):
+            chunk_params = dict(params or {}, limit=len(chunk))
+            try:
+                data = self.query({'mercury_id': {'$in': chunk}},
+                                  projection=projection, params=chunk_params,
+                                  extra_headers=extra_headers,
+                                  timeout=timeout)
+            except MercuryClientException as e:
+                data = e.error
+            except requests.exceptions.ConnectionError as e:
+                data = error_response(503, str(e))
+            if data.get('error'):
+                return dict((mercury_id, data) for mercury_id in chunk)
+            return dict((item['mercury_id'], item) for item in data['items'])
+
+        chunk_size = max(int(self.max_items), 1)
+        chunks = [unique_ids[i:i + chunk_size]
+                  for i in range(0, len(unique_ids), chunk_size)]
+
+        found = {}
+        if len(chunks) == 1:
+            found.update(fetch(chunks[0]))
+        elif chunks:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                for result in executor.map(fetch, chunks):
+                    found.update(result)
+
+        return [found[mercury_id] if mercury_id in found else
+                error_response(404, 'Not found: {}'.format(mercury_id))
+                for mercury_id in mercury_ids]
 
     @staticmethod
     def strip_empty(items):
@@ -41,7 +173,7 @@ class QueryInterfaceBase(InterfaceBase):
                     item[key] = [el for el in item[key] if el]
 
     def query(self, query, item='/query', projection=None, params=None,
-              extra_headers=None, strip_empty_elements=False):
+              extra_headers=None, strip_empty_elements=False, timeout=None):
         """
 
         :param query:
@@ -50,6 +182,7 @@ class QueryInterfaceBase(InterfaceBase):
         :param params:
         :param extra_headers:
         :param strip_empty_elements:
+        :param timeout:
         :return:
         """
 
@@ -59,9 +192,69 @@ class QueryInterfaceBase(InterfaceBase):
             self.set_projection(params, projection)
 
         data = self.post(item, data={'query': query}, params=params,
-                         extra_headers=extra_headers)
+                         extra_headers=extra_headers, timeout=timeout)
 
-        if strip_empty_elements:
+        if strip_empty_elements and not data.get('error'):
             self.strip_empty(data['items'])
 
         return data
+
+    def iter_query(self, query, item='/query', projection=None, params=None,
+                   extra_headers=None, strip_empty_elements=False,
+                   page_size=None, prefetch=True, timeout=None):
+        """ Generator which yields every item matching the query, following
+        the pagination cursor until the result set is exhausted.
+
+        While the caller consumes a page, the next page is fetched in the
+        background, so at most two pages are held in memory.
+
+        :param query:
+        :param item:
+        :param projection:
+        :param params:
+        :param extra_headers:
+        :param strip_empty_elements:
+        :param page_size: Items per request, defaults to the limit in params
+        or max_items
+        :param prefetch: Fetch the next page while the current page is
+        being consumed
+        :param timeout: The timeout of each page request
+        :raises: MercuryClientException if a page cannot be fetched
+        """
+        params = dict(params or {})
+        page_size = int(page_size or params.get('limit') or self.max_items)
+        params['limit'] = page_size
+
+        def fetch(cursor):
+            page_params = dict(params)
+            if cursor:
+                page_params[PAGINATION_CURSOR] = cursor
+            data = self.query(query, item=item, projection=projection,
+                              params=page_params, extra_headers=extra_headers,
+                              strip_empty_elements=strip_empty_elements,
+                              timeout=timeout)
+            if data.get('error'):
+                raise MercuryClientException(data)
+            return data['items']
+
+        executor = prefetch and ThreadPoolExecutor(max_workers=1)
+        try:
+            items = fetch(None)
+            while items:
+                # A short page is the last page
+                cursor = None
+                pending = None
+                if len(items) >= page_size:
+                    cursor = items[-1]['_id']
+                    if executor:
+                        pending = executor.submit(fetch, cursor)
+
+                for _item in items:
+                    yield _item
+
+                if not cursor:
+                    break
+                items = pending.result() if pending else fetch(cursor)
+        finally:
+            if executor:
+                executor.shutdown(wait=False)
@@ -4,39 +4,63 @@ from mercury_sdk.http.base import InterfaceBase
 class JobInterfaceBase(InterfaceBase):
     SERVICE_URI = 'api/rpc/jobs'
 
-    def get(self, job_id='', params=None, extra_headers=None):
+    def get(self, job_id='', params=None, extra_headers=None, timeout=None):
         """
 
         :param job_id:
         :param params:
         :param extra_headers:
+        :param timeout:
         :return:
         """
         return super(JobInterfaceBase, self).get(item=job_id, params=params,
-                                                 extra_headers=extra_headers)
+                                                 extra_headers=extra_headers,
+                                                 timeout=timeout)
 
-    def status(self, job_id):
+    def status(self, job_id, timeout=None):
         """
 
         :param job_id:
+        :param timeout:
         :return:
         """
-        return self.get('/{}/status'.format(job_id))
+        return self.get('/{}/status'.format(job_id), timeout=timeout)
 
-    def tasks(self, job_id):
+    def tasks(self, job_id, timeout=None):
         """
 
         :param job_id:
+        :param timeout:
         :return:
         """
-        return self.get('/{}/tasks'.format(job_id))
+        return self.get('/{}/tasks'.format(job_id), timeout=timeout)
 
-    def submit(self, query, instruction):
+    def submit(self, query, instruction, timeout=None):
         """
 
         :param query:
         :param instruction:
+        :param timeout:
         :return:
         """
         return self.post(item=None,
-                         data={'query': query, 'instruction': instruction})
+                         data={'query': query, 'instruction': instruction},
+                         timeout=timeout)
+
+    def submit_many(self, submissions, concurrency=8, timeout=None,
+                    bulk_submit=None):
+        """ Submit many jobs over this client's connection pool
+
+        :param submissions: An iterable of (query, instruction) pairs
+        :param concurrency: The maximum number of submissions in flight
+        :param timeout: Overrides the client timeout for each submission
+        :param bulk_submit: See mercury_sdk.rpc.job.start_many
+        :raises: mercury_sdk.rpc.job.SubmissionError if any submission
+        failed, the started jobs are available on the exception
+        :return: A started Job for each submission, in order
+        """
+        from mercury_sdk.rpc.job import Job, start_many
+        return start_many([Job(self, query, instruction)
+                           for query, instruction in submissions],
+                          concurrency=concurrency, timeout=timeout,
+                          bulk_submit=bulk_submit)
@@ -0,0 +1,98 @@
+""" JSON backends used to encode request bodies and decode responses
+
+The stdlib json module is used by default. orjson, when installed, encodes
+and decodes directly to and from bytes and is considerably faster on large
+inventory payloads.
+"""
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+log = logging.getLogger(__name__)
+
+# The number of characters of a payload written to the debug log
+MAX_LOG_LENGTH = 2048
+
+
+class JSONSerializer(object):
+    name = 'json'
+
+    @staticmethod
+    def dumps(data):
+        return json.dumps(data)
+
+    @staticmethod
+    def loads(data):
+        """ json.loads accepts bytes in any of the utf encodings """
+        return json.loads(data)
+
+
+class ORJSONSerializer(object):
+    name = 'orjson'
+
+    @staticmethod
+    def dumps(data):
+        return orjson.dumps(data)
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+
+SERIALIZERS = {
+    JSONSerializer.name: JSONSerializer,
+    ORJSONSerializer.name: ORJSONSerializer
+}
+
+
+def get_serializer(serializer=None):
+    """ Resolve a serializer
+
+    :param serializer: None for the stdlib backend, 'auto' for the fastest
+    installed backend, a backend name or an object providing dumps and
+    loads
+    :return: serializer
+    """
+    if serializer is None:
+        return JSONSerializer
+    if serializer == 'auto':
+        return ORJSONSerializer if orjson else JSONSerializer
+    if not isinstance(serializer, str):
+        return serializer
+    if serializer not in SERIALIZERS:
+        raise ValueError('Unknown serializer: {}'.format(serializer))
+    if serializer == ORJSONSerializer.name and not orjson:
+        raise ValueError('orjson is not installed')
+    return SERIALIZERS[serializer]
+
+
+class Truncated(object):
+    """ Defers formatting a payload for the log until the record is emitted,
+    and caps its length. Bytes and strings are sliced before decoding, so a
+    large body is never copied in full.
+    """
+    __slots__ = ('payload', 'limit')
+
+    def __init__(self, payload, limit=MAX_LOG_LENGTH):
+        self.payload = payload
+        self.limit = limit
+
+    def __str__(self):
+        payload = self.payload
+        if isinstance(payload, (bytes, bytearray)):
+            size = len(payload)
+            text = payload[:self.limit].decode('utf-8', 'replace')
+        elif isinstance(payload, str):
+            size = len(payload)
+            text = payload[:self.limit]
+        else:
+            text = str(payload)
+            size = len(text)
+        if size > self.limit:
+            return '{}... ({} bytes truncated)'.format(text[:self.limit],
+                                                       size - self.limit)
+        return text
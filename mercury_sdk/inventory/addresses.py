@@ -0,0 +1,151 @@
+""" Resolve the management address of inventory records
+
+An AddressIndex maps each mercury_id to its primary address, the interface
+holding it and the interface's predictable names, and every address found in
+the records back to its mercury_id. The primary address is the first address,
+in interface order, which passes every rule. Rules are callables taking the
+interface and an address_info entry, ie.
+
+    index = AddressIndex(rules=[Subnet('10.0.0.0/8'), InterfaceName('eth*')],
+                         prefer=6)
+
+Without rules or a preference, the primary address is the first address of
+the first interface which has one. Link local addresses are never primary.
+"""
+import fnmatch
+import ipaddress
+
+from collections import OrderedDict, namedtuple
+
+PROJECTION = ['mercury_id', 'interfaces']
+
+Address = namedtuple('Address', ('mercury_id', 'address', 'version',
+                                 'devname', 'predictable_names'))
+
+
+def parse_address(address):
+    """ ipaddress object, without a scope id, or None """
+    try:
+        return ipaddress.ip_address(address.split('%')[0])
+    except ValueError:
+        return None
+
+
+class Subnet(object):
+    def __init__(self, *networks):
+        """ Match addresses within any of the networks
+
+        :param networks: CIDR strings, ie. 10.0.0.0/8 or fd00::/8
+        """
+        self.networks = [ipaddress.ip_network(network, strict=False)
+                         for network in networks]
+
+    def __call__(self, interface, address_info):
+        address = parse_address(address_info['addr'])
+        return address is not None and any(
+            address in network for network in self.networks)
+
+    def __repr__(self):
+        return 'Subnet({})'.format(', '.join(str(n) for n in self.networks))
+
+
+class InterfaceName(object):
+    def __init__(self, *patterns):
+        """ Match addresses of interfaces whose devname or predictable name
+        matches any of the shell patterns, ie. eth0, eno* or em1
+        """
+        self.patterns = patterns
+
+    def __call__(self, interface, address_info):
+        names = [interface.get('devname')] + list(
+            (interface.get('predictable_names') or {}).values())
+        return any(fnmatch.fnmatchcase(name, pattern)
+                   for name in names if isinstance(name, str)
+                   for pattern in self.patterns)
+
+    def __repr__(self):
+        return 'InterfaceName({})'.format(', '.join(self.patterns))
+
+
+class AddressIndex(object):
+    def __init__(self, rules=None, prefer=None):
+        """
+
+        :param rules: Callables, rule(interface, address_info), which an
+        address must all pass to be selected as primary
+        :param prefer: 4 or 6, select an address of this version over an
+        earlier address of the other version
+        """
+        self.rules = list(rules or [])
+        self.prefer = prefer
+        self._primary = OrderedDict()
+        self._reverse = {}
+
+    @classmethod
+    def from_query(cls, client, query, rules=None, prefer=None):
+        """ Build an index from every record matching an inventory query
+
+        :param client: InventoryComputers client
+        :param query: The query, as a dictionary
+        :param rules:
+        :param prefer:
+        :return: AddressIndex
+        """
+        index = cls(rules, prefer)
+        index.update(client.iter_query(query, projection=PROJECTION,
+                                       strip_empty_elements=True))
+        return index
+
+    def _select(self, interface, address_info):
+        return all(rule(interface, address_info) for rule in self.rules)
+
+    def add(self, record):
+        """ Index a record holding mercury_id and interfaces
+
+        :return: The primary Address or None if no address was selected
+        """
+        mercury_id = record['mercury_id']
+        primary = None
+        for interface in record.get('interfaces') or []:
+            for address_info in interface.get('address_info') or []:
+                if not address_info or not address_info.get('addr'):
+                    continue
+                self._reverse[address_info['addr']] = mercury_id
+                if primary and (not self.prefer or
+                                primary.version == self.prefer):
+                    continue
+                parsed = parse_address(address_info['addr'])
+                if parsed and parsed.is_link_local or \
+                        not self._select(interface, address_info):
+                    continue
+                version = parsed and parsed.version
+                if primary and version != self.prefer:
+                    continue
+                primary = Address(mercury_id, address_info['addr'], version,
+                                  interface.get('devname'),
+                                  interface.get('predictable_names') or {})
+        if primary:
+            self._primary[mercury_id] = primary
+        return primary
+
+    def update(self, records):
+        for record in records:
+            self.add(record)
+
+    def get(self, mercury_id):
+        """ The primary Address of a device or None """
+        return self._primary.get(mercury_id)
+
+    def lookup(self, address):
+        """ The mercury_id holding an address, primary or not, or None """
+        return self._reverse.get(address)
+
+    def __len__(self):
+        return len(self._primary)
+
+    def __iter__(self):
+        """ The primary Address of each device, in the order indexed """
+        return iter(self._primary.values())
+
+    def __contains__(self, mercury_id):
+        return mercury_id in self._primary
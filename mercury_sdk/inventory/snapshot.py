@@ -0,0 +1,227 @@
+""" Local inventory snapshots which are refreshed incrementally
+
+A snapshot keeps the (projected) inventory records matching a query, keyed
+by mercury_id, along with the time_updated and a content hash of each
+record. A refresh only asks the server for mercury_id and time_updated of
+every matching device, fetches the records whose time_updated moved with
+get_many, and compares hashes to find the records which actually changed.
+The cost of a refresh therefore follows the churn rather than the size of
+the fleet.
+"""
+import hashlib
+import json
+import logging
+import os
+
+from collections import namedtuple
+
+from mercury_sdk.files import atomic_write
+from mercury_sdk.http.base import MercuryClientException
+from mercury_sdk.http.serializers import get_serializer
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+# Fields which change without the content of the record changing
+VOLATILE_FIELDS = ('_id', 'time_updated')
+
+FieldChange = namedtuple('FieldChange', ('path', 'old', 'new'))
+
+
+def record_hash(record):
+    """ Digest of a record, ignoring VOLATILE_FIELDS """
+    content = dict((k, v) for k, v in record.items()
+                   if k not in VOLATILE_FIELDS)
+    material = json.dumps(content, sort_keys=True, separators=(',', ':'),
+                          default=str)
+    return hashlib.sha1(material.encode('utf-8')).hexdigest()
+
+
+def diff_records(old, new, path=''):
+    """ Field level differences between two records
+
+    Dictionaries are compared key by key, lists of the same length item by
+    item, anything else as a whole. Paths are dotted, list items are
+    addressed by index, ie. interfaces.1.address_info
+
+    :param old: The previous record
+    :param new: The current record
+    :return: A list of FieldChange, missing values are None
+    """
+    changes = []
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in sorted(set(old) | set(new), key=str):
+            if not path and key in VOLATILE_FIELDS:
+                continue
+            changes.extend(diff_records(
+                old.get(key), new.get(key),
+                '{}.{}'.format(path, key) if path else str(key)))
+    elif isinstance(old, list) and isinstance(new, list) and \
+            len(old) == len(new):
+        for i, (old_item, new_item) in enumerate(zip(old, new)):
+            changes.extend(diff_records(old_item, new_item,
+                                        '{}.{}'.format(path, i)))
+    elif old != new:
+        changes.append(FieldChange(path, old, new))
+    return changes
+
+
+class SnapshotDiff(object):
+    """ The outcome of InventorySnapshot.refresh
+
+    added and removed map mercury_id to the record, changed maps mercury_id
+    to a list of FieldChange
+    """
+    def __init__(self, added=None, removed=None, changed=None):
+        self.added = added or {}
+        self.removed = removed or {}
+        self.changed = changed or {}
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return '<SnapshotDiff added={} removed={} changed={}>'.format(
+            len(self.added), len(self.removed), len(self.changed))
+
+    def to_dict(self):
+        return {
+            'added': sorted(self.added),
+            'removed': sorted(self.removed),
+            'changed': dict(
+                (mercury_id, [change._asdict() for change in changes])
+                for mercury_id, changes in self.changed.items())
+        }
+
+
+class InventorySnapshot(object):
+    def __init__(self, client, query=None, projection=None, path=None,
+                 serializer=None):
+        """
+
+        :param client: An InventoryComputers client
+        :param query: The inventory query the snapshot tracks, defaults to
+        every device
+        :param projection: The fields to keep, defaults to whole records.
+        mercury_id and time_updated are always included.
+        :param path: Optional file the snapshot is loaded from and saved to
+        :param serializer: The JSON backend used for the file
+        """
+        self.client = client
+        self.query = query or {}
+        self.projection = projection and sorted(
+            set(projection) | {'mercury_id', 'time_updated'})
+        self.path = path and os.path.expanduser(path)
+        self.serializer = get_serializer(serializer)
+
+        # mercury_id -> {'time_updated', 'hash', 'record'}
+        self.entries = {}
+        if self.path and os.path.exists(self.path):
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, mercury_id):
+        return mercury_id in self.entries
+
+    def get(self, mercury_id):
+        entry = self.entries.get(mercury_id)
+        return entry and entry['record']
+
+    @property
+    def records(self):
+        return dict((mercury_id, entry['record'])
+                    for mercury_id, entry in self.entries.items())
+
+    @staticmethod
+    def _entry(record):
+        return {'time_updated': record.get('time_updated'),
+                'hash': record_hash(record),
+                'record': record}
+
+    def _fetch_changed(self, mercury_ids):
+        """ Fetch records by id, ids which no longer exist are omitted """
+        records = {}
+        results = self.client.get_many(mercury_ids,
+                                       projection=self.projection)
+        for mercury_id, result in zip(mercury_ids, results):
+            if result.get('error'):
+                if result.get('code') == 404:
+                    continue
+                raise MercuryClientException(result)
+            records[mercury_id] = result
+        return records
+
+    def refresh(self):
+        """ Bring the snapshot up to date with the server
+
+        :raises: MercuryClientException if the inventory cannot be queried
+        :return: SnapshotDiff
+        """
+        if not self.entries:
+            # Nothing to compare, a single pass over the records is cheapest
+            current = dict(
+                (record['mercury_id'], record) for record in
+                self.client.iter_query(self.query,
+                                       projection=self.projection))
+            self.entries = dict((mercury_id, self._entry(record))
+                                for mercury_id, record in current.items())
+            return SnapshotDiff(added=current)
+
+        updated = dict(
+            (record['mercury_id'], record.get('time_updated')) for record in
+            self.client.iter_query(self.query,
+                                   projection=['mercury_id', 'time_updated']))
+
+        removed = dict((mercury_id, self.entries[mercury_id]['record'])
+                       for mercury_id in set(self.entries) - set(updated))
+        stale = [mercury_id for mercury_id, time_updated in updated.items()
+                 if mercury_id not in self.entries or time_updated is None or
+                 self.entries[mercury_id]['time_updated'] != time_updated]
+        log.debug('Snapshot refresh: %s devices, %s stale, %s removed',
+                  len(updated), len(stale), len(removed))
+
+        fetched = self._fetch_changed(stale) if stale else {}
+
+        diff = SnapshotDiff(removed=removed)
+        for mercury_id in removed:
+            del self.entries[mercury_id]
+        for mercury_id, record in fetched.items():
+            entry = self._entry(record)
+            previous = self.entries.get(mercury_id)
+            self.entries[mercury_id] = entry
+            if previous is None:
+                diff.added[mercury_id] = record
+            elif previous['hash'] != entry['hash']:
+                diff.changed[mercury_id] = diff_records(previous['record'],
+                                                        record)
+        return diff
+
+    def load(self):
+        with open(self.path, 'rb') as fp:
+            data = self.serializer.loads(fp.read())
+        if data.get('version') != SNAPSHOT_VERSION or \
+                data.get('query') != self.query or \
+                data.get('projection') != self.projection:
+            log.info('Discarding snapshot %s, it was taken with a different '
+                     'query or projection', self.path)
+            self.entries = {}
+            return
+        self.entries = data['entries']
+
+    def save(self):
+        """ Write the snapshot to path atomically
+
+        :raises: ValueError if the snapshot has no path
+        """
+        if not self.path:
+            raise ValueError('No snapshot path configured')
+        atomic_write(self.path, self.serializer.dumps({
+            'version': SNAPSHOT_VERSION,
+            'query': self.query,
+            'projection': self.projection,
+            'entries': self.entries
+        }))
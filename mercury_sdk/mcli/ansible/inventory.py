@@ -1,27 +1,161 @@
+""" Ansible inventories built from a mercury query
+
+build_ansible_inventory renders a static INI host list. build_dynamic_inventory
+produces the JSON document expected from an ansible dynamic inventory script
+(--list), with hosts grouped by inventory fields and their variables under
+_meta.hostvars, so ansible does not call the script again for every host.
+
+Dynamic inventories are cached for a short time in the program directory.
+Builds are serialized with a lock, so concurrent playbooks share a single walk
+of the inventory rather than each querying the whole fleet.
+"""
+import logging
+import os
+import re
+
+from mercury_sdk.files import file_lock
+from mercury_sdk.http.cache import ResponseCache
+from mercury_sdk.inventory import addresses
+from mercury_sdk.inventory.addresses import AddressIndex
 from mercury_sdk.mcli import operations
 
+LOG = logging.getLogger(__name__)
+
+DEFAULT_TTL = 60
+CACHE_DIRECTORY = 'ansible'
+# A single lock for the cache directory, so no lock file is left per query
+LOCK_NAME = 'build.lock'
+
+_unsafe_group_characters = re.compile(r'[^A-Za-z0-9_]')
+
+
+def lookup(record, field):
+    """ Resolve a dotted field, ie. dmi.sys_vendor, within a record
+
+    :return: The value or None if any part of the path is missing
+    """
+    value = record
+    for part in field.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def group_name(field, value):
+    """ An ansible safe group name, ie. dmi.sys_vendor, Dell Inc. becomes
+    dmi_sys_vendor_Dell_Inc_
+    """
+    return _unsafe_group_characters.sub(
+        '_', '{}_{}'.format(field.replace('.', '_'), value))
+
+
+def iter_hosts(client, query, projection=None, rules=None, prefer=None):
+    """ Yield (Address, device) for every device matching the query which
+    has an address, see mercury_sdk.inventory.addresses
+    """
+    index = AddressIndex(rules, prefer)
+    projection = addresses.PROJECTION + list(projection or [])
+    for device in client.iter_query(query, projection=projection,
+                                    strip_empty_elements=True):
+        address = index.add(device)
+        if address:
+            yield address, device
 
-def build_ansible_inventory(client, query, user='root', hostname=''):
-    projection = ["mercury_id", "interfaces"]
+
+def build_ansible_inventory(client, query, user='root', hostname='',
+                            rules=None, prefer=None):
     ansible_inventory = []
     q = operations.de(query)
-    data = operations.make_query(client, q, projection, limit=250, strip_empty=True)
+    for counter, (address, _) in enumerate(
+            iter_hosts(client, q, rules=rules, prefer=prefer), 1):
+        ansible_inventory.append(
+            "{} ansible_ssh_user={}{}".format(
+                address.address,
+                user,
+                ' unique_hostname={}'.format(hostname.format(
+                    **dict(cnt=counter)) if hostname else '')
+            ))
 
-    if not data["items"]:
+    if not ansible_inventory:
         operations.output.print_and_exit("Query did not match any active targets")
 
-    counter = 0
-    for device in data['items']:
-        for interface in device['interfaces']:
-            if interface['address_info']:
-                counter += 1
-                ansible_inventory.append(
-                    "{} ansible_ssh_user={}{}".format(
-                        interface['address_info'][0]['addr'],
-                        user,
-                        ' unique_hostname={}'.format(hostname.format(
-                            **dict(cnt=counter)) if hostname else '')
-                    ))
-                break
     return "\n".join(ansible_inventory)
 
+
+def build_dynamic_inventory(client, query, group_by=None, user='root',
+                            hostname='', rules=None, prefer=None):
+    """ Build an ansible dynamic inventory
+
+    :param client: InventoryComputers client
+    :param query: The query, as a dictionary
+    :param group_by: Dotted inventory fields to group hosts by, ie.
+    origin.datacenter, a group is created for each value found
+    :param user: The ansible_ssh_user of every host
+    :param hostname: Template of the unique_hostname variable, {cnt} is
+    replaced by the host's position
+    :param rules: Address selection rules, see mercury_sdk.inventory.addresses
+    :param prefer: The preferred IP version, 4 or 6
+    :return: The --list document
+    """
+    group_by = list(group_by or [])
+    groups = {}
+    hostvars = {}
+
+    for counter, (address, device) in enumerate(
+            iter_hosts(client, query, group_by, rules, prefer), 1):
+        variables = {'ansible_ssh_user': user,
+                     'mercury_id': device['mercury_id'],
+                     'mercury_interface': address.devname}
+        if hostname:
+            variables['unique_hostname'] = hostname.format(cnt=counter)
+        for field in group_by:
+            value = lookup(device, field)
+            if value is None or isinstance(value, (dict, list)):
+                continue
+            variables[field.replace('.', '_')] = value
+            groups.setdefault(group_name(field, value), []).append(
+                address.address)
+        hostvars[address.address] = variables
+
+    inventory = dict((name, {'hosts': hosts}) for name, hosts in
+                     groups.items())
+    inventory['all'] = {'hosts': list(hostvars), 'children': sorted(groups)}
+    inventory['_meta'] = {'hostvars': hostvars}
+    return inventory
+
+
+def cached_dynamic_inventory(client, query, cache_path, ttl=DEFAULT_TTL,
+                             **kwargs):
+    """ build_dynamic_inventory, served from cache_path for ttl seconds
+
+    When the inventory is stale, the first caller rebuilds it while holding
+    the lock of the cache directory, and callers arriving meanwhile wait for
+    and use its result. Builds of different inventories are serialized too.
+
+    :param client: InventoryComputers client
+    :param query: The query, as a dictionary
+    :param cache_path: The cache directory
+    :param ttl: Seconds the inventory is served from cache, 0 disables the
+    cache
+    :param kwargs: Passed to build_dynamic_inventory
+    :return: The --list document
+    """
+    if not ttl:
+        return build_dynamic_inventory(client, query, **kwargs)
+
+    cache = ResponseCache(cache_path, ttl=ttl)
+    key = cache.key(client.base_url, 'ansible', query, kwargs)
+
+    entry = cache.get(key)
+    if entry and cache.is_fresh(entry):
+        return entry['data']
+
+    with file_lock(os.path.join(cache.path, LOCK_NAME)):
+        entry = cache.get(key)
+        if entry and cache.is_fresh(entry):
+            LOG.debug('Using the inventory built by another process')
+            return entry['data']
+        inventory = build_dynamic_inventory(client, query, **kwargs)
+        cache.put(key, inventory)
+    return inventory
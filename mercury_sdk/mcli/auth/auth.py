@@ -1,24 +1,16 @@
 import logging
 import importlib
-import os
-import yaml
+import threading
 
-from datetime import datetime, timezone
-import dateutil.parser
+from mercury_sdk.mcli.auth.store import get_token_store
 
 LOG = logging.getLogger(__name__)
 # TODO: Support multiple auth handlers
 __auth_handler = None
 
-
-def write_token(token_data, path):
-    with open(path, 'w') as token_file:
-        yaml.safe_dump(token_data, stream=token_file)
-
-
-def read_token(path):
-    with open(path) as fp:
-        return yaml.safe_load(fp)
+# In process single-flight, one lock per token store and mercury url
+_flights = {}
+_flights_lock = threading.Lock()
 
 
 # TODO: learn handler names but searching the auth directory
@@ -40,31 +32,103 @@ def update_parser(handler_name, parser):
         _h.add_arguments(parser)
 
 
-# TODO: index tokens by mercury url
+def _flight_lock(store, mercury_url):
+    with _flights_lock:
+        return _flights.setdefault((store.path, mercury_url),
+                                   threading.Lock())
+
+
+def requires_input(configuration):
+    """ Whether authenticating prompts the user, ie. for a password or a one
+    time passcode. Handlers may implement requires_input(configuration),
+    those which do not are assumed not to prompt.
+    """
+    auth_handler = get_auth_handler(configuration['auth_handler'])
+    if hasattr(auth_handler, 'requires_input'):
+        return auth_handler.requires_input(configuration)
+    return False
+
+
+def token_requires_input(configuration, token_path):
+    """ Whether get_token would prompt the user, because the stored token
+    is missing or expired and authenticating requires input
+    """
+    store = get_token_store(token_path)
+    if store.is_valid(store.get(configuration['mercury_url'])):
+        return False
+    return requires_input(configuration)
+
+
 def get_token(configuration, token_path):
-    if os.path.exists(token_path):
-        LOG.debug('Token exists, checking...')
-        token_data = read_token(token_path)
-        if datetime.now(timezone.utc) < dateutil.parser.parse(
-                token_data['expires_at']):
-            return token_data
-        else:
-            LOG.info('Token expired at: {}'.format(token_data['expires_at']))
-            os.remove(token_path)
+    """ Return a token for configuration['mercury_url'], authenticating when
+    the stored token is missing or due for renewal
+
+    A token which is due for renewal but still valid is renewed by whichever
+    thread or process takes the lock first, the others keep using it. Without
+    a valid token, callers wait for the one which is authenticating and then
+    use the token it stored. When authenticating prompts the user, a valid
+    token is used until it expires rather than renewed early.
+    """
+    store = get_token_store(token_path)
+    mercury_url = configuration['mercury_url']
+
+    token_data = store.get(mercury_url)
+    if not store.needs_refresh(token_data):
+        return token_data
+
+    valid = store.is_valid(token_data)
+    if valid and requires_input(configuration):
+        return token_data
+    flight = _flight_lock(store, mercury_url)
+    if not flight.acquire(not valid):
+        LOG.debug('Token is being renewed by another thread')
+        return token_data
+    try:
+        with store.lock(blocking=not valid) as locked:
+            if not locked:
+                LOG.debug('Token is being renewed by another process')
+                return token_data
+            return _renew_token(configuration, store, mercury_url, token_data)
+    finally:
+        flight.release()
+
+
+def _renew_token(configuration, store, mercury_url, token_data):
+    # The token may have been renewed while waiting for the lock
+    current = store.get(mercury_url)
+    if store.is_valid(current) and (current != token_data or
+                                    not store.needs_refresh(current)):
+        return current
+    token_data = current
+
+    if token_data:
+        LOG.info('Renewing token, expires at: {}'.format(
+            token_data['expires_at']))
 
     LOG.info('Auth handler: {}'.format(configuration['auth_handler']))
     auth_handler = get_auth_handler(configuration['auth_handler'])
 
-    token_data = auth_handler.authenticate(configuration)
-    if not configuration.get('no_store'):
-        LOG.debug('Writing token file: {}'.format(token_path))
-        write_token(token_data, token_path)
-    return token_data
+    try:
+        new_token_data = auth_handler.authenticate(configuration)
+    except Exception:
+        if not store.is_valid(token_data):
+            raise
+        LOG.warning('Could not renew token, using the current token',
+                    exc_info=True)
+        return token_data
+
+    if configuration.get('no_store'):
+        return new_token_data
+    LOG.debug('Writing token for {} to {}'.format(mercury_url, store.path))
+    return store.put(mercury_url, new_token_data)
 
 
 def invalidate_token(configuration, token_path):
-    if os.path.exists(token_path):
-        token_data = read_token(token_path)
-        auth_handler = get_auth_handler(configuration['auth_handler'])
-        auth_handler.invalidate(configuration, token_data)
-        os.remove(token_path)
+    store = get_token_store(token_path)
+    mercury_url = configuration['mercury_url']
+    with store.lock():
+        token_data = store.get(mercury_url)
+        if token_data:
+            auth_handler = get_auth_handler(configuration['auth_handler'])
+            auth_handler.invalidate(configuration, token_data)
+            store.delete(mercury_url)
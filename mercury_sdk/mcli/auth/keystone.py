@@ -1,10 +1,52 @@
 import getpass
 import os
+import threading
+
 import requests
 
+from mercury_sdk.http.base import create_session
+
 KEYSTONE_USER_ENV = 'KEYSTONE_USER'
 KEYSTONE_API_URL_ENV = 'KEYSTONE_API_URL'
 
+# (connect, read) seconds, overridden by auth.timeout in mcli.yml
+DEFAULT_TIMEOUT = (5, 30)
+DEFAULT_RETRIES = 3
+
+# Credentials which may be sent more than once, ie. a password. A one-time
+# passcode, such as the RSA token of rax-rsa, is spent by the first attempt.
+REPLAYABLE_TYPES = ('password',)
+
+# replayable -> session
+_sessions = {}
+_session_lock = threading.Lock()
+
+
+def get_session(replayable=True):
+    """ Keystone connections are reused for the life of the process.
+
+    Connection errors are always retried. Issuing a token has no side
+    effects, so with replayable credentials POST is also retried on read
+    errors and 502, 503 and 504 responses. Otherwise the request may have
+    reached keystone and is not sent again.
+
+    :param replayable: Whether the credentials may be sent more than once
+    """
+    with _session_lock:
+        session = _sessions.get(replayable)
+        if session is None:
+            session = _sessions[replayable] = create_session(
+                pool_size=1, retries=DEFAULT_RETRIES,
+                retry_methods=['POST'] if replayable else None)
+    return session
+
+
+def get_timeout(auth_config):
+    timeout = auth_config.get('timeout') or DEFAULT_TIMEOUT
+    if isinstance(timeout, list):
+        timeout = tuple(timeout)
+    return timeout
+
 
 def add_arguments(login_parser):
     login_parser.add_argument('--keystone-api-url',
@@ -15,6 +57,14 @@ def add_arguments(login_parser):
                               help='[keystone plugin] keystone user to use')
 
 
+def requires_input(configuration):
+    """ Whether authenticate prompts for a password or passcode """
+    auth_config = configuration['auth']
+    if auth_config['type'] == 'password':
+        return not auth_config.get('password')
+    return auth_config['type'] == 'rax-rsa'
+
+
 def authenticate(configuration):
     auth_config = configuration['auth']
     _payload = {
@@ -39,9 +89,14 @@ def authenticate(configuration):
             'name': auth_config['domain']['name']
         }
 
-    response = requests.post(
-        os.environ.get(KEYSTONE_API_URL_ENV) or auth_config['url'],
-        json=_payload)
+    try:
+        response = get_session(
+            auth_config['type'] in REPLAYABLE_TYPES).post(
+            os.environ.get(KEYSTONE_API_URL_ENV) or auth_config['url'],
+            json=_payload,
+            timeout=get_timeout(auth_config))
+    except requests.exceptions.RequestException as e:
+        raise Exception('Error authenticating : {}'.format(e))
 
     if not response.ok:
         raise Exception('Error authenticating : {}'.format(
@@ -0,0 +1,156 @@
+""" Token store shared by mcli invocations
+
+Tokens are kept in a single JSON document keyed by mercury url. The
+expiration of each token is stored as a timestamp next to the handler's
+expires_at string, so reading the store does not parse dates. The document is
+only decoded again when the file changes, and it is always replaced
+atomically. Updates, and authentication itself, are serialized between
+processes with an exclusive lock on a sidecar lock file.
+"""
+import logging
+import os
+import time
+
+from datetime import datetime, timezone
+
+from mercury_sdk.files import atomic_write, file_lock
+from mercury_sdk.http.serializers import get_serializer
+
+LOG = logging.getLogger(__name__)
+
+# Tokens are renewed this many seconds before they expire
+DEFAULT_REFRESH_MARGIN = 300
+LOCK_SUFFIX = '.lock'
+
+_stores = {}
+
+
+def parse_expires_at(expires_at):
+    """ Convert an ISO 8601 expiration to a unix timestamp
+
+    :param expires_at: ie. 2018-04-19T21:43:01.000Z
+    :return: float
+    """
+    try:
+        parsed = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        # Python < 3.7, or a format fromisoformat does not understand
+        import dateutil.parser
+        parsed = dateutil.parser.parse(expires_at)
+    if parsed.tzinfo is None:
+        # Naive expirations are UTC
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class TokenStore(object):
+    def __init__(self, path, refresh_margin=DEFAULT_REFRESH_MARGIN,
+                 serializer=None):
+        """
+
+        :param path: The token file
+        :param refresh_margin: Seconds before expiration at which a token is
+        considered due for renewal
+        :param serializer: The JSON backend used for the file
+        """
+        self.path = os.path.expanduser(path)
+        self.refresh_margin = refresh_margin
+        self.serializer = get_serializer(serializer)
+        self._tokens = {}
+        self._signature = None
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _load(self):
+        """ Decode the token file if it changed since it was last read """
+        signature = self._stat_signature()
+        if signature == self._signature:
+            return self._tokens
+
+        tokens = {}
+        if signature:
+            try:
+                with open(self.path, 'rb') as fp:
+                    tokens = self.serializer.loads(fp.read())
+            except (IOError, OSError):
+                LOG.warning('Could not read token store: %s', self.path)
+            except ValueError:
+                LOG.warning('Ignoring corrupt token store: %s', self.path)
+            if not isinstance(tokens, dict):
+                tokens = {}
+        self._tokens = tokens
+        self._signature = signature
+        return tokens
+
+    def _write(self, tokens):
+        atomic_write(self.path, self.serializer.dumps(tokens))
+        self._tokens = tokens
+        self._signature = self._stat_signature()
+
+    def lock(self, blocking=True):
+        """ Hold the store's exclusive lock
+
+        :param blocking: Wait for the lock, otherwise yield False when another
+        process holds it
+        :return: Context manager yielding True when the lock is held
+        """
+        directory = os.path.dirname(self.path) or '.'
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        return file_lock(self.path + LOCK_SUFFIX, blocking)
+
+    def get(self, mercury_url):
+        """ The token data stored for mercury_url, expired or not
+
+        :param mercury_url:
+        :return: dict or None
+        """
+        return self._load().get(mercury_url)
+
+    @staticmethod
+    def is_valid(token_data):
+        return bool(token_data) and time.time() < token_data['expires']
+
+    def needs_refresh(self, token_data):
+        return not token_data or \
+            time.time() >= token_data['expires'] - self.refresh_margin
+
+    def put(self, mercury_url, token_data):
+        """ Store a token, the caller should hold the lock
+
+        :param mercury_url:
+        :param token_data: dict containing token and expires_at
+        :return: The stored token data
+        """
+        token_data = dict(token_data,
+                          expires=parse_expires_at(token_data['expires_at']))
+        tokens = dict(self._load())
+        tokens[mercury_url] = token_data
+        # Drop the tokens of other endpoints which have since expired
+        now = time.time()
+        tokens = dict((url, data) for url, data in tokens.items()
+                      if url == mercury_url or data.get('expires', 0) > now)
+        self._write(tokens)
+        return token_data
+
+    def delete(self, mercury_url):
+        """ Remove a token, the caller should hold the lock """
+        tokens = dict(self._load())
+        if tokens.pop(mercury_url, None) is not None:
+            self._write(tokens)
+
+
+def get_token_store(path):
+    """ TokenStore instances are shared, so a long running process, ie. the
+    mcli daemon, serves tokens from memory until the file changes
+    """
+    path = os.path.abspath(os.path.expanduser(path))
+    store = _stores.get(path)
+    if not store:
+        store = _stores[path] = TokenStore(path)
+    return store
@@ -0,0 +1,318 @@
+""" Optional background agent which serves mcli commands over a UNIX socket
+
+The agent keeps the mcli configuration, auth tokens and pooled HTTP
+connections warm between invocations. When it is running, inventory,
+rpc submit, rpc job and shell --run are forwarded to it and their output is
+streamed back. When it is not, mcli runs the command in process.
+
+Protocol: the client sends a single JSON line, either
+{"namespace": {...}} holding the parsed command line, or {"control": ...}.
+The agent answers with JSON lines, {"stdout": "..."} for output and a final
+{"exit": <code>}. When the command cannot be served without a terminal, ie.
+authenticating would prompt for a password, the agent answers {"local": true}
+instead and the client runs the command in process.
+"""
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+SOCKET_NAME = 'mcli.sock'
+LOG_NAME = 'mcli-daemon.log'
+START_TIMEOUT = 5
+
+
+# Options naming files, the agent runs from / so they are made absolute
+PATH_OPTIONS = ('config_file', 'token_cache', 'program_directory')
+
+
+def absolute_paths(namespace):
+    """ Make the path options of a parsed command line absolute """
+    for option in PATH_OPTIONS:
+        value = getattr(namespace, option, None)
+        if value:
+            setattr(namespace, option,
+                    os.path.abspath(os.path.expanduser(value)))
+    return namespace
+
+
+def socket_path(program_directory):
+    return os.path.join(program_directory, SOCKET_NAME)
+
+
+def forwardable(namespace):
+    """ Commands which the agent serves, they must not read local files or
+    prompt for input. Timings are measured in process.
+    """
+    if namespace.timings:
+        return False
+    if namespace.command == 'inventory':
+        return True
+    if namespace.command == 'rpc':
+        return namespace.rpc_command in ('submit', 'job')
+    if namespace.command == 'shell':
+        return bool(namespace.run)
+    return False
+
+
+def _connect(path):
+    if not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except (IOError, OSError):
+        sock.close()
+        return None
+    return sock
+
+
+def _send(sock, message):
+    sock.sendall((json.dumps(message) + '\n').encode('utf-8'))
+
+
+def forward(namespace):
+    """ Run a command through the agent
+
+    :param namespace: The parsed command line
+    :return: The exit code of the command, or None if the agent is not
+    running or the command must run in process
+    """
+    sock = _connect(socket_path(namespace.program_directory))
+    if not sock:
+        return None
+
+    request = dict(vars(absolute_paths(namespace)))
+    with sock:
+        try:
+            _send(sock, {'namespace': request})
+        except (IOError, OSError):
+            # The agent is shutting down, nothing has run yet
+            return None
+        with sock.makefile('r', encoding='utf-8') as fp:
+            for line in fp:
+                message = json.loads(line)
+                if 'stdout' in message:
+                    sys.stdout.write(message['stdout'])
+                    sys.stdout.flush()
+                elif 'exit' in message:
+                    return message['exit']
+                elif message.get('local'):
+                    LOG.debug('The mcli daemon cannot prompt, running the '
+                              'command in process')
+                    return None
+
+    print('The mcli daemon closed the connection')
+    return 1
+
+
+def _control(program_directory, command):
+    sock = _connect(socket_path(program_directory))
+    if not sock:
+        return None
+    with sock:
+        try:
+            _send(sock, {'control': command})
+            with sock.makefile('r', encoding='utf-8') as fp:
+                line = fp.readline()
+        except (IOError, OSError):
+            return None
+    return line and json.loads(line)
+
+
+def start(program_directory, verbosity=0, foreground=False):
+    program_directory = os.path.abspath(os.path.expanduser(program_directory))
+    if _control(program_directory, 'status'):
+        print('mcli daemon is already running')
+        return 0
+
+    if foreground:
+        serve(program_directory, verbosity)
+        return 0
+
+    import subprocess
+    with open(os.path.join(program_directory, LOG_NAME), 'a') as log_file:
+        subprocess.Popen(
+            [sys.executable, '-c',
+             'from mercury_sdk.mcli.daemon import serve; '
+             'serve({!r}, {!r})'.format(program_directory, verbosity)],
+            stdin=subprocess.DEVNULL, stdout=log_file, stderr=log_file,
+            cwd='/', start_new_session=True)
+
+    deadline = time.time() + START_TIMEOUT
+    while time.time() < deadline:
+        status = _control(program_directory, 'status')
+        if status:
+            print('mcli daemon started, pid: {}'.format(status['pid']))
+            return 0
+        time.sleep(.1)
+    print('mcli daemon did not start, see {}'.format(
+        os.path.join(program_directory, LOG_NAME)))
+    return 1
+
+
+def stop(program_directory):
+    if not _control(program_directory, 'stop'):
+        print('mcli daemon is not running')
+        return 1
+
+    path = socket_path(program_directory)
+    deadline = time.time() + START_TIMEOUT
+    while os.path.exists(path) and time.time() < deadline:
+        time.sleep(.1)
+    print('mcli daemon stopped')
+    return 0
+
+
+def status(program_directory):
+    _status = _control(program_directory, 'status')
+    if not _status:
+        print('mcli daemon is not running')
+        return 1
+    print(json.dumps(_status, indent=2))
+    return 0
+
+
+class _ThreadLocalStream(object):
+    """ Installed as sys.stdout in the agent, so that each request thread
+    writes to its own client
+    """
+    def __init__(self, default):
+        self._default = default
+        self._local = threading.local()
+
+    def set_target(self, stream):
+        self._local.stream = stream
+
+    @property
+    def target(self):
+        return getattr(self._local, 'stream', None) or self._default
+
+    def write(self, data):
+        return self.target.write(data)
+
+    def flush(self):
+        self.target.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+
+class _ClientStream(object):
+    """ File like object which frames output for the client """
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, data):
+        if data:
+            self.wfile.write(
+                (json.dumps({'stdout': data}) + '\n').encode('utf-8'))
+        return len(data)
+
+    def flush(self):
+        self.wfile.flush()
+
+
+def serve(program_directory, verbosity=0):
+    """ Run the agent until it is stopped """
+    import argparse
+    import socketserver
+
+    from mercury_sdk.mcli import main
+    from mercury_sdk.mcli import output
+    from mercury_sdk.mcli.auth import auth as mcli_auth
+    from mercury_sdk.mcli.configuration import read_config
+
+    output.setup_logging(verbosity)
+    path = socket_path(program_directory)
+    configurations = {}
+    stats = {'pid': os.getpid(), 'started': time.time(), 'requests': 0}
+    # Requests are handled by concurrent threads
+    stats_lock = threading.Lock()
+
+    def load_configuration(config_file):
+        """ Read the configuration once, and again when it is modified """
+        if not os.path.isfile(config_file):
+            return {}
+        mtime = os.stat(config_file).st_mtime
+        cached = configurations.get(config_file)
+        if not cached or cached[0] != mtime:
+            cached = mtime, read_config(config_file) or {}
+            configurations[config_file] = cached
+        return cached[1]
+
+    def configure(request):
+        namespace = argparse.Namespace(**request)
+        return main.merge_configuration(
+            namespace, load_configuration(namespace.config_file))
+
+    def requires_terminal(configuration):
+        """ The agent has no terminal to prompt for credentials on """
+        if configuration['no_auth'] or not configuration['auth'] or \
+                not configuration['auth_handler']:
+            return False
+        return mcli_auth.token_requires_input(configuration,
+                                              configuration['token_cache'])
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+            control = request.get('control')
+            if control:
+                with stats_lock:
+                    current = dict(stats)
+                self.reply(dict(current,
+                                uptime=time.time() - current['started']))
+                if control == 'stop':
+                    threading.Thread(target=self.server.shutdown).start()
+                return
+
+            with stats_lock:
+                stats['requests'] += 1
+            code = 0
+            local = False
+            sys.stdout.set_target(_ClientStream(self.wfile))
+            try:
+                configuration = configure(request['namespace'])
+                if requires_terminal(configuration):
+                    local = True
+                else:
+                    main.router(configuration['command'], configuration)
+            except SystemExit as system_exit:
+                code = system_exit.code if isinstance(system_exit.code,
+                                                      int) else 1
+            except (BrokenPipeError, ConnectionResetError):
+                LOG.debug('The client went away')
+                return
+            except Exception as e:
+                LOG.exception('Error serving request')
+                print('Error: {}'.format(e))
+                code = 1
+            finally:
+                sys.stdout.set_target(None)
+            self.reply({'local': True} if local else {'exit': code})
+
+        def reply(self, message):
+            self.wfile.write((json.dumps(message) + '\n').encode('utf-8'))
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    # The socket is only accessible by the owner
+    os.umask(0o077)
+    server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    server.daemon_threads = True
+    sys.stdout = _ThreadLocalStream(sys.stdout)
+
+    LOG.warning('mcli daemon listening on %s', path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.remove(path)
@@ -1,24 +1,147 @@
+""" Deploy servers with the press_static_assets preprocessor
+
+The asset database is split into chunks of chunk_size devices, and each chunk
+is submitted as its own preprocessor job targeting only the devices of the
+chunk, so the size of a submission does not grow with the asset database.
+
+Templates are identified by the digest of their content. When jinja2 is
+installed, a template is parsed before its first use, and the digests of
+valid templates are remembered in the cache directory so that unchanged
+templates are not parsed again. The digest is sent with every chunk.
+"""
+import hashlib
+import logging
+import os
+
 from mercury_sdk.rpc import job
+from mercury_sdk.rpc.monitor import JobMonitor
 
 from mercury_sdk.mcli import operations
+from mercury_sdk.mcli import output
 from mercury_sdk.mcli import press
 
+try:
+    import jinja2
+except ImportError:
+    jinja2 = None
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 250
+TEMPLATE_CACHE_DIRECTORY = 'templates'
+
+# digest -> template lines, for templates loaded by this process
+_templates = {}
+
+
+def template_digest(template_data):
+    return hashlib.sha256(template_data.encode('utf-8')).hexdigest()
+
+
+def validate_template(template_data):
+    """ Parse a template, when jinja2 is available
+
+    :raises: ValueError describing the syntax error
+    """
+    if not jinja2:
+        return
+    try:
+        jinja2.Environment().parse(template_data)
+    except jinja2.TemplateSyntaxError as e:
+        raise ValueError('line {}: {}'.format(e.lineno, e.message))
 
-def press_static_preprocessor(rpc_client, inv_client, template, query, hostname):
-    assets = press.build_press_asset_db_from_inv(inv_client, query, hostname)
 
-    with open(template) as fp:
+def load_template(path, cache_path=None):
+    """ Read and validate a template, each distinct template is validated
+    once
+
+    :param path: The template file
+    :param cache_path: Directory recording the digests of valid templates
+    :raises: ValueError if the template is not valid
+    :return: (digest, lines)
+    """
+    with open(path) as fp:
         template_data = fp.read()
+    digest = template_digest(template_data)
+    if digest in _templates:
+        return digest, _templates[digest]
+
+    marker = cache_path and os.path.join(cache_path, digest)
+    if marker and os.path.exists(marker):
+        log.debug('Template %s was validated previously', digest)
+    else:
+        validate_template(template_data)
+        if marker and jinja2:
+            if not os.path.isdir(cache_path):
+                os.makedirs(cache_path, 0o700)
+            open(marker, 'a').close()
+
+    lines = _templates[digest] = template_data.splitlines()
+    return digest, lines
+
+
+def chunk_assets(assets, chunk_size=DEFAULT_CHUNK_SIZE):
+    """ Split an asset database, keyed by mercury_id, into smaller
+    databases of at most chunk_size devices
+    """
+    mercury_ids = list(assets)
+    chunk_size = max(1, int(chunk_size))
+    return [dict((mercury_id, assets[mercury_id])
+                 for mercury_id in mercury_ids[i:i + chunk_size])
+            for i in range(0, len(mercury_ids), chunk_size)]
+
+
+def press_static_preprocessor(rpc_client, inv_client, template, query, hostname,
+                              rules=None, prefer=None,
+                              chunk_size=DEFAULT_CHUNK_SIZE, concurrency=8,
+                              cache_path=None):
+    try:
+        digest, template_lines = load_template(template, cache_path)
+    except (IOError, OSError) as e:
+        output.print_and_exit('Could not read template: {}'.format(e), 1)
+        return
+    except ValueError as e:
+        output.print_and_exit('Invalid template: {}'.format(e), 1)
+        return
+
+    assets = press.build_press_asset_db_from_inv(inv_client, query, hostname,
+                                                 rules, prefer)
+
+    preprocessors = []
+    for chunk in chunk_assets(assets, chunk_size):
+        instruction = {
+            'assets': chunk,
+            'template': template_lines,
+            'template_digest': digest
+        }
+        preprocessors.append(job.Preprocessor(
+            rpc_client, {'mercury_id': {'$in': list(chunk)}},
+            'press_static_assets', instruction))
+
+    failed = 0
+    try:
+        job.start_many(preprocessors, concurrency=concurrency)
+    except job.SubmissionError as e:
+        for _, error in e.failures:
+            log.error('Could not start preprocessor: %s', error)
+        failed = len(e.failures)
+        preprocessors = e.started
+        if not preprocessors:
+            output.print_and_exit('No preprocessor could be started', 1)
 
-    instruction = {
-        'assets': assets,
-        'template': template_data.splitlines()
-    }
+    for preprocessor in preprocessors:
+        print(operations.json_format({
+            'job_id': preprocessor.job_id,
+            'targets': preprocessor.targets,
+            'assets': len(preprocessor.instruction['assets'])
+        }))
 
-    preprocessor = job.Preprocessor(
-        rpc_client, operations.de(query), 'press_static_assets', instruction)
+    monitor = JobMonitor(preprocessors, concurrency=concurrency,
+                         poll_interval=2)
+    for preprocessor in monitor.as_completed():
+        print(operations.json_format(monitor.statuses[preprocessor.job_id]))
 
-    preprocessor.start()
-    print(operations.json_format(preprocessor.tasks))
-    preprocessor.join()
-    print(operations.json_format(preprocessor.status))
+    if failed:
+        output.print_and_exit(
+            '{} of {} preprocessors could not be started'.format(
+                failed, failed + len(preprocessors)), 1)
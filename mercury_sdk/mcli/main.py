@@ -1,18 +1,12 @@
 import argparse
-import colorama
 import json
 import logging
 import os
-import pkg_resources
+import sys
 
-from mercury_sdk.mcli import ansible
-from mercury_sdk.mcli import operations
+# Command modules, requests, yaml and colorama are imported where they are
+# used. mcli is often invoked from scripts and start up time matters.
 from mercury_sdk.mcli import output
-from mercury_sdk.mcli import press
-from mercury_sdk.mcli.deploy import static_assets
-from mercury_sdk.mcli import shell
-from mercury_sdk.mcli.auth import auth as mcli_auth
-from mercury_sdk.mcli.configuration import read_config
 
 LOG = logging.getLogger(__name__)
 
@@ -24,14 +18,12 @@ COMMANDS = [
 
 DEFAULT_PROGRAM_DIR = os.path.expanduser('~/.mercury-sdk')
 DEFAULT_CONFIG = os.path.join(DEFAULT_PROGRAM_DIR, 'mcli.yml')
-TOKEN_CACHE = os.path.join(DEFAULT_PROGRAM_DIR, '.token.yml')
+TOKEN_CACHE = os.path.join(DEFAULT_PROGRAM_DIR, '.tokens.json')
 
 MERCURY_API_URL_ENV = 'MERCURY_API_URL'
 MERCURY_API_USERNAME_ENV = 'MERCURY_API_USERNAME'
 MERCURY_API_QUERY_ENV = 'MERCURY_API_QUERY'
 
-program_version = pkg_resources.get_distribution('mercury-sdk').version
-
 query_help = """A mercury query to execute in valid JSON.
 Use "-" and the value will be read from 
 stdout use "@filename" and the query will be 
@@ -39,10 +31,29 @@ read from this file
 """
 
 
+def add_output_argument(parser):
+    parser.add_argument('-o', '--output', default='pretty',
+                        choices=['pretty', 'json', 'ndjson'],
+                        help='pretty or compact JSON, or ndjson: one record '
+                             'per line')
+
+
+def add_address_arguments(parser):
+    parser.add_argument('--subnet', action='append', default=None,
+                        help='Use an address within this network, ie. '
+                             '10.0.0.0/8. May be repeated')
+    parser.add_argument('--interface', action='append', default=None,
+                        help='Use an address of an interface matching this '
+                             'name or pattern, ie. eno*. May be repeated')
+    parser.add_argument('--ip-version', type=int, choices=[4, 6],
+                        default=None,
+                        help='Prefer addresses of this IP version')
+
+
 def options():
     parser = argparse.ArgumentParser(
         description='The Mercury Command Line Interface',
-        epilog='SDK version {}'.format(program_version))
+        epilog='SDK version {}'.format(output.get_program_version()))
     parser.add_argument('--version',
                         action='store_true', help='Display the program version')
     parser.add_argument('-c', '--config-file',
@@ -62,6 +73,18 @@ def options():
                              'really verbose')
 
     parser.add_argument('--no-auth', action='store_true', help='Skip authentication')
+    parser.add_argument('--no-daemon', action='store_true',
+                        help='Run in process, even if the mcli daemon is '
+                             'running')
+    parser.add_argument('--cache', action='store_true', default=None,
+                        help='Cache inventory queries in the program '
+                             'directory')
+    parser.add_argument('--cache-ttl', type=int, default=None,
+                        help='Seconds a cached inventory query is used before '
+                             'it is revalidated')
+    parser.add_argument('--timings', action='store_true',
+                        help='Print request, decode and job timings to '
+                             'stderr when the command completes')
     subparsers = parser.add_subparsers(dest='command', help='<command> --help')
 
     # login
@@ -98,6 +121,10 @@ def options():
                             help='Specify the key projection to produce the '
                                  'desired output')
     inv_parser.add_argument('-n', '--max-items', default=100)
+    inv_parser.add_argument('--all', dest='all_items', action='store_true',
+                            help='Stream every matching item, fetching '
+                                 'MAX_ITEMS per page')
+    add_output_argument(inv_parser)
     inv_parser.add_argument('-a', '--active',
                             help='Only search for active devices',
                             action='store_true')
@@ -122,6 +149,7 @@ def options():
     rpc_submit_parser.add_argument('-k', '--kwargs', default='{}')
     rpc_submit_parser.add_argument('-w', '--wait', action='store_true',
                                    help='Wait for the job to complete and print the results')
+    add_output_argument(rpc_submit_parser)
 
     rpc_job_parser = rpc_subparsers.add_parser('job', help='Get information about a job')
     rpc_job_parser.add_argument('job_id', help='A mercury job_id')
@@ -129,6 +157,7 @@ def options():
                                 help='Get status information for tasks')
     rpc_job_parser.add_argument('-t', '--tasks', action='store_true',
                                 help='Get task data')
+    add_output_argument(rpc_job_parser)
 
     rpc_list_parser = rpc_subparsers.add_parser('list', help='list device capabilities')
     rpc_list_parser.add_argument('target', help='The mercury id of the target')
@@ -149,6 +178,8 @@ def options():
                               help='Suppress command output')
     shell_parser.add_argument('--raw', default=False, action='store_true',
                               help='Do not print agent info, only the raw command output')
+    shell_parser.add_argument('-j', '--max-in-flight', type=int, default=4,
+                              help='The number of commands which may run at once')
 
     # press
     press_parser = subparsers.add_parser('press',
@@ -158,6 +189,23 @@ def options():
     press_parser.add_argument('-t', '--target', help='The mercury_id of a single target')
     press_parser.add_argument('-w', '--wait', action='store_true',
                               help='Wait for the job to complete and print the results')
+    press_parser.add_argument('-q', '--query', help=query_help)
+    press_parser.add_argument('--wave-size', type=int, default=None,
+                              help='Press the targets in waves of this many '
+                                   'devices, each with its own job')
+    press_parser.add_argument('--concurrency', type=int, default=8,
+                              help='Submissions and status requests in '
+                                   'flight during a wave')
+    press_parser.add_argument('--max-failure-rate', type=float, default=0.1,
+                              help='Halt the waves when more than this '
+                                   'fraction of devices have failed')
+    press_parser.add_argument('--state-file', default=None,
+                              help='Record the outcome of each device, and '
+                                   'resume the waves from it')
+    press_parser.add_argument('--wave-timeout', type=float, default=None,
+                              help='Seconds to wait for a wave, devices '
+                                   'which have not completed count as failed '
+                                   'and their jobs are waited for on resume')
 
     # deployment
     deployment_parser = subparsers.add_parser(
@@ -169,6 +217,13 @@ def options():
     #     '-a', '--asset-backend', help='The asset backend plugin to use')
     deployment_parser.add_argument('--template', required=True)
     deployment_parser.add_argument("--hostname", default='')
+    deployment_parser.add_argument(
+        '--chunk-size', type=int, default=250,
+        help='The number of assets sent with each preprocessor job')
+    deployment_parser.add_argument(
+        '--concurrency', type=int, default=8,
+        help='Submissions and status requests in flight')
+    add_address_arguments(deployment_parser)
 
     # ansible helpers
     ansible_parser = subparsers.add_parser(
@@ -176,10 +231,39 @@ def options():
         help='Helper commands for ansible'
     )
     ansible_sub_parsers = ansible_parser.add_subparsers(dest="ansible_command")
-    ansible_inventory_parser = ansible_sub_parsers.add_parser('inventory')
-    ansible_inventory_parser.add_argument("-q", "--query", required=True)
+    ansible_inventory_parser = ansible_sub_parsers.add_parser(
+        'inventory',
+        help='Print an INI host list, or with --list or --host, act as an '
+             'ansible dynamic inventory script')
+    ansible_inventory_parser.add_argument(
+        "-q", "--query", default=os.environ.get(MERCURY_API_QUERY_ENV),
+        help='{}Defaults to ${}'.format(query_help, MERCURY_API_QUERY_ENV))
     ansible_inventory_parser.add_argument("-u", "--user", default='root')
     ansible_inventory_parser.add_argument("--hostname-template", default='')
+    ansible_mode = ansible_inventory_parser.add_mutually_exclusive_group()
+    ansible_mode.add_argument('--list', dest='ansible_list',
+                              action='store_true',
+                              help='Print the dynamic inventory as JSON')
+    ansible_mode.add_argument('--host', dest='ansible_host', default=None,
+                              help='Print the variables of a host as JSON')
+    ansible_inventory_parser.add_argument(
+        '-g', '--group-by', action='append', default=None,
+        help='Group hosts by this inventory field, ie. origin.datacenter. '
+             'May be repeated')
+    ansible_inventory_parser.add_argument(
+        '--ttl', dest='ansible_ttl', type=int, default=None,
+        help='Seconds the dynamic inventory is cached, 0 disables the cache')
+    add_address_arguments(ansible_inventory_parser)
+
+    # daemon
+    daemon_parser = subparsers.add_parser(
+        'daemon',
+        help='Manage a background agent which keeps configuration, tokens '
+             'and connections warm for inventory, rpc and shell --run')
+    daemon_parser.add_argument('daemon_command',
+                               choices=['start', 'stop', 'status'])
+    daemon_parser.add_argument('--foreground', action='store_true',
+                               help='Do not detach from the terminal')
 
     namespace = parser.parse_args()
     if namespace.version:
@@ -198,33 +282,55 @@ def merge_configuration(namespace, configuration):
             output.print_and_exit('Mercury Service URL is undefined', 1)
         _program_configuration['mercury_url'] = _m
     _program_configuration['auth'] = configuration.get('auth')
+
+    _cache = configuration.get('cache') or {}
+    if namespace.cache is None:
+        _program_configuration['cache'] = _cache.get('enabled', False)
+    if namespace.cache_ttl is None:
+        _program_configuration['cache_ttl'] = _cache.get('ttl')
     _program_configuration['auth_handler'] = configuration.get('auth_handler')
+
+    if getattr(namespace, 'ansible_command', None) == 'inventory':
+        _ansible = configuration.get('ansible') or {}
+        if namespace.group_by is None:
+            _program_configuration['group_by'] = _ansible.get('group_by', [])
+        if namespace.ansible_ttl is None:
+            _program_configuration['ansible_ttl'] = _ansible.get('ttl')
     return _program_configuration
 
 
 def router(command, configuration):
+    from mercury_sdk.mcli import operations
+    from mercury_sdk.mcli.auth import auth as mcli_auth
+
     output.print_basic_info(configuration)
     if command == 'login':
 
-        token_data = mcli_auth.get_token(configuration, TOKEN_CACHE)
+        token_data = mcli_auth.get_token(configuration, configuration['token_cache'])
         if not configuration['quiet']:
             print('Expires: {expires_at}, Token: {token}'.format(**token_data))
         return
     elif command == 'logout':
-        mcli_auth.invalidate_token(configuration, TOKEN_CACHE)
+        mcli_auth.invalidate_token(configuration, configuration['token_cache'])
         return
 
     if not configuration['no_auth'] and configuration['auth'] and configuration['auth_handler']:
-        token = mcli_auth.get_token(configuration, TOKEN_CACHE)['token']
+        token = mcli_auth.get_token(configuration, configuration['token_cache'])['token']
     else:
         token = None
 
     if command == 'inventory':
         inv_client = operations.get_inventory_client(configuration, token)
         if configuration.get('mercury_id'):
-            print(operations.get_inventory(inv_client, configuration))
+            operations.write_document(
+                operations.get_inventory(inv_client, configuration),
+                fmt=configuration['output'])
+        elif configuration.get('all_items'):
+            operations.stream_inventory(inv_client, configuration)
         else:
-            print(operations.json_format(operations.query_inventory(inv_client, configuration)))
+            operations.write_document(
+                operations.query_inventory(inv_client, configuration),
+                key='items', fmt=configuration['output'])
 
     def _prepare_rpc():
         _rpc_client = operations.get_rpc_client(configuration, token)
@@ -249,12 +355,13 @@ def router(command, configuration):
         if rpc_command == 'submit':
             rpc_client, target_query = _prepare_rpc()
             kwargs = json.loads(configuration['kwargs'])
-            print(operations.make_rpc(rpc_client,
-                                      target_query,
-                                      configuration['method'],
-                                      configuration['args'],
-                                      kwargs,
-                                      wait=configuration.get('wait')))
+            operations.make_rpc(rpc_client,
+                                target_query,
+                                configuration['method'],
+                                configuration['args'],
+                                kwargs,
+                                wait=configuration.get('wait'),
+                                fmt=configuration['output'])
         if rpc_command == 'job':
             if configuration['tasks'] and configuration['status']:
                 output.print_and_exit('--tasks cannot be combined with --status')
@@ -262,13 +369,14 @@ def router(command, configuration):
             rpc_client = operations.get_rpc_client(configuration, token)
 
             if configuration['tasks']:
-                data = operations.get_tasks(rpc_client, configuration['job_id'])
+                operations.get_tasks(rpc_client, configuration['job_id'],
+                                     fmt=configuration['output'])
             elif configuration['status']:
-                data = operations.get_status(rpc_client, configuration['job_id'])
+                operations.get_status(rpc_client, configuration['job_id'],
+                                      fmt=configuration['output'])
             else:
-                data = operations.get_job(rpc_client, configuration['job_id'])
-
-            print(data)
+                operations.get_job(rpc_client, configuration['job_id'],
+                                   fmt=configuration['output'])
 
         if rpc_command == 'list':
             inv_client = operations.get_inventory_client(configuration, token)
@@ -278,14 +386,32 @@ def router(command, configuration):
             output.print_rpc_capabilities(data['active'])
 
     if command == 'press':
+        from mercury_sdk.mcli import press
+
         rpc_client, target_query = _prepare_rpc()
-        print(press.press_server(rpc_client, target_query, configuration['press_configuration']))
+        if configuration['wave_size']:
+            press.press_rollout(
+                rpc_client,
+                operations.get_inventory_client(configuration, token),
+                target_query, configuration['press_configuration'],
+                wave_size=configuration['wave_size'],
+                concurrency=configuration['concurrency'],
+                max_failure_rate=configuration['max_failure_rate'],
+                state_file=configuration['state_file'],
+                timeout=configuration['wave_timeout'])
+        else:
+            press.press_server(rpc_client, target_query,
+                               configuration['press_configuration'],
+                               wait=configuration.get('wait'))
 
     if command == 'shell':
+        from mercury_sdk.mcli import shell
+
         rpc_client, target_query = _prepare_rpc()
 
         mshell = shell.MercuryShell(rpc_client, initial_query=target_query,
-                                    quiet=configuration['quiet'], raw=configuration['raw'])
+                                    quiet=configuration['quiet'], raw=configuration['raw'],
+                                    max_in_flight=configuration['max_in_flight'])
 
         if configuration.get('run'):
             mshell.run_job(configuration.get('run').strip())
@@ -295,33 +421,100 @@ def router(command, configuration):
     if command == 'ansible':
         ansible_command = configuration['ansible_command']
         if ansible_command == 'inventory':
+            from mercury_sdk.mcli.ansible import inventory as ansible_inventory
+
+            if not configuration['query']:
+                output.print_and_exit('Must provide a query, with --query or '
+                                      '${}'.format(MERCURY_API_QUERY_ENV))
+
             inv_client = operations.get_inventory_client(configuration, token)
-            print(ansible.inventory.build_ansible_inventory(
+            if configuration['ansible_list'] or configuration['ansible_host']:
+                ttl = configuration['ansible_ttl']
+                rules, prefer = operations.address_rules(configuration)
+                inventory = ansible_inventory.cached_dynamic_inventory(
+                    inv_client,
+                    operations.de(configuration['query']),
+                    os.path.join(configuration['program_directory'],
+                                 ansible_inventory.CACHE_DIRECTORY),
+                    ttl=ansible_inventory.DEFAULT_TTL if ttl is None else ttl,
+                    group_by=configuration['group_by'],
+                    user=configuration['user'],
+                    hostname=configuration['hostname_template'],
+                    rules=rules, prefer=prefer)
+                if configuration['ansible_host']:
+                    inventory = inventory['_meta']['hostvars'].get(
+                        configuration['ansible_host'], {})
+                print(json.dumps(inventory))
+                return
+
+            rules, prefer = operations.address_rules(configuration)
+            print(ansible_inventory.build_ansible_inventory(
                 inv_client,
                 configuration['query'],
                 configuration['user'],
-                configuration['hostname_template']))
+                configuration['hostname_template'],
+                rules=rules, prefer=prefer))
 
     if command == 'deploy':
+        from mercury_sdk.mcli.deploy import static_assets
+
         inv_client = operations.get_inventory_client(configuration, token)
         rpc_client, target_query = _prepare_rpc()
 
         # print(operations.json_format(press.build_press_asset_db_from_inv(
         #     inv_client, configuration['query'], configuration['hostname'])))
 
+        rules, prefer = operations.address_rules(configuration)
         static_assets.press_static_preprocessor(
             rpc_client, inv_client, configuration['template'], configuration['query'],
-            configuration['hostname'])
+            configuration['hostname'], rules=rules, prefer=prefer,
+            chunk_size=configuration['chunk_size'],
+            concurrency=configuration['concurrency'],
+            cache_path=os.path.join(configuration['program_directory'],
+                                    static_assets.TEMPLATE_CACHE_DIRECTORY))
+
+
+def daemon_router(namespace):
+    from mercury_sdk.mcli import daemon
+
+    if namespace.daemon_command == 'start':
+        return daemon.start(namespace.program_directory, namespace.verbosity,
+                            foreground=namespace.foreground)
+    if namespace.daemon_command == 'stop':
+        return daemon.stop(namespace.program_directory)
+    return daemon.status(namespace.program_directory)
 
 
 def main():
-    colorama.init(autoreset=True)
-    namespace = options()
+    try:
+        run()
+    except BrokenPipeError:
+        # The reader of the output went away, ie. mcli inventory | head
+        output.discard_stdout()
+        sys.exit(1)
+
+
+def run():
+    from mercury_sdk.mcli import daemon
+    namespace = daemon.absolute_paths(options())
 
     if not os.path.exists(namespace.program_directory):
         os.makedirs(namespace.program_directory, 0o700)
 
+    if namespace.command == 'daemon':
+        sys.exit(daemon_router(namespace))
+
+    if not namespace.no_daemon:
+        if daemon.forwardable(namespace):
+            code = daemon.forward(namespace)
+            if code is not None:
+                sys.exit(code)
+
+    import colorama
+    colorama.init(autoreset=True)
+
     if os.path.isfile(namespace.config_file):
+        from mercury_sdk.mcli.configuration import read_config
         configuration = read_config(namespace.config_file)
     else:
         configuration = {}
@@ -330,4 +523,15 @@ def main():
 
     program_configuration = merge_configuration(namespace, configuration)
 
-    router(namespace.command, program_configuration)
+    if not namespace.timings:
+        router(namespace.command, program_configuration)
+        return
+
+    from mercury_sdk.metrics import hooks
+    from mercury_sdk.metrics.collector import MetricsCollector
+    collector = MetricsCollector()
+    hooks.add_hook(collector)
+    try:
+        router(namespace.command, program_configuration)
+    finally:
+        output.print_timings(collector)
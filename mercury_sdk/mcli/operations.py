@@ -1,17 +1,58 @@
 import json
-from mercury_sdk.http import inventory, rpc
+import os
+import sys
+
+from mercury_sdk.http import base, cache, inventory, rpc
 from mercury_sdk.rpc import job
 from mercury_sdk.mcli import output
 
+# All clients created by the cli share a single connection pool
+_session = None
+
+
+def get_session():
+    global _session
+    if not _session:
+        _session = base.create_session()
+    return _session
+
+
+def get_cache(configuration):
+    if not configuration.get('cache'):
+        return None
+    return cache.ResponseCache(
+        os.path.join(configuration['program_directory'], 'cache'),
+        ttl=configuration.get('cache_ttl') or cache.DEFAULT_TTL)
+
 
 def get_inventory_client(configuration, token=None):
     return inventory.InventoryComputers(
         configuration['mercury_url'],
         max_items=configuration.get('max_items', 250),
-        auth_token=token
+        auth_token=token,
+        session=get_session(),
+        cache=get_cache(configuration)
     )
 
 
+def address_rules(configuration):
+    """ Address selection rules from --subnet, --interface and --ip-version
+
+    :return: (rules, prefer)
+    """
+    from mercury_sdk.inventory import addresses
+
+    rules = []
+    if configuration.get('subnet'):
+        try:
+            rules.append(addresses.Subnet(*configuration['subnet']))
+        except ValueError as e:
+            output.print_and_exit('Invalid subnet: {}'.format(e))
+    if configuration.get('interface'):
+        rules.append(addresses.InterfaceName(*configuration['interface']))
+    return rules, configuration.get('ip_version')
+
+
 def json_format(data):
     return json.dumps(data, indent=2)
 
@@ -42,41 +83,142 @@ def query_inventory(client, configuration):
         strip_empty=True)
 
 
+def stream_inventory(client, configuration, stream=None):
+    """ Write every matching item as it arrives, following pagination.
+
+    The output has the same shape as query_inventory, but the items are
+    never held in memory as a whole.
+    """
+    query = de(configuration['query'])
+    if configuration.get('active'):
+        query.update({'active': {'$ne': None}})
+
+    write_items(client.iter_query(
+        query,
+        projection=configuration['projection'].split(','),
+        page_size=configuration['max_items'],
+        strip_empty_elements=True), stream=stream,
+        fmt=configuration.get('output', 'pretty'))
+
+
+OUTPUT_FORMATS = ('pretty', 'json', 'ndjson')
+
+
+def write_items(items, key='items', stream=None, fmt='pretty'):
+    """ Write items one at a time, as they are produced
+
+    pretty and json write a {"<key>": [...], "total": n} document, indented
+    or compact. ndjson writes one compact record per line.
+
+    :param items: An iterable of JSON serializable records
+    :param key: The key holding the list of items
+    :param stream: File like object to write to, defaults to stdout
+    :param fmt: One of OUTPUT_FORMATS
+    """
+    stream = stream or sys.stdout
+    if fmt == 'ndjson':
+        for item in items:
+            stream.write(json.dumps(item, separators=(',', ':')) + '\n')
+            stream.flush()
+        return
+
+    if fmt == 'json':
+        opening, separator, closing = '{{"{}":['.format(key), ',', \
+            '],"total":{}}}\n'
+    else:
+        opening, separator, closing = '{{\n  "{}": ['.format(key), ',', \
+            '\n  ],\n  "total": {}\n}}\n'
+
+    count = 0
+    stream.write(opening)
+    for item in items:
+        if count:
+            stream.write(separator)
+        if fmt == 'json':
+            stream.write(json.dumps(item, separators=(',', ':')))
+        else:
+            stream.write('\n    ')
+            stream.write(json.dumps(item, indent=2).replace('\n', '\n    '))
+        stream.flush()
+        count += 1
+    stream.write(closing.format(count))
+    stream.flush()
+
+
+def write_document(data, key=None, stream=None, fmt='pretty'):
+    """ Write a response
+
+    With ndjson, the records listed under key are written one per line.
+    The document is encoded to the stream in chunks rather than built as a
+    single string.
+
+    :param data: The decoded response
+    :param key: The key holding the records of the response, if any
+    :param stream: File like object to write to, defaults to stdout
+    :param fmt: One of OUTPUT_FORMATS
+    """
+    stream = stream or sys.stdout
+    if fmt == 'ndjson' and key and isinstance(data.get(key), list):
+        write_items(data[key], stream=stream, fmt=fmt)
+        return
+
+    if fmt == 'pretty':
+        json.dump(data, stream, indent=2)
+    else:
+        json.dump(data, stream, separators=(',', ':'))
+    stream.write('\n')
+    stream.flush()
+
+
 def get_inventory(client, configuration):
-    data = client.get(configuration['mercury_id'],
+    return client.get(configuration['mercury_id'],
                       projection=configuration['projection'].split(','))
-    return json.dumps(data, indent=2)
 
 
 def get_rpc_client(configuration, token=None):
     return rpc.JobInterfaceBase(
         configuration['mercury_url'],
-        auth_token=token)
+        auth_token=token,
+        session=get_session())
 
 
-def make_rpc(client, target_query, method, job_args, job_kwargs, wait=False):
-    _job = job.SimpleJob(client, target_query, method, job_args, job_kwargs)
-    _job.start()
+def write_job(_job, wait=False, stream=None, fmt='pretty'):
+    """ Write the job_id and targets of a started job, or when waiting, each
+    task as soon as it completes
 
+    :param _job: A started Job
+    :param wait: Wait for, and write, the tasks
+    :param stream: File like object to write to, defaults to stdout
+    :param fmt: One of OUTPUT_FORMATS
+    """
     if not wait:
-        return json.dumps({
+        write_document({
             'job_id': _job.job_id,
             'targets': _job.targets
-        }, indent=2)
+        }, stream=stream, fmt=fmt)
+        return
+
+    # Blocks until every RPC task completes
+    write_items(_job.iter_tasks(poll_interval=1), key='tasks', stream=stream,
+                fmt=fmt)
 
-    # Blocks and waits for RPC task to complete
-    _job.join(poll_interval=1)
 
-    return json.dumps(_job.tasks, indent=2)
+def make_rpc(client, target_query, method, job_args, job_kwargs, wait=False,
+             stream=None, fmt='pretty'):
+    _job = job.SimpleJob(client, target_query, method, job_args, job_kwargs)
+    _job.start()
+    write_job(_job, wait=wait, stream=stream, fmt=fmt)
 
 
-def get_job(client, job_id):
-    return json.dumps(client.get(job_id), indent=2)
+def get_job(client, job_id, stream=None, fmt='pretty'):
+    write_document(client.get(job_id), stream=stream, fmt=fmt)
 
 
-def get_status(client, job_id):
-    return json.dumps(client.status(job_id), indent=2)
+def get_status(client, job_id, stream=None, fmt='pretty'):
+    write_document(client.status(job_id), key='tasks', stream=stream,
+                   fmt=fmt)
 
 
-def get_tasks(client, job_id):
-    return json.dumps(client.tasks(job_id), indent=2)
+def get_tasks(client, job_id, stream=None, fmt='pretty'):
+    write_document(client.tasks(job_id), key='tasks', stream=stream,
+                   fmt=fmt)
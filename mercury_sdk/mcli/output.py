@@ -1,13 +1,49 @@
 import logging
+import os
 import sys
 
-import colorama
-import pkg_resources
-
 FORMAT = '%(message)s'
-program_version = pkg_resources.get_distribution('mercury-sdk').version
 LOG = logging.getLogger(__name__)
 
+DISTRIBUTION = 'mercury-sdk'
+# Present in source checkouts, used when the distribution is not installed
+VERSION_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'VERSION')
+
+_program_version = None
+
+
+def _distribution_version():
+    """ The version of the installed distribution, or None. pkg_resources is
+    only a fallback, importing it dominates the cli start up time.
+    """
+    try:
+        from importlib import metadata
+    except ImportError:
+        import pkg_resources
+        try:
+            return pkg_resources.get_distribution(DISTRIBUTION).version
+        except pkg_resources.DistributionNotFound:
+            return None
+    try:
+        return metadata.version(DISTRIBUTION)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def get_program_version():
+    """ Read the version from the installed distribution metadata, or from
+    the VERSION file when running from a source tree which is not installed
+    """
+    global _program_version
+    if _program_version:
+        return _program_version
+
+    _program_version = _distribution_version()
+    if not _program_version:
+        with open(VERSION_FILE) as fp:
+            _program_version = fp.read().strip()
+    return _program_version
+
 
 def setup_logging(verbosity):
     verbosity_map = {
@@ -37,6 +73,10 @@ def setup_logging(verbosity):
 
 
 def print_basic_info(configuration):
+    if not LOG.isEnabledFor(logging.WARNING):
+        return
+
+    import colorama
     LOG.warning('{}\n'
                 'Configuration file: {}'
                 '{}'
@@ -51,8 +91,9 @@ def print_basic_info(configuration):
 
 
 def format_version():
+    import colorama
     return 'SDK Version: {}{} {}'.format(
-        colorama.Fore.GREEN, program_version, colorama.Style.RESET_ALL)
+        colorama.Fore.GREEN, get_program_version(), colorama.Style.RESET_ALL)
 
 
 def print_and_exit(message, code=0):
@@ -60,10 +101,49 @@ def print_and_exit(message, code=0):
     sys.exit(code)
 
 
+def discard_stdout():
+    """ Point stdout at devnull once its reader has gone away, so that the
+    interpreter does not report another broken pipe flushing it at exit
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+
+
 def print_rpc_capabilities(active_data):
+    import colorama
     for name, capability in active_data['capabilities'].items():
         print('{}{}'.format(colorama.Fore.MAGENTA, name))
         print(colorama.Style.RESET_ALL)
         print('{}'.format(capability['description']))
         print('{}'.format(capability['doc']))
 
+
+def _format_seconds(value):
+    if value is None:
+        return '-'
+    if value < 1:
+        return '{:.1f}ms'.format(value * 1000)
+    return '{:.2f}s'.format(value)
+
+
+def print_timings(collector, stream=None):
+    """ Summarize a MetricsCollector, written to stderr so that it does not
+    mix with command output
+    """
+    stream = stream or sys.stderr
+    histograms, counters = collector.summary()
+    stream.write('Timings:\n')
+    for name, labels, count, p50, p95, _max, total in histograms:
+        stream.write('  {} {}\n    count={} p50={} p95={} max={} total={}\n'
+                     .format(name,
+                             ' '.join('{}={}'.format(k, v)
+                                      for k, v in sorted(labels.items())),
+                             count, _format_seconds(p50),
+                             _format_seconds(p95), _format_seconds(_max),
+                             _format_seconds(total)))
+    for name, labels, value in counters:
+        stream.write('  {} {} {}\n'.format(
+            name,
+            ' '.join('{}={}'.format(k, v) for k, v in sorted(labels.items())),
+            value))
+    stream.flush()
@@ -1,7 +1,10 @@
+import hashlib
 import json
+import sys
 
 import yaml
 
+from mercury_sdk.inventory.addresses import AddressIndex
 from mercury_sdk.mcli import operations
 from mercury_sdk.mcli import output
 from mercury_sdk.rpc import job
@@ -15,7 +18,7 @@ def configuration_from_yaml(filename):
         loaded. If the file can't be loaded, then the empty dict is returned.
     """
     with open(filename) as infile:
-        return yaml.load(infile.read())
+        return yaml.safe_load(infile)
 
 
 def press_server(client, target_query, configuration, wait=False):
@@ -29,39 +32,89 @@ def press_server(client, target_query, configuration, wait=False):
             'Could not load configuration file: {}'.format(e), 1)
         return
     _job.start()
+    operations.write_job(_job, wait=wait)
 
-    if not wait:
-        return json.dumps({
-            'job_id': _job.job_id,
-            'targets': _job.targets
-        }, indent=2)
 
-    _job.join(poll_interval=1)
+def press_rollout(client, inv_client, target_query, configuration,
+                  wave_size, concurrency=8, max_failure_rate=0.1,
+                  state_file=None, timeout=None):
+    """ Press every active device matching the query, in waves
 
-    return json.dumps(_job.tasks, indent=2)
+    :param client: rpc client
+    :param inv_client: inventory client, used to resolve the targets
+    :param target_query: The target query
+    :param configuration: Path to the press configuration
+    :param wave_size: Devices per wave
+    :param concurrency: Submissions and status requests in flight
+    :param max_failure_rate: Halt when exceeded, see Rollout
+    :param state_file: Optional state file, to resume the rollout
+    :param timeout: Seconds to wait for each wave
+    """
+    from mercury_sdk.rpc.job import RPCException
+    from mercury_sdk.rpc.rollout import Rollout, RolloutHalted
+
+    try:
+        press_configuration = configuration_from_yaml(configuration)
+    except (IOError, OSError) as e:
+        output.print_and_exit(
+            'Could not load configuration file: {}'.format(e), 1)
+        return
+
+    query = dict(target_query, active={'$ne': None})
+    targets = [device['mercury_id'] for device in
+               inv_client.iter_query(query, projection=['mercury_id'])]
+    if not targets:
+        output.print_and_exit('Query did not match any active targets')
 
+    def make_job(rpc_client, mercury_id):
+        return job.SimpleJob(rpc_client, {'mercury_id': mercury_id}, 'press',
+                             job_kwargs={'configuration': press_configuration})
 
-def build_press_asset_db_from_inv(client, query, hostname_template):
-    """ Simply adds the current ip to the asset store """
+    def progress(state, mercury_id, entry):
+        print('{:<10} {} {}'.format(state, mercury_id,
+                                    entry['error'] or entry['job_id']))
+        sys.stdout.flush()
 
-    projection = ["mercury_id", "interfaces"]
+    fingerprint = hashlib.sha1(json.dumps(
+        press_configuration, sort_keys=True, default=str).encode(
+        'utf-8')).hexdigest()
+    try:
+        rollout = Rollout(client, targets, make_job, wave_size=wave_size,
+                          concurrency=concurrency,
+                          max_failure_rate=max_failure_rate,
+                          state_file=state_file, fingerprint=fingerprint,
+                          timeout=timeout, progress=progress)
+    except RPCException as e:
+        output.print_and_exit(str(e), 1)
+        return
+
+    try:
+        rollout.run()
+    except RolloutHalted as e:
+        output.print_and_exit('{}\n{}'.format(
+            e, operations.json_format(rollout.summary())), 1)
+    print(operations.json_format(rollout.summary()))
+
+
+def build_press_asset_db_from_inv(client, query, hostname_template,
+                                  rules=None, prefer=None):
+    """ Simply adds the current ip to the asset store
+
+    :param rules: Address selection rules, see mercury_sdk.inventory.addresses
+    :param prefer: The preferred IP version, 4 or 6
+    """
     assets = {}
     q = operations.de(query)
     q.update({'active': {'$ne': None}})
-    data = operations.make_query(client, q, projection, limit=250, strip_empty=True)
+    index = AddressIndex.from_query(client, q, rules, prefer)
+    for counter, address in enumerate(index, 1):
+        assets[address.mercury_id] = {
+            'snet_ip_address': address.address,
+            'hostname': hostname_template.format(**dict(cnt=counter)),
+            'predictable_names': address.predictable_names
+        }
 
-    if not data["items"]:
+    if not assets:
         operations.output.print_and_exit("Query did not match any active targets")
 
-    counter = 0
-    for device in data['items']:
-        for interface in device['interfaces']:
-            if interface['address_info']:
-                counter += 1
-                assets[device['mercury_id']] = {
-                    'snet_ip_address': interface['address_info'][0]['addr'],
-                    'hostname': hostname_template.format(**dict(cnt=counter)),
-                    'predictable_names': interface['predictable_names']
-                }
-                break
     return assets
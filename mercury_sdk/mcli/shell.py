@@ -1,9 +1,11 @@
 import logging
+import sys
+import threading
 # TODO: modify cmd2 to support this use case
 # import cmd2
 
 import colorama
-from mercury_sdk.rpc.job import SimpleJob
+from mercury_sdk.rpc.job import RPCException, SimpleJob
 
 LOG = logging.getLogger(__name__)
 # PROMPT = f'{colorama.Style.BRIGHT}{colorama.Fore.LIGHTBLUE_EX}(♀)︎{colorama.Fore.MAGENTA}~>' \
@@ -15,35 +17,144 @@ PROMPT = '{}{}(♀)︎{}~>{} '.format(
     colorama.Fore.MAGENTA,
     colorama.Style.RESET_ALL)
 
+DEFAULT_MAX_IN_FLIGHT = 4
+
 
 class MercuryShell:
-    """ Ridiculously simple shell (no readline support) """
-    def __init__(self, rpc_client, prompt=PROMPT, initial_query=None, raw=False, quiet=False):
+    """ Ridiculously simple shell (no readline support)
+
+    Commands entered at the prompt run in the background, up to max_in_flight
+    at a time, and the output of each host is printed as soon as its task
+    completes. While jobs are running, a progress line is kept on stderr when
+    it is a terminal.
+    """
+    def __init__(self, rpc_client, prompt=PROMPT, initial_query=None, raw=False, quiet=False,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT, progress=None):
+        """
+
+        :param rpc_client: JobInterfaceBase
+        :param prompt: The input prompt
+        :param initial_query: The target query
+        :param raw: Only print the command output
+        :param quiet: Do not print the command output
+        :param max_in_flight: The number of jobs which may run at once, further
+        commands block until a job finishes
+        :param progress: Show the progress line, defaults to True when stderr
+        is a terminal
+        """
         self.rpc_client = rpc_client
         self.prompt = prompt
         self.query = initial_query
         self.raw = raw
         self.quiet = quiet
+        self.progress = sys.stderr.isatty() if progress is None else progress
 
-    def run_job(self, instruction):
-        instruction = 'bash -c "{}"'.format(instruction)
-        s = SimpleJob(self.rpc_client, self.query, 'run',
-                      job_args=[instruction])
-        s.start()
-        s.join(poll_interval=.2)
-        for t in s.tasks['tasks']:
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._print_lock = threading.Lock()
+        self._threads = []
+        # job_id -> [done, failed, targets]
+        self._counters = {}
+        self._progress_shown = False
+
+    def _clear_progress(self):
+        if self._progress_shown:
+            sys.stderr.write('\r\033[K')
+            sys.stderr.flush()
+            self._progress_shown = False
+
+    def _draw_progress(self):
+        if not self.progress or not self._counters:
+            return
+        done = failed = targets = 0
+        for _done, _failed, _targets in self._counters.values():
+            done += _done
+            failed += _failed
+            targets += _targets
+        sys.stderr.write('\r\033[K[{} running] done: {}, failed: {}, pending: {} / {}'.format(
+            len(self._counters), done, failed, targets - done - failed, targets))
+        sys.stderr.flush()
+        self._progress_shown = True
+
+    def print_task(self, job, task):
+        message = task.get('message') or {}
+        failed = message.get('returncode') != 0
+
+        with self._print_lock:
+            counters = self._counters.get(job.job_id)
+            if counters:
+                counters[1 if failed else 0] += 1
+            self._clear_progress()
             if not self.quiet:
                 if not self.raw:
-                    co = colorama.Fore.CYAN if t['message']['returncode'] == 0 \
-                        else colorama.Fore.LIGHTRED_EX
+                    co = colorama.Fore.LIGHTRED_EX if failed else colorama.Fore.CYAN
                     # print(f'{co}{t["mercury_id"]}{colorama.Style.RESET_ALL}\n')
-                    print('{}{}{}\n'.format(co, t["mercury_id"], colorama.Style.RESET_ALL))
-                stdout = t['message']['stdout']
+                    print('{}{}{}\n'.format(co, task["mercury_id"], colorama.Style.RESET_ALL))
+                stdout = message.get('stdout')
                 if stdout:
                     print(stdout)
-                stderr = t['message']['stderr']
+                stderr = message.get('stderr')
                 if stderr:
                     print(stderr)
+                if not message and task.get('traceback'):
+                    print(task['traceback'])
+                sys.stdout.flush()
+            self._draw_progress()
+
+    def _stream_job(self, job):
+        try:
+            for task in job.iter_tasks(poll_interval=.2, max_interval=2):
+                self.print_task(job, task)
+        except Exception as e:
+            LOG.exception('Error streaming job %s', job.job_id)
+            with self._print_lock:
+                self._clear_progress()
+                print('Error: job {}: {}'.format(job.job_id, e))
+        finally:
+            with self._print_lock:
+                self._counters.pop(job.job_id, None)
+                self._clear_progress()
+                self._draw_progress()
+            self._slots.release()
+
+    def run_job(self, instruction, wait=True):
+        """ Submit instruction to the targets and print the output of each
+        host as it completes
+
+        :param instruction: A bash command
+        :param wait: Block until all tasks have completed, otherwise the
+        output is printed from a background thread
+        :return: The SimpleJob
+        """
+        instruction = 'bash -c "{}"'.format(instruction)
+        s = SimpleJob(self.rpc_client, self.query, 'run',
+                      job_args=[instruction])
+
+        self._slots.acquire()
+        try:
+            s.start()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._print_lock:
+            self._counters[s.job_id] = [0, 0, s.targets]
+            self._draw_progress()
+
+        if wait:
+            self._stream_job(s)
+        else:
+            thread = threading.Thread(target=self._stream_job, args=(s,))
+            thread.daemon = True
+            self._threads = [t for t in self._threads if t.is_alive()]
+            self._threads.append(thread)
+            thread.start()
+        return s
+
+    def wait(self):
+        """ Block until every job in flight has completed """
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
 
     def input_loop(self):
         while True:
@@ -62,13 +173,25 @@ class MercuryShell:
             if instruction == 'exit':
                 break
 
+            if instruction == 'wait':
+                self.wait()
+                continue
+
             if instruction.strip()[0] == '!':
                 if not len(instruction) > 1:
                     print('Shell command missing')
                 print('THIS IS A SHELL ESCAPE: {}'.format(instruction[1:]))
                 continue
 
-            self.run_job(instruction)
+            try:
+                self.run_job(instruction, wait=False)
+            except RPCException as e:
+                print('Error: {}'.format(e))
+
+        try:
+            self.wait()
+        except KeyboardInterrupt:
+            print()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,155 @@
+""" In-memory histograms and counters built from instrumentation events """
+import bisect
+import threading
+
+# Upper bounds, in seconds
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60,
+                   300)
+
+
+class Histogram(object):
+    """ Cumulative bucket histogram, quantiles are interpolated within the
+    bucket they fall in
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # The last count is the +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """ Estimate a quantile
+
+        :param q: 0 <= q <= 1
+        :return: float, or None if nothing was observed
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                # Observed values bound the estimate at both ends
+                lower = max(lower, self.min)
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    def cumulative(self):
+        """ (upper bound, cumulative count) pairs, ending with +Inf """
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class MetricsCollector(object):
+    """ Hook which aggregates client and job events
+
+    Metrics are keyed by name and a sorted tuple of label pairs:
+
+    mercury_request_seconds{service,method,status}
+    mercury_request_errors_total{service,method,error}
+    mercury_request_retries_total{service,method}
+    mercury_sent_bytes_total{service}, mercury_received_bytes_total{service}
+    mercury_decode_seconds{service}
+    mercury_job_submit_seconds, mercury_job_polls_total
+    mercury_job_wait_seconds, mercury_job_completion_seconds
+
+    Usage:
+
+        collector = MetricsCollector()
+        hooks.add_hook(collector)
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def increment(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def __call__(self, event, **fields):
+        handler = getattr(self, '_on_' + event, None)
+        if handler:
+            handler(fields)
+
+    def _on_request_end(self, fields):
+        service = fields['service']
+        method = fields['method'].upper()
+        if fields['status'] is not None:
+            self.observe('mercury_request_seconds', fields['elapsed'],
+                         service=service, method=method,
+                         status=str(fields['status']))
+        if fields['error']:
+            self.increment('mercury_request_errors_total', service=service,
+                           method=method, error=fields['error'])
+        if fields['retries']:
+            self.increment('mercury_request_retries_total',
+                           fields['retries'], service=service, method=method)
+        self.increment('mercury_sent_bytes_total', fields['bytes_out'],
+                       service=service)
+        self.increment('mercury_received_bytes_total', fields['bytes_in'],
+                       service=service)
+
+    def _on_decode(self, fields):
+        self.observe('mercury_decode_seconds', fields['elapsed'],
+                     service=fields['service'])
+
+    def _on_job_submit(self, fields):
+        if fields['error']:
+            self.increment('mercury_job_submit_errors_total')
+        else:
+            self.observe('mercury_job_submit_seconds', fields['elapsed'])
+
+    def _on_job_poll(self, fields):
+        self.increment('mercury_job_polls_total')
+
+    def _on_job_complete(self, fields):
+        self.observe('mercury_job_wait_seconds', fields['elapsed'])
+        if fields['time_to_complete'] is not None:
+            self.observe('mercury_job_completion_seconds',
+                         fields['time_to_complete'])
+
+    def summary(self):
+        """ Rows of (name, labels, count, p50, p95, max, sum) for each
+        histogram, and (name, labels, value) for each counter
+        """
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        return ([(name, dict(labels), h.count, h.quantile(.5),
+                  h.quantile(.95), h.max, h.sum)
+                 for (name, labels), h in histograms],
+                [(name, dict(labels), value)
+                 for (name, labels), value in counters])
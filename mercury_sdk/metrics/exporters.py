@@ -0,0 +1,135 @@
+""" Export instrumentation in the Prometheus text format or to StatsD """
+import logging
+import socket
+
+from mercury_sdk.files import atomic_write
+
+log = logging.getLogger(__name__)
+
+DEFAULT_STATSD_PORT = 8125
+STATSD_PREFIX = 'mercury_sdk'
+
+
+def _format_labels(labels, extra=None):
+    pairs = sorted(labels.items()) + list(extra or ())
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs) + '}'
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+def prometheus_text(collector):
+    """ Render a MetricsCollector in the Prometheus text exposition format
+
+    :param collector: MetricsCollector
+    :return: str
+    """
+    lines = []
+    with collector._lock:
+        histograms = sorted(collector.histograms.items())
+        counters = sorted(collector.counters.items())
+
+    declared = set()
+    for (name, labels), histogram in histograms:
+        labels = dict(labels)
+        if name not in declared:
+            lines.append('# TYPE {} histogram'.format(name))
+            declared.add(name)
+        for bound, count in histogram.cumulative():
+            lines.append('{}_bucket{} {}'.format(
+                name, _format_labels(labels, [('le', _format_bound(bound))]),
+                count))
+        lines.append('{}_sum{} {}'.format(name, _format_labels(labels),
+                                          repr(histogram.sum)))
+        lines.append('{}_count{} {}'.format(name, _format_labels(labels),
+                                            histogram.count))
+
+    for (name, labels), value in counters:
+        if name not in declared:
+            lines.append('# TYPE {} counter'.format(name))
+            declared.add(name)
+        lines.append('{}{} {}'.format(name, _format_labels(dict(labels)),
+                                      value))
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(collector, path):
+    """ Atomically write the collector to path, ie. for the node_exporter
+    textfile collector
+    """
+    atomic_write(path, prometheus_text(collector))
+
+
+class StatsdHook(object):
+    """ Hook which sends each event to StatsD over UDP as it happens
+
+    Timings are sent in milliseconds, ie.
+    mercury_sdk.request.api_inventory_computers.post.200:12.5|ms
+    """
+    def __init__(self, host='127.0.0.1', port=DEFAULT_STATSD_PORT,
+                 prefix=STATSD_PREFIX):
+        """
+
+        :param host: The StatsD host
+        :param port: The StatsD UDP port
+        :param prefix: Prepended to every metric
+        """
+        self.address = (host, port)
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    @staticmethod
+    def _name(value):
+        return str(value).strip('/').replace('/', '_').replace('.', '_') \
+            .lower() or 'root'
+
+    def _send(self, *metrics):
+        payload = '\n'.join(
+            '{}.{}'.format(self.prefix, metric) for metric in metrics)
+        try:
+            self._socket.sendto(payload.encode('utf-8'), self.address)
+        except (IOError, OSError) as e:
+            log.debug('Could not send metrics to StatsD: %s', e)
+
+    def __call__(self, event, **fields):
+        if event == 'request_end':
+            name = 'request.{}.{}'.format(self._name(fields['service']),
+                                          fields['method'].lower())
+            metrics = ['{}.bytes_out:{}|c'.format(name, fields['bytes_out']),
+                       '{}.bytes_in:{}|c'.format(name, fields['bytes_in'])]
+            if fields['status'] is not None:
+                metrics.append('{}.{}:{:.3f}|ms'.format(
+                    name, fields['status'], fields['elapsed'] * 1000))
+            if fields['retries']:
+                metrics.append('{}.retries:{}|c'.format(name,
+                                                        fields['retries']))
+            if fields['error']:
+                metrics.append('{}.errors.{}:1|c'.format(
+                    name, self._name(fields['error'])))
+            self._send(*metrics)
+        elif event == 'decode':
+            self._send('decode.{}:{:.3f}|ms'.format(
+                self._name(fields['service']), fields['elapsed'] * 1000))
+        elif event == 'job_submit':
+            if fields['error']:
+                self._send('job.submit.errors:1|c')
+            else:
+                self._send('job.submit:{:.3f}|ms'.format(
+                    fields['elapsed'] * 1000))
+        elif event == 'job_poll':
+            self._send('job.polls:1|c')
+        elif event == 'job_complete':
+            metrics = ['job.wait:{:.3f}|ms'.format(fields['elapsed'] * 1000)]
+            if fields['time_to_complete'] is not None:
+                metrics.append('job.completion:{:.3f}|ms'.format(
+                    fields['time_to_complete'] * 1000))
+            self._send(*metrics)
+
+    def close(self):
+        self._socket.close()
@@ -0,0 +1,65 @@
+""" Instrumentation events emitted by the clients and jobs
+
+A hook is a callable accepting an event name and keyword fields. Hooks
+registered with add_hook receive the events of every client and job, hooks
+passed to a client constructor only receive the events of that client and
+of the jobs using it. When no hooks are registered, nothing is measured.
+
+Events and their fields, durations are in seconds:
+
+request_start
+    service, method, url
+request_end
+    service, method, url, status (None when no response was received),
+    elapsed, bytes_out, bytes_in, retries, error (the exception class name
+    or None)
+decode
+    service, url, elapsed, bytes_in
+job_submit
+    job_id (None when the submission failed), elapsed, targets, error
+job_poll
+    job_id
+job_complete
+    job_id, polls, elapsed (time spent waiting), time_to_complete (since the
+    job was started by this process, or None)
+"""
+import logging
+
+log = logging.getLogger(__name__)
+
+_hooks = []
+
+
+def add_hook(hook):
+    """ Receive the events of every client and job
+
+    :param hook: callable(event, **fields)
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def active(client_hooks=None):
+    """ Whether an event would be delivered anywhere, checked before
+    measuring
+    """
+    return bool(client_hooks or _hooks)
+
+
+def emit(client_hooks, event, **fields):
+    """ Deliver an event to the client's hooks and the global hooks. A
+    failing hook is logged and does not affect the request.
+
+    :param client_hooks: The hooks of the emitting client, or None
+    :param event: The event name
+    :param fields: The event fields
+    """
+    for hook in tuple(client_hooks or ()) + tuple(_hooks):
+        try:
+            hook(event, **fields)
+        except Exception:
+            log.exception('Instrumentation hook failed on %s', event)
@@ -0,0 +1,74 @@
+import random
+import time
+
+DEFAULT_FACTOR = 2
+DEFAULT_JITTER = 0.2
+DEFAULT_MAX_INTERVAL = 10
+
+
+class Backoff(object):
+    """ Exponential poll interval with jitter
+
+    Each call to next() returns the current interval and grows it by factor,
+    up to maximum. Jitter spreads the polls of jobs started together so they
+    do not hit the API in lock step.
+    """
+    def __init__(self, initial, maximum=DEFAULT_MAX_INTERVAL,
+                 factor=DEFAULT_FACTOR, jitter=DEFAULT_JITTER, deadline=None):
+        """
+
+        :param initial: The first interval, in seconds
+        :param maximum: The interval will never grow beyond this
+        :param factor: Multiplier applied after each interval
+        :param jitter: Fraction of the interval to randomly subtract
+        :param deadline: A time.time() value, intervals are clamped so that
+        the deadline is never overslept
+        """
+        self.initial = initial
+        self.maximum = max(initial, maximum)
+        self.factor = factor
+        self.jitter = jitter
+        self.deadline = deadline
+        self.interval = initial
+
+    @classmethod
+    def for_timeout(cls, initial, timeout=None, maximum=None, **kwargs):
+        """ Create a backoff bounded by an expected timeout
+
+        Without an explicit maximum, the interval is capped at a tenth of the
+        timeout, so that a job is observed promptly relative to how long it
+        is expected to run.
+        """
+        if maximum is None:
+            maximum = DEFAULT_MAX_INTERVAL
+            if timeout:
+                maximum = min(maximum, timeout / 10.0)
+        deadline = timeout and time.time() + timeout or None
+        return cls(initial, maximum=maximum, deadline=deadline, **kwargs)
+
+    @property
+    def expired(self):
+        return bool(self.deadline) and time.time() >= self.deadline
+
+    def reset(self):
+        self.interval = self.initial
+
+    def next(self):
+        """ Return the next interval to sleep """
+        interval = self.interval * (1 - self.jitter * random.random())
+        self.interval = min(self.interval * self.factor, self.maximum)
+        if self.deadline:
+            interval = max(0, min(interval, self.deadline - time.time()))
+        return interval
+
+    def sleep(self, event=None):
+        """ Sleep for the next interval
+
+        :param event: A threading.Event which interrupts the sleep when set
+        :return: True if the sleep was interrupted
+        """
+        interval = self.next()
+        if event is not None:
+            return event.wait(interval)
+        time.sleep(interval)
+        return False
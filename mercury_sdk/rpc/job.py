@@ -1,13 +1,82 @@
 import logging
+import threading
 import time
 
+from concurrent.futures import ThreadPoolExecutor
+
+from mercury_sdk.http.base import RequestTimeout, bound_timeout
+from mercury_sdk.metrics import hooks
+from mercury_sdk.rpc.backoff import Backoff
+from mercury_sdk.rpc.task import TaskSet
+
 log = logging.getLogger(__name__)
 
+# Shared by Job.join_async
+_join_executor = None
+JOIN_WORKERS = 32
+
+
+def get_join_executor():
+    global _join_executor
+    if not _join_executor:
+        _join_executor = ThreadPoolExecutor(max_workers=JOIN_WORKERS)
+    return _join_executor
+
 
 class RPCException(Exception):
     pass
 
 
+class JobTimeout(RPCException):
+    """ The job did not complete before the timeout given to join or
+    iter_tasks. The last status observed, if any, is available as .status
+    """
+    def __init__(self, job_id, timeout, status=None):
+        self.job_id = job_id
+        self.timeout = timeout
+        self.status = status
+        super(JobTimeout, self).__init__(
+            'Job {} did not complete within {} seconds'.format(job_id,
+                                                               timeout))
+
+
+class SubmissionError(RPCException):
+    """ Some of the jobs given to start_many could not be started
+
+    .jobs holds every job in submission order, the jobs which did start
+    have a job_id and are available as .started. .failures is a list of
+    (job, exception) pairs.
+    """
+    def __init__(self, jobs, failures):
+        self.jobs = jobs
+        self.failures = failures
+        super(SubmissionError, self).__init__(
+            '{} of {} jobs could not be started, first error: {}'.format(
+                len(failures), len(jobs), failures[0][1]))
+
+    @property
+    def started(self):
+        return [job for job in self.jobs if job.started]
+
+
+class JobCancelled(RPCException):
+    """ Waiting on the job was cancelled with Job.cancel """
+    def __init__(self, job_id):
+        self.job_id = job_id
+        super(JobCancelled, self).__init__(
+            'Waiting on job {} was cancelled'.format(job_id))
+
+
+def error_message(r):
+    """ The message of an error structure, whose data is either the message
+    or the decoded error response
+    """
+    data = r.get('data')
+    if isinstance(data, dict):
+        return data.get('message') or str(data)
+    return str(data)
+
+
 class Job(object):
     def __init__(self, rpc_client, query, instruction):
         """
@@ -23,26 +92,97 @@ class Job(object):
 
         self.job_id = None
         self.targets = 0
+        self._cancelled = threading.Event()
+        self._started_at = None
 
     @property
     def started(self):
         """ If a job_id is present, the job has been started"""
         return bool(self.job_id)
 
-    def start(self):
-        """ Start the job """
-        r = self.rpc_client.post(data={
+    @property
+    def payload(self):
+        """ The job submission body """
+        return {
             'query': self.query,
             'instruction': self.instruction
-        })
+        }
+
+    def start(self, timeout=None):
+        """ Start the job
+
+        :param timeout: Overrides the client's request timeout
+        """
+        submitted = time.perf_counter()
+        try:
+            if timeout is None:
+                r = self.rpc_client.post(data=self.payload)
+            else:
+                r = self.rpc_client.post(data=self.payload, timeout=timeout)
+            self._set_started(r)
+        except Exception as e:
+            self._emit_submit(submitted, e)
+            raise
+        self._emit_submit(submitted)
+
+    @property
+    def _hooks(self):
+        return getattr(self.rpc_client, 'hooks', None)
 
+    def _emit_submit(self, submitted, error=None):
+        if hooks.active(self._hooks):
+            hooks.emit(self._hooks, 'job_submit', job_id=self.job_id,
+                       elapsed=time.perf_counter() - submitted,
+                       targets=self.targets,
+                       error=error and error.__class__.__name__)
+
+    def _emit_complete(self, polls, waiting_since):
+        if hooks.active(self._hooks):
+            now = time.time()
+            hooks.emit(self._hooks, 'job_complete', job_id=self.job_id,
+                       polls=polls, elapsed=now - waiting_since,
+                       time_to_complete=(now - self._started_at
+                                         if self._started_at else None))
+
+    def _set_started(self, r):
+        """ Record the job_id and targets of a submission response
+
+        :param r: The response from the jobs endpoint
+        :raises: RPCException if the submission failed
+        """
         if r.get('error'):
-            if isinstance(r['data'], str):
-                raise RPCException(r['data'])
-            raise RPCException(r['data']['message'])
+            raise RPCException(error_message(r))
 
         self.job_id = r['job_id']
         self.targets = r['targets']
+        self._started_at = time.time()
+
+    def cancel(self):
+        """ Stop waiting on the job
+
+        join and iter_tasks, in any thread, wake up and raise JobCancelled.
+        The job itself is not stopped on the server.
+        """
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def _fetch(self, method, deadline=None):
+        """ Call a job endpoint, bounding the request timeout by deadline
+
+        The remaining time is split between the attempts the client may
+        make, so that retries of a timed out request also end by the deadline.
+        Clients without a timeout attribute are called without a timeout.
+        """
+        if hooks.active(self._hooks):
+            hooks.emit(self._hooks, 'job_poll', job_id=self.job_id)
+        if not deadline or not hasattr(self.rpc_client, 'timeout'):
+            return method(self.job_id)
+        attempts = 1 + (getattr(self.rpc_client, 'retries', None) or 0)
+        return method(self.job_id, timeout=bound_timeout(
+            self.rpc_client.timeout, (deadline - time.time()) / attempts))
 
     @property
     def raw(self):
@@ -62,26 +202,240 @@ class Job(object):
         if self.started:
             return self.rpc_client.tasks(self.job_id)
 
+    @property
+    def task_set(self):
+        """ Get the jobs tasks as a TaskSet """
+        if self.started:
+            r = self.tasks
+            if r.get('error'):
+                raise RPCException(error_message(r))
+            return TaskSet.from_response(r)
+
     @property
     def is_running(self):
         """ Check if the job is running or not """
         return self.started and not self.status['time_completed']
 
-    def join(self, timeout=None, poll_interval=2):
-        """
+    def join(self, timeout=None, poll_interval=2, max_interval=None,
+             callback=None, raise_timeout=False):
+        """ Wait for the job to complete
 
-        :param timeout:
-        :param poll_interval:
-        :return: Tasks structure
+        The status endpoint is polled at poll_interval, backing off
+        exponentially (with jitter) up to max_interval. When a timeout is
+        given, max_interval defaults to a tenth of it, and no status request
+        is allowed to run past it.
+
+        :param timeout: Give up after this many seconds
+        :param poll_interval: The initial interval between status checks
+        :param max_interval: The longest interval between status checks
+        :param callback: Called with the final status when the job completes
+        :param raise_timeout: Raise JobTimeout rather than returning None
+        when the timeout is reached
+        :raises: RPCException if the status cannot be fetched
+        :raises: JobCancelled if cancel is called
+        :return: The status structure, or None if the timeout was reached
         """
         if self.started:
-            started = time.time()
+            backoff = Backoff.for_timeout(poll_interval, timeout=timeout,
+                                          maximum=max_interval)
+            waiting_since = time.time()
+            polls = 0
+            status = None
             while True:
-                if not self.is_running:
-                    return self.status
-                if timeout and time.time() - started > timeout:
-                    break
-                time.sleep(poll_interval)
+                if self.cancelled:
+                    raise JobCancelled(self.job_id)
+                polls += 1
+                try:
+                    status = self._fetch(self.rpc_client.status,
+                                         backoff.deadline)
+                except RequestTimeout:
+                    if not backoff.expired:
+                        raise
+                else:
+                    if status.get('error'):
+                        raise RPCException(error_message(status))
+                    if status['time_completed']:
+                        self._emit_complete(polls, waiting_since)
+                        if callback:
+                            callback(status)
+                        return status
+                if backoff.expired:
+                    if raise_timeout:
+                        raise JobTimeout(self.job_id, timeout, status)
+                    return None
+                if backoff.sleep(self._cancelled):
+                    raise JobCancelled(self.job_id)
+
+    def iter_tasks(self, timeout=None, poll_interval=1, max_interval=None,
+                   raise_timeout=False):
+        """ Yield each task once, as soon as it completes
+
+        The tasks endpoint is polled with the same backoff as join. Tasks
+        whose time_updated and time_completed have not changed since the
+        previous poll are skipped, and only the ids of completed tasks are
+        retained, so memory does not grow with the size of the task payloads.
+
+        :param timeout: Give up after this many seconds
+        :param poll_interval: The initial interval between polls
+        :param max_interval: The longest interval between polls
+        :param raise_timeout: Raise JobTimeout rather than stopping when the
+        timeout is reached
+        :raises: RPCException if the tasks or status cannot be fetched
+        :raises: JobCancelled if cancel is called
+        """
+        if not self.started:
+            return
+
+        backoff = Backoff.for_timeout(poll_interval, timeout=timeout,
+                                      maximum=max_interval)
+        completed = set()
+        last_updated = {}
+        waiting_since = time.time()
+        polls = 0
+        while True:
+            if self.cancelled:
+                raise JobCancelled(self.job_id)
+            polls += 1
+            try:
+                r = self._fetch(self.rpc_client.tasks, backoff.deadline)
+            except RequestTimeout:
+                if not backoff.expired:
+                    raise
+                r = {'tasks': []}
+            if r.get('error'):
+                raise RPCException(error_message(r))
+
+            finished, outstanding = self._new_completions(
+                r['tasks'], completed, last_updated)
+            for task in finished:
+                yield task
+            progressed = bool(finished)
+
+            if len(completed) >= self.targets:
+                self._emit_complete(polls, waiting_since)
+                return
+            # Every known task is done, defer to the job for the rest
+            if not outstanding:
+                try:
+                    status = self._fetch(self.rpc_client.status,
+                                         backoff.deadline)
+                except RequestTimeout:
+                    if not backoff.expired:
+                        raise
+                else:
+                    if status.get('error'):
+                        raise RPCException(error_message(status))
+                    if status['time_completed']:
+                        self._emit_complete(polls, waiting_since)
+                        return
+            if backoff.expired:
+                if raise_timeout:
+                    raise JobTimeout(self.job_id, timeout)
+                return
+            if progressed:
+                backoff.reset()
+            if backoff.sleep(self._cancelled):
+                raise JobCancelled(self.job_id)
+
+    @staticmethod
+    def _new_completions(tasks, completed, last_updated):
+        """ Find the tasks of a poll which completed since the previous poll
+
+        :param tasks: The tasks returned by the tasks endpoint
+        :param completed: The ids of the tasks already yielded, updated
+        :param last_updated: task_id -> (time_updated, time_completed) of the
+        outstanding tasks at the previous poll, updated
+        :return: (newly completed tasks, number of outstanding tasks)
+        """
+        finished = []
+        outstanding = 0
+        for task in tasks:
+            task_id = task['task_id']
+            if task_id in completed:
+                continue
+            if not task['time_completed']:
+                outstanding += 1
+            # A task may complete without time_updated changing
+            seen = (task['time_updated'], task['time_completed'])
+            if last_updated.get(task_id) == seen:
+                continue
+            last_updated[task_id] = seen
+            if task['time_completed']:
+                completed.add(task_id)
+                del last_updated[task_id]
+                finished.append(task)
+        return finished, outstanding
+
+    def join_async(self, timeout=None, poll_interval=2, max_interval=None,
+                   callback=None, raise_timeout=False):
+        """ Join in a background thread
+
+        Accepts the same arguments as join, cancel stops the background
+        join.
+
+        :return: concurrent.futures.Future which resolves to the join result
+        """
+        return get_join_executor().submit(self.join, timeout=timeout,
+                                          poll_interval=poll_interval,
+                                          max_interval=max_interval,
+                                          callback=callback,
+                                          raise_timeout=raise_timeout)
+
+
+def start_many(jobs, concurrency=8, timeout=None, bulk_submit=None):
+    """ Start many jobs, at most concurrency submissions in flight
+
+    The jobs should share an rpc client, so that submissions reuse its
+    pooled connections. Jobs which are already started are left alone.
+
+    Where the server offers a bulk submission endpoint, pass bulk_submit, a
+    callable accepting a list of job payloads and returning a list of
+    submission responses in the same order, and a single request is made.
+    Jobs left without a response are reported as failures.
+
+    :param jobs: An iterable of Job instances
+    :param concurrency: The maximum number of submissions in flight
+    :param timeout: Overrides the client's timeout for each submission
+    :param bulk_submit: Optional bulk submission callable
+    :raises: SubmissionError if any job could not be started, after every
+    job has been attempted
+    :return: The jobs, in the order given
+    """
+    jobs = list(jobs)
+    pending = [job for job in jobs if not job.started]
+    failures = []
+
+    if bulk_submit and pending:
+        responses = list(bulk_submit([job.payload for job in pending]))
+        if len(responses) != len(pending):
+            log.warning('bulk_submit returned %s responses for %s jobs',
+                        len(responses), len(pending))
+        for i, job in enumerate(pending):
+            if i >= len(responses):
+                failures.append((job, RPCException(
+                    'No submission response for the job')))
+                continue
+            try:
+                job._set_started(responses[i])
+            except RPCException as e:
+                failures.append((job, e))
+    elif pending:
+        def start(job):
+            try:
+                job.start(timeout=timeout)
+            except Exception as e:
+                log.debug('Could not start job: %s', e)
+                return e
+
+        workers = max(1, min(concurrency, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for job, error in zip(pending, executor.map(start, pending)):
+                if error is not None:
+                    failures.append((job, error))
+
+    if failures:
+        raise SubmissionError(jobs, failures)
+    return jobs
 
 
 class SimpleJob(Job):
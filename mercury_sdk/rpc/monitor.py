@@ -0,0 +1,130 @@
+import logging
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from mercury_sdk.http.base import RequestTimeout
+from mercury_sdk.rpc.backoff import Backoff
+from mercury_sdk.rpc.job import RPCException
+
+log = logging.getLogger(__name__)
+
+
+class JobMonitor(object):
+    """ Track many started jobs from a single polling loop
+
+    Each round checks the status of every pending job, at most concurrency
+    requests at a time, then sleeps on a backoff shared by all jobs. The
+    backoff resets whenever a round observes a completion.
+
+    Where the server offers a batch status endpoint, pass batch_status, a
+    callable accepting a list of job_ids and returning a dict of
+    job_id -> status, and each round is a single request.
+    """
+    def __init__(self, jobs=None, concurrency=8, poll_interval=1,
+                 max_interval=10, batch_status=None):
+        """
+
+        :param jobs: Started Job instances to monitor
+        :param concurrency: Maximum number of status requests in flight
+        :param poll_interval: The initial interval between rounds
+        :param max_interval: The longest interval between rounds
+        :param batch_status: Optional batch status callable
+        """
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.max_interval = max_interval
+        self.batch_status = batch_status
+
+        self.pending = OrderedDict()
+        self.statuses = {}
+        self._cancelled = threading.Event()
+        self._deadline = None
+
+        for job in jobs or ():
+            self.add(job)
+
+    def add(self, job):
+        """ Begin monitoring a started job
+
+        :param job: A Job instance
+        :raises: RPCException if the job has not been started
+        """
+        if not job.started:
+            raise RPCException('Job has not been started')
+        self.pending[job.job_id] = job
+
+    def __len__(self):
+        return len(self.pending)
+
+    def cancel(self):
+        """ Stop as_completed and wait, from any thread. Jobs which have not
+        completed remain in pending.
+        """
+        self._cancelled.set()
+
+    def _fetch_statuses(self, executor):
+        job_ids = list(self.pending)
+        if self.batch_status:
+            return self.batch_status(job_ids)
+
+        def fetch(job_id):
+            job = self.pending[job_id]
+            try:
+                return job_id, job._fetch(job.rpc_client.status,
+                                          self._deadline)
+            except RequestTimeout as e:
+                return job_id, e.error
+
+        return dict(executor.map(fetch, job_ids))
+
+    def poll(self, executor):
+        """ Run a single round of status checks
+
+        :return: A list of jobs which completed during this round
+        """
+        completed = []
+        for job_id, status in self._fetch_statuses(executor).items():
+            if status.get('error'):
+                log.warning('Could not get status for %s: %s', job_id,
+                            status)
+                continue
+            if status['time_completed']:
+                self.statuses[job_id] = status
+                completed.append(self.pending.pop(job_id))
+        return completed
+
+    def as_completed(self, timeout=None):
+        """ Yield jobs as they complete, the final status of each job is
+        available in statuses, keyed by job_id.
+
+        :param timeout: Give up after this many seconds
+        :raises: concurrent.futures.TimeoutError if jobs are still pending
+        when the timeout is reached
+        """
+        backoff = Backoff.for_timeout(self.poll_interval, timeout=timeout,
+                                      maximum=self.max_interval)
+        self._deadline = backoff.deadline
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while self.pending and not self._cancelled.is_set():
+                completed = self.poll(executor)
+                for job in completed:
+                    yield job
+
+                if not self.pending:
+                    break
+                if backoff.expired:
+                    raise TimeoutError(
+                        '{} jobs are still pending'.format(len(self.pending)))
+                if completed:
+                    backoff.reset()
+                backoff.sleep(self._cancelled)
+
+    def wait(self, timeout=None):
+        """ Block until every job completes
+
+        :param timeout: Give up after this many seconds
+        :return: A list of the completed jobs, in completion order
+        """
+        return list(self.as_completed(timeout=timeout))
@@ -0,0 +1,240 @@
+""" Roll a job out to many devices in waves
+
+The targets are split into waves of wave_size devices. Each device gets its
+own job; the jobs of a wave are started together and monitored until they
+all complete, then the next wave begins. After each wave the failure rate of
+the devices attempted so far is compared to max_failure_rate, and the rollout
+halts when it is exceeded.
+
+With a state file, the outcome of every device is recorded as it completes.
+Running the rollout again with the same state file skips the devices which
+succeeded, retries those which failed, and resumes monitoring jobs which were
+still running, or had timed out, instead of starting them twice.
+"""
+import logging
+import os
+
+from concurrent.futures import TimeoutError
+
+from mercury_sdk.files import atomic_write
+from mercury_sdk.http.serializers import get_serializer
+from mercury_sdk.rpc.job import Job, RPCException, SubmissionError, start_many
+from mercury_sdk.rpc.monitor import JobMonitor
+
+log = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+# The job did not complete within the wave timeout and may still be running
+TIMED_OUT = 'timed_out'
+# Devices in these states have a job on the server which a resumed run
+# monitors rather than starting another
+IN_FLIGHT = (RUNNING, TIMED_OUT)
+
+
+class RolloutHalted(RPCException):
+    """ The failure rate exceeded the threshold, the state is saved and the
+    rollout may be resumed
+    """
+    def __init__(self, failed, attempted, max_failure_rate):
+        self.failed = failed
+        self.attempted = attempted
+        self.max_failure_rate = max_failure_rate
+        super(RolloutHalted, self).__init__(
+            'Rollout halted, {} of {} devices failed, the threshold is '
+            '{:.0%}'.format(failed, attempted, max_failure_rate))
+
+
+class Rollout(object):
+    def __init__(self, rpc_client, targets, make_job, wave_size=10,
+                 concurrency=8, max_failure_rate=0.1, state_file=None,
+                 fingerprint=None, timeout=None, poll_interval=5,
+                 max_interval=30, progress=None):
+        """
+
+        :param rpc_client: JobInterfaceBase client shared by every job
+        :param targets: The mercury_ids to roll out to, in order
+        :param make_job: Callable, make_job(rpc_client, mercury_id), which
+        returns an unstarted Job targeting the device
+        :param wave_size: The number of devices in each wave
+        :param concurrency: The maximum number of submissions and status
+        requests in flight
+        :param max_failure_rate: Halt when more than this fraction of the
+        devices attempted by this run have failed
+        :param state_file: Optional file recording the outcome of each
+        device, used to resume the rollout
+        :param fingerprint: Identifies the work being rolled out, ie. a
+        digest of the job instruction. A state file with another fingerprint
+        is refused.
+        :param timeout: Seconds to wait for the jobs of a wave, devices which
+        have not completed are recorded as timed out. They count as failures,
+        and a resumed run waits for their jobs.
+        :param poll_interval: The initial interval between status rounds
+        :param max_interval: The longest interval between status rounds
+        :param progress: Callable, progress(event, mercury_id, entry), called
+        when a device is started, succeeds or fails
+        """
+        self.rpc_client = rpc_client
+        self.targets = list(targets)
+        self.make_job = make_job
+        self.wave_size = max(1, int(wave_size))
+        self.concurrency = concurrency
+        self.max_failure_rate = max_failure_rate
+        self.state_file = state_file and os.path.expanduser(state_file)
+        self.fingerprint = fingerprint
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.max_interval = max_interval
+        self.progress = progress
+        self.serializer = get_serializer()
+
+        # mercury_id -> {'state', 'job_id', 'error'}
+        self.devices = {}
+        self.attempted = 0
+        self.failed = 0
+        if self.state_file and os.path.exists(self.state_file):
+            self.load()
+
+    def load(self):
+        with open(self.state_file, 'rb') as fp:
+            state = self.serializer.loads(fp.read())
+        if state.get('version') != STATE_VERSION or \
+                state.get('fingerprint') != self.fingerprint:
+            raise RPCException(
+                '{} belongs to another rollout'.format(self.state_file))
+        self.devices = state['devices']
+
+    def save(self):
+        if not self.state_file:
+            return
+        atomic_write(self.state_file, self.serializer.dumps({
+            'version': STATE_VERSION,
+            'fingerprint': self.fingerprint,
+            'devices': self.devices
+        }))
+
+    @property
+    def pending(self):
+        """ Targets which have not succeeded, and have no job in flight """
+        return [mercury_id for mercury_id in self.targets
+                if self.devices.get(mercury_id, {}).get('state') not in
+                (SUCCEEDED,) + IN_FLIGHT]
+
+    def waves(self):
+        pending = self.pending
+        return [pending[i:i + self.wave_size]
+                for i in range(0, len(pending), self.wave_size)]
+
+    def _record(self, mercury_id, state, job_id=None, error=None):
+        entry = self.devices[mercury_id] = {
+            'state': state, 'job_id': job_id, 'error': error}
+        if state != RUNNING:
+            self.attempted += 1
+            if state in (FAILED, TIMED_OUT):
+                self.failed += 1
+        if self.progress:
+            self.progress(state, mercury_id, entry)
+        return entry
+
+    def _resume_job(self, mercury_id, job_id):
+        job = Job(self.rpc_client, {'mercury_id': mercury_id}, None)
+        job.job_id = job_id
+        job.targets = 1
+        return job
+
+    def _start(self, wave):
+        """ Start the jobs of a wave, recording devices which could not be
+        started as failed
+
+        :return: dict of job_id -> mercury_id for the started jobs
+        """
+        jobs = [self.make_job(self.rpc_client, mercury_id)
+                for mercury_id in wave]
+        failures = {}
+        try:
+            start_many(jobs, concurrency=self.concurrency)
+        except SubmissionError as e:
+            failures = dict((id(job), error) for job, error in e.failures)
+
+        started = {}
+        for mercury_id, job in zip(wave, jobs):
+            if id(job) in failures:
+                self._record(mercury_id, FAILED,
+                             error=str(failures[id(job)]))
+            else:
+                started[job.job_id] = mercury_id
+                self._record(mercury_id, RUNNING, job_id=job.job_id)
+        self.save()
+        return started
+
+    def _wait(self, started):
+        """ Monitor the jobs of a wave until they complete or time out """
+        monitor = JobMonitor(
+            [self._resume_job(mercury_id, job_id)
+             for job_id, mercury_id in started.items()],
+            concurrency=self.concurrency, poll_interval=self.poll_interval,
+            max_interval=self.max_interval)
+        try:
+            for job in monitor.as_completed(timeout=self.timeout):
+                status = monitor.statuses[job.job_id]
+                if status.get('has_failures'):
+                    self._record(started[job.job_id], FAILED,
+                                 job_id=job.job_id, error='The job failed')
+                else:
+                    self._record(started[job.job_id], SUCCEEDED,
+                                 job_id=job.job_id)
+                self.save()
+        except TimeoutError:
+            for job_id in list(monitor.pending):
+                self._record(started[job_id], TIMED_OUT, job_id=job_id,
+                             error='Timed out after {} seconds'.format(
+                                 self.timeout))
+            self.save()
+
+    def run(self):
+        """ Roll out to every pending device, wave by wave
+
+        :raises: RolloutHalted when the failure rate exceeds the threshold
+        :return: The failure rate of the devices attempted by this run
+        """
+        # Jobs left running, or timed out, by a previous run are waited for
+        # first
+        running = dict((entry['job_id'], mercury_id) for mercury_id, entry
+                       in self.devices.items()
+                       if entry['state'] in IN_FLIGHT and
+                       mercury_id in self.targets)
+        if running:
+            log.info('Resuming %s jobs', len(running))
+            self._wait(running)
+            self._check()
+
+        waves = self.waves()
+        for number, wave in enumerate(waves, 1):
+            log.info('Starting wave %s of %s, %s devices', number,
+                     len(waves), len(wave))
+            started = self._start(wave)
+            if started:
+                self._wait(started)
+            self._check()
+        return self.failure_rate
+
+    @property
+    def failure_rate(self):
+        return self.attempted and float(self.failed) / self.attempted
+
+    def _check(self):
+        if self.failure_rate > self.max_failure_rate:
+            raise RolloutHalted(self.failed, self.attempted,
+                                self.max_failure_rate)
+
+    def summary(self):
+        """ The number of targets in each state, pending included """
+        counts = {'pending': 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0,
+                  TIMED_OUT: 0}
+        for mercury_id in self.targets:
+            state = self.devices.get(mercury_id, {}).get('state', 'pending')
+            counts[state] += 1
+        return counts
@@ -22,30 +22,182 @@ class Task(object):
         'ttl_time_completed'
     ]
 
-    def _create_attributes(self, kwargs):
-        """
-        Doing it this way means I can just pass **task into Task. Live long
-        and prosper. (Downside is you lose tab complete in ipython/pycharm)
-        :param kwargs:
-        :return:
-        """
-        missing = []
-        for key in self.keys:
-            if key not in kwargs:
-                missing.append(key)
+    # Potentially large payloads, these can be resolved on access
+    lazy_keys = ('message', 'traceback')
+    _eager_keys = tuple(sorted(set(keys) - set(lazy_keys)))
 
+    __slots__ = _eager_keys + ('_message', '_traceback', '_raw')
+
+    @classmethod
+    def _check_keys(cls, data, keys):
+        missing = [key for key in keys if key not in data]
         if missing:
             # This shouldn't ever happen
             raise ValueError('{} are missing. Shame.'.format(
                 ','.join(missing)
             ))
 
-        for key in self.keys:
-            self.__setattr__(key, kwargs[key])
+    @classmethod
+    def from_dict(cls, data, lazy=False):
+        """ Build a task from a task record returned by the tasks endpoint
+
+        :param data: The task dictionary
+        :param lazy: Keep a reference to data and only resolve message and
+        traceback when they are accessed
+        :return: Task
+        """
+        cls._check_keys(data, cls._eager_keys if lazy else cls.keys)
+
+        task = object.__new__(cls)
+        _set = object.__setattr__
+        for key in cls._eager_keys:
+            _set(task, key, data[key])
+
+        if lazy:
+            _set(task, '_raw', data)
+        else:
+            _set(task, '_raw', None)
+            _set(task, '_message', data['message'])
+            _set(task, '_traceback', data['traceback'])
+        return task
 
     def __init__(self, **kwargs):
         """
+        Tasks are immutable, passing **task into Task is equivalent to
+        Task.from_dict(task)
 
         :param kwargs:
         """
-        self._create_attributes(kwargs)
+        self._check_keys(kwargs, self.keys)
+
+        _set = object.__setattr__
+        for key in self._eager_keys:
+            _set(self, key, kwargs[key])
+        _set(self, '_raw', None)
+        _set(self, '_message', kwargs['message'])
+        _set(self, '_traceback', kwargs['traceback'])
+
+    @property
+    def message(self):
+        if self._raw is not None:
+            return self._raw.get('message')
+        return self._message
+
+    @property
+    def traceback(self):
+        if self._raw is not None:
+            return self._raw.get('traceback')
+        return self._traceback
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Task is immutable')
+
+    def __delattr__(self, key):
+        raise AttributeError('Task is immutable')
+
+    def __repr__(self):
+        return '<Task task_id={} mercury_id={} status={}>'.format(
+            self.task_id, self.mercury_id, self.status)
+
+    def to_dict(self):
+        return dict((key, getattr(self, key)) for key in self.keys)
+
+
+class TaskSet(object):
+    """ Columnar view over the task records of a job
+
+    The raw task dictionaries are kept as decoded, the commonly filtered
+    fields are extracted into columns once, and filtering only produces a
+    new index into the shared columns. Task objects are only built by
+    tasks().
+    """
+    columns = ('task_id', 'mercury_id', 'status', 'returncode',
+               'time_completed')
+
+    def __init__(self, records, _columns=None, _index=None):
+        """
+
+        :param records: A list of task dictionaries
+        """
+        self._records = records
+        self._columns = _columns or self._build_columns(records)
+        self._index = range(len(records)) if _index is None else _index
+
+    @classmethod
+    def from_response(cls, response):
+        """ Build a TaskSet from a tasks endpoint response
+
+        :param response: dict containing a tasks list
+        :return: TaskSet
+        """
+        return cls(response['tasks'])
+
+    @staticmethod
+    def _returncode(record):
+        message = record.get('message')
+        if isinstance(message, dict):
+            return message.get('returncode')
+
+    @classmethod
+    def _build_columns(cls, records):
+        return {
+            'task_id': [r['task_id'] for r in records],
+            'mercury_id': [r['mercury_id'] for r in records],
+            'status': [r['status'] for r in records],
+            'returncode': [cls._returncode(r) for r in records],
+            'time_completed': [r['time_completed'] for r in records]
+        }
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        """ Iterate over the raw task dictionaries """
+        for i in self._index:
+            yield self._records[i]
+
+    def column(self, name):
+        """ Return the values of a column for the tasks in this set
+
+        :param name: One of TaskSet.columns
+        :return: list
+        """
+        values = self._columns[name]
+        return [values[i] for i in self._index]
+
+    def filter(self, status=None, returncode=None, completed=None):
+        """ Select tasks by status and/or returncode
+
+        :param status: A status or a collection of statuses
+        :param returncode: A returncode or a collection of returncodes
+        :param completed: True for completed tasks, False for pending tasks
+        :return: TaskSet sharing the records of this set
+        """
+        index = self._index
+
+        def _match(wanted):
+            if isinstance(wanted, (list, tuple, set, frozenset)):
+                wanted = set(wanted)
+                return lambda value: value in wanted
+            return lambda value: value == wanted
+
+        for name, wanted in (('status', status),
+                             ('returncode', returncode)):
+            if wanted is None:
+                continue
+            match = _match(wanted)
+            values = self._columns[name]
+            index = [i for i in index if match(values[i])]
+
+        if completed is not None:
+            values = self._columns['time_completed']
+            index = [i for i in index if bool(values[i]) == completed]
+
+        return TaskSet(self._records, _columns=self._columns, _index=index)
+
+    def tasks(self, lazy=True):
+        """ Materialize Task objects for the tasks in this set
+
+        :param lazy: See Task.from_dict
+        """
+        return [Task.from_dict(record, lazy=lazy) for record in self]
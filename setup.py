@@ -35,6 +35,10 @@ setup(
         'python-dateutil',
         'colorama'
     ],
+    extras_require={
+        'aio': ['aiohttp'],
+        'orjson': ['orjson']
+    },
     entry_points={
        'console_scripts': [
            'mcli=mercury_sdk.mcli.main:main'
@@ -0,0 +1,91 @@
+import copy
+import json
+import os
+import threading
+
+import pytest
+import requests
+
+from requests.structures import CaseInsensitiveDict
+
+RESOURCES = os.path.join(os.path.dirname(__file__), 'resources')
+
+
+def load_resource(name):
+    with open(os.path.join(RESOURCES, name)) as fp:
+        return json.load(fp)
+
+
+def make_response(status_code, data=None, headers=None, url=''):
+    r = requests.Response()
+    r.status_code = status_code
+    r._content = b'' if data is None else json.dumps(data).encode('utf-8')
+    r.headers = CaseInsensitiveDict(headers or {})
+    r.url = url
+    r.reason = 'Stub'
+    return r
+
+
+class StubSession(object):
+    """ Stands in for requests.Session, handler(method, url, params, body,
+    headers) returns (status_code, data) or (status_code, data, headers)
+    """
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                verify=True, timeout=None):
+        body = json.loads(data) if data else None
+        with self._lock:
+            self.requests.append((method, url, dict(params or {}), body,
+                                  dict(headers or {})))
+        result = self.handler(method, url, dict(params or {}), body,
+                              dict(headers or {}))
+        return make_response(*result, url=url)
+
+    def close(self):
+        pass
+
+
+def matches(record, query):
+    for key, wanted in query.items():
+        value = record.get(key)
+        if isinstance(wanted, dict):
+            if '$in' in wanted and value not in wanted['$in']:
+                return False
+        elif value != wanted:
+            return False
+    return True
+
+
+class StubInventory(object):
+    """ The inventory query endpoint, paging on _id after offset_id """
+    def __init__(self, records):
+        self.records = records
+
+    def __call__(self, method, url, params, body, headers):
+        if not url.endswith('/query'):
+            return 404, {'message': 'Not found'}
+        limit = int(params.get('limit', 100))
+        offset_id = params.get('offset_id')
+        items = []
+        for record in self.records:
+            if offset_id and record['_id'] <= offset_id:
+                continue
+            if matches(record, body['query']):
+                items.append(copy.deepcopy(record))
+                if len(items) >= limit:
+                    break
+        return 200, {'items': items, 'limit': limit}
+
+
+@pytest.fixture
+def inventory_records():
+    return load_resource('inventory.json')
+
+
+@pytest.fixture
+def inventory_session(inventory_records):
+    return StubSession(StubInventory(inventory_records))
@@ -0,0 +1,115 @@
+import pytest
+
+from mercury_sdk.http.inventory import InventoryComputers
+from mercury_sdk.inventory.addresses import (AddressIndex, InterfaceName,
+                                             Subnet, parse_address)
+
+
+def interface(devname, *addresses, **predictable_names):
+    return {'devname': devname,
+            'predictable_names': predictable_names,
+            'address_info': [{'addr': address} for address in addresses]}
+
+
+def record(mercury_id, *interfaces):
+    return {'mercury_id': mercury_id, 'interfaces': list(interfaces)}
+
+
+DUAL_STACK = record(
+    'dual',
+    interface('lo', '127.0.0.1', '::1'),
+    interface('eth0', 'fe80::1%eth0', '10.0.0.1', '2001:db8::1',
+              predictable_id='eno1'),
+    interface('eth1', '192.168.1.1', 'fd00::1'))
+
+
+def test_parse_address_drops_the_scope():
+    assert str(parse_address('fe80::1%eth0')) == 'fe80::1'
+    assert parse_address('not an address') is None
+
+
+def test_first_address_is_primary_without_rules():
+    index = AddressIndex()
+    address = index.add(record('m', interface('eth0', '10.0.0.1',
+                                              '10.0.0.2')))
+    assert address.address == '10.0.0.1'
+    assert address.version == 4
+    assert address.devname == 'eth0'
+
+
+def test_link_local_addresses_are_never_primary():
+    index = AddressIndex()
+    address = index.add(record('m', interface('eth0', 'fe80::1%eth0',
+                                              '169.254.0.1', '10.0.0.1')))
+    assert address.address == '10.0.0.1'
+    assert index.add(record('n', interface('eth0', 'fe80::2'))) is None
+    assert 'n' not in index
+    # Link local addresses are still found by lookup
+    assert index.lookup('fe80::2') == 'n'
+
+
+@pytest.mark.parametrize('prefer, expected', [
+    (None, '127.0.0.1'),
+    (4, '127.0.0.1'),
+    (6, '::1'),
+])
+def test_prefer(prefer, expected):
+    assert AddressIndex(prefer=prefer).add(DUAL_STACK).address == expected
+
+
+@pytest.mark.parametrize('rules, expected', [
+    ([Subnet('10.0.0.0/8')], '10.0.0.1'),
+    ([Subnet('172.16.0.0/12', '192.168.0.0/16')], '192.168.1.1'),
+    ([Subnet('fd00::/8')], 'fd00::1'),
+    ([InterfaceName('eth1')], '192.168.1.1'),
+    ([InterfaceName('en*')], '10.0.0.1'),
+    ([InterfaceName('eth*'), Subnet('2001:db8::/32')], '2001:db8::1'),
+])
+def test_rules(rules, expected):
+    assert AddressIndex(rules=rules).add(DUAL_STACK).address == expected
+
+
+def test_rules_and_prefer_combine():
+    index = AddressIndex(rules=[InterfaceName('eth1')], prefer=6)
+    address = index.add(DUAL_STACK)
+    assert address.address == 'fd00::1'
+    assert address.version == 6
+
+
+def test_preferred_version_falls_back_to_the_other():
+    index = AddressIndex(prefer=6)
+    assert index.add(record('m', interface('eth0', '10.0.0.1'))).address == \
+        '10.0.0.1'
+
+
+def test_unmatched_records_have_no_primary():
+    index = AddressIndex(rules=[Subnet('10.0.0.0/8')])
+    assert index.add(record('m', interface('eth0', '192.168.0.1'))) is None
+    assert index.add({'mercury_id': 'bare'}) is None
+    assert index.get('m') is None
+    assert len(index) == 0
+
+
+def test_every_address_is_indexed_for_lookup():
+    index = AddressIndex(rules=[Subnet('10.0.0.0/8')])
+    index.add(DUAL_STACK)
+    assert index.lookup('192.168.1.1') == 'dual'
+    assert index.lookup('fd00::1') == 'dual'
+    assert index.lookup('10.9.9.9') is None
+
+
+def test_predictable_names_are_kept():
+    address = AddressIndex(rules=[Subnet('10.0.0.0/8')]).add(DUAL_STACK)
+    assert address.predictable_names == {'predictable_id': 'eno1'}
+
+
+def test_from_query(inventory_session, inventory_records):
+    client = InventoryComputers('http://mercury', session=inventory_session)
+    index = AddressIndex.from_query(client, {}, rules=[InterfaceName('eno1')])
+    assert [address.mercury_id for address in index] == \
+        [record['mercury_id'] for record in inventory_records]
+    assert [address.address for address in index][:2] == \
+        ['10.0.0.1', '10.0.0.2']
+    assert index.get(inventory_records[0]['mercury_id']).devname == 'eth0'
+    params = inventory_session.requests[0][2]
+    assert params['projection'] == 'mercury_id,interfaces'
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from mercury_sdk.aio.job import AsyncSimpleJob
+from mercury_sdk.rpc.job import RPCException
+
+from tests.conftest import load_resource
+from tests.test_job import StubClient, task
+
+
+class AsyncStubClient(StubClient):
+    """ StubClient with coroutine endpoints """
+    async def post(self, data):
+        return super(AsyncStubClient, self).post(data)
+
+    async def tasks(self, job_id):
+        return super(AsyncStubClient, self).tasks(job_id)
+
+    async def status(self, job_id):
+        return super(AsyncStubClient, self).status(job_id)
+
+
+def collect(client, targets=1, **kwargs):
+    async def run():
+        job = AsyncSimpleJob(client, {}, 'echo')
+        await job.start()
+        job.targets = targets
+        return [t async for t in job.iter_tasks(poll_interval=0.001,
+                                                **kwargs)]
+    return asyncio.run(run())
+
+
+def test_iter_tasks_yields_completion_without_time_updated_change():
+    client = AsyncStubClient(
+        [{'tasks': [task(1.0, None)]}, {'tasks': [task(1.0, 5.0)]}],
+        [{'time_completed': None}])
+    assert collect(client) == [task(1.0, 5.0)]
+
+
+def test_iter_tasks_defers_to_the_job_status():
+    client = AsyncStubClient([{'tasks': [task(1.0, None)]},
+                              {'tasks': [task(2.0, 2.0)]}],
+                             [{'time_completed': None},
+                              {'time_completed': 3.0}])
+    assert collect(client, targets=2) == [task(2.0, 2.0)]
+
+
+def test_iter_tasks_stops_at_the_timeout():
+    client = AsyncStubClient([{'tasks': [task(1.0, None)]}],
+                             [{'time_completed': None}])
+    assert collect(client, timeout=0.05) == []
+
+
+def test_iter_tasks_error():
+    client = AsyncStubClient([{'error': True, 'code': 404,
+                               'data': {'message': 'Job not found'}}])
+    with pytest.raises(RPCException) as e:
+        collect(client)
+    assert str(e.value) == 'Job not found'
+
+
+def test_task_set_is_awaitable():
+    async def run(client):
+        job = AsyncSimpleJob(client, {}, 'echo')
+        unstarted = await job.task_set
+        await job.start()
+        return unstarted, await job.task_set
+
+    client = AsyncStubClient([load_resource('tasks.json')])
+    unstarted, task_set = asyncio.run(run(client))
+    assert unstarted is None
+    assert task_set.filter(status='SUCCESS').column('returncode') == [0, 1]
+
+
+def test_task_set_error():
+    client = AsyncStubClient([{'error': True, 'code': 500, 'data': 'down'}])
+
+    async def run():
+        job = AsyncSimpleJob(client, {}, 'echo')
+        await job.start()
+        return await job.task_set
+
+    with pytest.raises(RPCException):
+        asyncio.run(run())
+
+
+def test_join_raises_status_errors():
+    client = AsyncStubClient([], [{'error': True, 'code': 404,
+                                   'data': {'message': 'Job not found'}}])
+
+    async def run():
+        job = AsyncSimpleJob(client, {}, 'echo')
+        await job.start()
+        return await job.join(poll_interval=0.001)
+
+    with pytest.raises(RPCException) as e:
+        asyncio.run(run())
+    assert str(e.value) == 'Job not found'
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+
+from mercury_sdk.aio.base import AsyncInterfaceBase  # noqa: E402
+
+
+async def disconnecting_server(hits):
+    """ Reads a request, then closes the connection without answering """
+    async def handle(reader, writer):
+        await reader.readuntil(b'\r\n\r\n')
+        hits.append(1)
+        writer.close()
+
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
+
+
+async def request(method, hits):
+    server = await disconnecting_server(hits)
+    port = server.sockets[0].getsockname()[1]
+    client = AsyncInterfaceBase('http://127.0.0.1:{}'.format(port),
+                                retries=2, backoff_factor=0)
+    try:
+        async with server:
+            await client._request(method, data={} if method == 'post'
+                                  else None)
+    finally:
+        await client.close()
+
+
+def test_post_is_not_replayed_after_disconnect():
+    hits = []
+    with pytest.raises(aiohttp.ServerDisconnectedError):
+        asyncio.run(request('post', hits))
+    assert len(hits) == 1
+
+
+def test_get_is_retried_after_disconnect():
+    hits = []
+    with pytest.raises(aiohttp.ServerDisconnectedError):
+        asyncio.run(request('get', hits))
+    # aiohttp may itself repeat an idempotent request once per attempt
+    assert len(hits) >= 3
+
+
+def test_post_is_retried_when_the_connection_is_refused():
+    attempts = []
+
+    async def run():
+        client = AsyncInterfaceBase('http://127.0.0.1:9', retries=2,
+                                    backoff_factor=0)
+        client._backoff = lambda attempt: attempts.append(attempt) or \
+            asyncio.sleep(0)
+        try:
+            await client._request('post', data={})
+        finally:
+            await client.close()
+
+    with pytest.raises(aiohttp.ClientConnectorError):
+        asyncio.run(run())
+    assert attempts == [0, 1]
+
+
+def test_missing_aiohttp_is_reported(monkeypatch):
+    from mercury_sdk.aio import base
+    monkeypatch.setattr(base, 'aiohttp', None)
+    with pytest.raises(RuntimeError) as e:
+        AsyncInterfaceBase('http://mercury')
+    assert 'mercury-sdk[aio]' in str(e.value)
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+
+from mercury_sdk.http.inventory import InventoryComputers
+from mercury_sdk.mcli.ansible import inventory
+
+from tests.conftest import StubInventory, StubSession
+
+
+def client(session):
+    return InventoryComputers('http://mercury', session=session)
+
+
+def test_group_name_is_ansible_safe():
+    assert inventory.group_name('dmi.sys_vendor', 'Dell Inc.') == \
+        'dmi_sys_vendor_Dell_Inc_'
+
+
+def test_lookup():
+    record = {'dmi': {'sys_vendor': 'HP'}, 'cpu': [1]}
+    assert inventory.lookup(record, 'dmi.sys_vendor') == 'HP'
+    assert inventory.lookup(record, 'dmi.missing.field') is None
+    assert inventory.lookup(record, 'cpu.0') is None
+
+
+def test_dynamic_inventory_groups_and_hostvars(inventory_session):
+    document = inventory.build_dynamic_inventory(
+        client(inventory_session), {},
+        group_by=['dmi.sys_vendor', 'dmi.missing'], user='admin',
+        hostname='node{cnt}')
+
+    assert document['all']['hosts'] == \
+        ['10.0.0.{}'.format(i) for i in range(1, 8)]
+    assert document['all']['children'] == [
+        'dmi_sys_vendor_Dell_Inc_', 'dmi_sys_vendor_HP',
+        'dmi_sys_vendor_Supermicro']
+    assert document['dmi_sys_vendor_HP'] == {
+        'hosts': ['10.0.0.1', '10.0.0.4', '10.0.0.7']}
+
+    hostvars = document['_meta']['hostvars']
+    assert set(hostvars) == set(document['all']['hosts'])
+    variables = hostvars['10.0.0.2']
+    assert variables['ansible_ssh_user'] == 'admin'
+    assert variables['unique_hostname'] == 'node2'
+    assert variables['dmi_sys_vendor'] == 'Dell Inc.'
+    assert 'dmi_missing' not in variables
+    assert variables['mercury_id'] == '01{:038x}'.format(2)
+
+    # group_by fields are added to the projection
+    projection = inventory_session.requests[0][2]['projection'].split(',')
+    assert 'dmi.sys_vendor' in projection
+
+
+def test_cached_inventory_is_served_until_it_expires(inventory_session,
+                                                     tmp_path):
+    cache_path = str(tmp_path)
+    first = inventory.cached_dynamic_inventory(
+        client(inventory_session), {}, cache_path, ttl=60,
+        group_by=['dmi.sys_vendor'])
+    requests = len(inventory_session.requests)
+    assert inventory.cached_dynamic_inventory(
+        client(inventory_session), {}, cache_path, ttl=60,
+        group_by=['dmi.sys_vendor']) == first
+    assert len(inventory_session.requests) == requests
+
+    # Other options are cached separately
+    inventory.cached_dynamic_inventory(client(inventory_session), {},
+                                       cache_path, ttl=60)
+    assert len(inventory_session.requests) > requests
+
+
+def test_concurrent_callers_share_one_build(inventory_records, tmp_path):
+    stub = StubInventory(inventory_records)
+
+    def slow(method, url, params, body, headers):
+        time.sleep(0.05)
+        return stub(method, url, params, body, headers)
+
+    session = StubSession(slow)
+    results = []
+
+    def worker():
+        results.append(inventory.cached_dynamic_inventory(
+            client(session), {}, str(tmp_path), ttl=60))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 4
+    assert all(result == results[0] for result in results)
+    # A single walk of the inventory, the 7 records fit one page
+    assert len(session.requests) == 1
+
+
+def test_ttl_zero_disables_the_cache(inventory_session, tmp_path):
+    for _ in range(2):
+        inventory.cached_dynamic_inventory(client(inventory_session), {},
+                                           str(tmp_path), ttl=0)
+    assert len(inventory_session.requests) == 2
+
+
+def test_one_lock_file_for_the_cache_directory(inventory_session, tmp_path):
+    for query in ({}, {'dmi.sys_vendor': 'HP'}, {'active': True}):
+        inventory.cached_dynamic_inventory(client(inventory_session), query,
+                                           str(tmp_path), ttl=60)
+    locks = [name for name in os.listdir(str(tmp_path))
+             if name.endswith('.lock')]
+    assert locks == [inventory.LOCK_NAME]
@@ -0,0 +1,134 @@
+import os
+
+import pytest
+
+from mercury_sdk.http import cache as cache_module
+from mercury_sdk.http.cache import ResponseCache
+from mercury_sdk.http.inventory import InventoryComputers
+
+from tests.conftest import StubSession
+
+
+class Clock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'time', clock.time)
+    return clock
+
+
+def age(cache, key, mtime):
+    os.utime(cache._entry_path(key), (mtime, mtime))
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    cache.put('a', {'items': []}, etag='"1"')
+    assert cache.is_fresh(cache.get('a'))
+    clock.now += 60
+    entry = cache.get('a')
+    assert not cache.is_fresh(entry)
+    assert entry['data'] == {'items': []}
+    cache.refresh('a', entry)
+    assert cache.is_fresh(cache.get('a'))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    age(cache, 'a', 100)
+    age(cache, 'b', 200)
+    # Reading a marks it as recently used, b is now the oldest
+    assert cache.get('a')['data'] == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a')['data'] == 1
+    assert cache.get('c')['data'] == 3
+
+
+def test_entries_are_evicted_beyond_max_bytes(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1024)
+    cache.put('a', 'x' * 600)
+    age(cache, 'a', 100)
+    cache.put('b', 'y' * 600)
+    assert cache.get('a') is None
+    assert cache.get('b')['data'] == 'y' * 600
+
+
+def test_corrupt_entries_are_discarded(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    with open(cache._entry_path('a'), 'w') as fp:
+        fp.write('{not json')
+    assert cache.get('a') is None
+    assert not os.path.exists(cache._entry_path('a'))
+
+
+def test_conditional_headers():
+    assert ResponseCache.conditional_headers(
+        {'etag': '"1"', 'last_modified': 'yesterday'}) == {
+        'If-None-Match': '"1"', 'If-Modified-Since': 'yesterday'}
+    assert ResponseCache.conditional_headers({}) == {}
+
+
+def test_key_ignores_method_case_and_dict_order():
+    assert ResponseCache.key('u', 'GET', {'a': 1, 'b': 2}) == \
+        ResponseCache.key('u', 'get', {'b': 2, 'a': 1})
+    assert ResponseCache.key('u', 'get', params={'limit': 1}) != \
+        ResponseCache.key('u', 'get', params={'limit': 2})
+
+
+class Revalidating(object):
+    """ Serves a record with an ETag, then 304 while the ETag matches """
+    def __init__(self):
+        self.etag = '"v1"'
+
+    def __call__(self, method, url, params, body, headers):
+        if headers.get('If-None-Match') == self.etag:
+            return 304, None, {'ETag': self.etag}
+        return 200, {'mercury_id': 'm', 'etag': self.etag}, \
+            {'ETag': self.etag}
+
+
+def test_client_revalidates_stale_entries(tmp_path, clock):
+    handler = Revalidating()
+    session = StubSession(handler)
+    client = InventoryComputers('http://mercury', session=session,
+                                cache=ResponseCache(str(tmp_path), ttl=60))
+
+    assert client.get('m') == {'mercury_id': 'm', 'etag': '"v1"'}
+    # Fresh entries are served without a request
+    assert client.get('m')['etag'] == '"v1"'
+    assert len(session.requests) == 1
+
+    clock.now += 60
+    assert client.get('m')['etag'] == '"v1"'
+    assert len(session.requests) == 2
+    assert session.requests[1][4]['If-None-Match'] == '"v1"'
+    # The 304 restarted the ttl
+    client.get('m')
+    assert len(session.requests) == 2
+
+    clock.now += 60
+    handler.etag = '"v2"'
+    assert client.get('m')['etag'] == '"v2"'
+    assert len(session.requests) == 3
+    client.get('m')
+    assert len(session.requests) == 3
+
+
+def test_client_caches_by_projection(tmp_path, clock):
+    session = StubSession(Revalidating())
+    client = InventoryComputers('http://mercury', session=session,
+                                cache=ResponseCache(str(tmp_path)))
+    client.get('m', projection=['mercury_id'])
+    client.get('m', projection=['interfaces'])
+    client.get('m', projection=['mercury_id'])
+    assert len(session.requests) == 2
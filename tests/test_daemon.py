@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+import socket
+import threading
+
+from mercury_sdk.mcli import daemon
+
+
+def test_path_options_are_made_absolute(tmp_path, monkeypatch):
+    monkeypatch.chdir(str(tmp_path))
+    namespace = daemon.absolute_paths(argparse.Namespace(
+        config_file='mcli.yml', token_cache='tokens/.tokens.json',
+        program_directory='~/.mercury-sdk', mercury_url='http://mercury'))
+    assert namespace.config_file == str(tmp_path / 'mcli.yml')
+    assert namespace.token_cache == str(tmp_path / 'tokens' / '.tokens.json')
+    assert namespace.program_directory == os.path.expanduser(
+        '~/.mercury-sdk')
+    assert namespace.mercury_url == 'http://mercury'
+
+
+def fake_agent(program_directory, messages):
+    """ Answers a single request with messages """
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(daemon.socket_path(program_directory))
+    server.listen(1)
+    requests = []
+
+    def serve():
+        connection, _ = server.accept()
+        with connection, connection.makefile('rw', encoding='utf-8') as fp:
+            requests.append(json.loads(fp.readline()))
+            for message in messages:
+                fp.write(json.dumps(message) + '\n')
+        server.close()
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    return thread, requests
+
+
+def namespace(program_directory):
+    return argparse.Namespace(config_file='mcli.yml',
+                              token_cache='.tokens.json',
+                              program_directory=program_directory)
+
+
+def test_forward_streams_output(tmp_path, capsys):
+    thread, requests = fake_agent(str(tmp_path), [{'stdout': 'hello\n'},
+                                                  {'exit': 3}])
+    assert daemon.forward(namespace(str(tmp_path))) == 3
+    thread.join()
+    assert capsys.readouterr().out == 'hello\n'
+    assert os.path.isabs(requests[0]['namespace']['token_cache'])
+
+
+def test_forward_runs_in_process_when_the_agent_cannot_prompt(tmp_path):
+    thread, _ = fake_agent(str(tmp_path), [{'local': True}])
+    assert daemon.forward(namespace(str(tmp_path))) is None
+    thread.join()
+
+
+def test_forward_without_an_agent(tmp_path):
+    assert daemon.forward(namespace(str(tmp_path))) is None
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from mercury_sdk.files import atomic_write, file_lock
+
+
+def test_atomic_write(tmp_path):
+    path = str(tmp_path / 'state.json')
+    atomic_write(path, '{"a": 1}')
+    atomic_write(path, b'{"a": 2}')
+    with open(path) as fp:
+        assert fp.read() == '{"a": 2}'
+    assert os.listdir(str(tmp_path)) == ['state.json']
+
+
+def test_failed_atomic_write_leaves_no_temporary_file(tmp_path):
+    # A directory cannot be replaced by a file
+    path = tmp_path / 'directory'
+    path.mkdir()
+    (path / 'keep').write_text('')
+    with pytest.raises(OSError):
+        atomic_write(str(path), 'content')
+    assert sorted(os.listdir(str(tmp_path))) == ['directory']
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / 'lock')
+    with file_lock(path) as locked:
+        assert locked
+        with file_lock(path, blocking=False) as other:
+            assert other is False
+    with file_lock(path, blocking=False) as other:
+        assert other is True
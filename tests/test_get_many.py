@@ -0,0 +1,101 @@
+import pytest
+import requests
+
+from mercury_sdk.http.inventory import InventoryComputers
+
+from tests.conftest import StubInventory, StubSession
+
+
+def client(session, **kwargs):
+    return InventoryComputers('http://mercury', session=session, **kwargs)
+
+
+def queried_ids(session):
+    return [body['query']['mercury_id']['$in']
+            for _, _, _, body, _ in session.requests]
+
+
+def test_get_many_keeps_input_order(inventory_session, inventory_records):
+    mercury_ids = [record['mercury_id'] for record in inventory_records]
+    mercury_ids.reverse()
+    results = client(inventory_session).get_many(mercury_ids)
+    assert [result['mercury_id'] for result in results] == mercury_ids
+    assert len(inventory_session.requests) == 1
+
+
+def test_get_many_queries_duplicates_once(inventory_session,
+                                          inventory_records):
+    first, second = [record['mercury_id'] for record in inventory_records[:2]]
+    results = client(inventory_session).get_many([first, second, first])
+    assert [result['mercury_id'] for result in results] == \
+        [first, second, first]
+    assert queried_ids(inventory_session) == [[first, second]]
+
+
+def test_get_many_chunks_by_max_items(inventory_session, inventory_records):
+    mercury_ids = [record['mercury_id'] for record in inventory_records]
+    results = client(inventory_session, max_items=3).get_many(
+        mercury_ids, concurrency=2)
+    assert [result['mercury_id'] for result in results] == mercury_ids
+    assert sorted(len(chunk) for chunk in
+                  queried_ids(inventory_session)) == [1, 3, 3]
+    assert all(params['limit'] == len(body['query']['mercury_id']['$in'])
+               for _, _, params, body, _ in inventory_session.requests)
+
+
+def test_get_many_reports_each_missing_id(inventory_session,
+                                          inventory_records):
+    known = inventory_records[0]['mercury_id']
+    results = client(inventory_session).get_many(
+        ['missing-1', known, 'missing-2'])
+    assert results[1]['mercury_id'] == known
+    assert results[0] == {'error': True, 'code': 404,
+                          'data': 'Not found: missing-1'}
+    assert results[2]['data'] == 'Not found: missing-2'
+    assert results[0] is not results[2]
+
+
+def test_get_many_adds_mercury_id_to_projection(inventory_session,
+                                                inventory_records):
+    known = inventory_records[0]['mercury_id']
+    results = client(inventory_session).get_many([known],
+                                                 projection=['dmi'])
+    assert results[0]['mercury_id'] == known
+    params = inventory_session.requests[0][2]
+    assert params['projection'] == 'dmi,mercury_id'
+
+
+def test_get_many_failed_query_is_reported_for_its_ids(inventory_records):
+    session = StubSession(
+        lambda method, url, params, body, headers: (500, {'message': 'down'}))
+    mercury_ids = [record['mercury_id'] for record in inventory_records[:2]]
+    results = client(session).get_many(mercury_ids)
+    assert all(result['error'] and result['code'] == 500
+               for result in results)
+
+
+def test_get_many_without_ids_makes_no_request(inventory_session):
+    assert client(inventory_session).get_many([]) == []
+    assert inventory_session.requests == []
+
+
+@pytest.mark.parametrize('exception, code', [
+    (requests.exceptions.ReadTimeout('stalled'), 408),
+    (requests.exceptions.ConnectionError('refused'), 503),
+])
+def test_get_many_failed_chunk_keeps_the_others(inventory_records, exception,
+                                                code):
+    stalled = inventory_records[3]['mercury_id']
+    inventory = StubInventory(inventory_records)
+
+    def handler(method, url, params, body, headers):
+        if stalled in body['query']['mercury_id']['$in']:
+            raise exception
+        return inventory(method, url, params, body, headers)
+
+    mercury_ids = [record['mercury_id'] for record in inventory_records]
+    results = client(StubSession(handler), max_items=3).get_many(mercury_ids)
+    assert [result.get('mercury_id') for result in results[:3]] == \
+        mercury_ids[:3]
+    assert [result['code'] for result in results[3:6]] == [code] * 3
+    assert results[6]['mercury_id'] == mercury_ids[6]
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from mercury_sdk.http.base import MercuryClientException
+from mercury_sdk.http.inventory import InventoryComputers
+
+from tests.conftest import StubSession
+
+
+def client(session, **kwargs):
+    return InventoryComputers('http://mercury', session=session, **kwargs)
+
+
+@pytest.mark.parametrize('prefetch', [True, False])
+def test_iter_query_follows_offset_id(inventory_session, inventory_records,
+                                      prefetch):
+    items = list(client(inventory_session).iter_query(
+        {}, page_size=3, prefetch=prefetch))
+
+    assert [item['mercury_id'] for item in items] == \
+        [record['mercury_id'] for record in inventory_records]
+    cursors = [params.get('offset_id')
+               for _, _, params, _, _ in inventory_session.requests]
+    # 7 records in pages of 3, the short third page ends the walk
+    assert cursors == [None, inventory_records[2]['_id'],
+                       inventory_records[5]['_id']]
+    assert all(params['limit'] == 3
+               for _, _, params, _, _ in inventory_session.requests)
+
+
+def test_iter_query_full_last_page_needs_an_empty_page(inventory_session):
+    items = list(client(inventory_session).iter_query({}, page_size=7))
+    assert len(items) == 7
+    assert len(inventory_session.requests) == 2
+
+
+def test_iter_query_page_size_defaults_to_max_items(inventory_session):
+    list(client(inventory_session, max_items=5).iter_query({}))
+    assert inventory_session.requests[0][2]['limit'] == 5
+
+
+def test_iter_query_prefetches_the_next_page(inventory_session):
+    items = client(inventory_session).iter_query({}, page_size=3)
+    next(items)
+    # Consuming the first item leaves the second page in flight
+    for _ in range(100):
+        if len(inventory_session.requests) == 2:
+            break
+        time.sleep(.01)
+    assert len(inventory_session.requests) == 2
+    items.close()
+
+
+def test_iter_query_raises_on_error():
+    session = StubSession(lambda *args: (500, {'message': 'boom'}))
+    with pytest.raises(MercuryClientException) as e:
+        list(client(session).iter_query({}))
+    assert e.value.error['code'] == 500
@@ -0,0 +1,77 @@
+import pytest
+
+from mercury_sdk.rpc.job import RPCException, SimpleJob
+
+
+class StubClient(object):
+    """ Serves a scripted sequence of task and status responses """
+    def __init__(self, task_responses, status_responses=None):
+        self.task_responses = list(task_responses)
+        self.status_responses = list(status_responses or [])
+
+    def post(self, data):
+        return {'job_id': 'job', 'targets': 1}
+
+    def tasks(self, job_id):
+        if len(self.task_responses) > 1:
+            return self.task_responses.pop(0)
+        return self.task_responses[0]
+
+    def status(self, job_id):
+        if len(self.status_responses) > 1:
+            return self.status_responses.pop(0)
+        return self.status_responses[0]
+
+
+def task(time_updated, time_completed):
+    return {'task_id': 'task', 'time_updated': time_updated,
+            'time_completed': time_completed}
+
+
+def started_job(client):
+    job = SimpleJob(client, {}, 'echo')
+    job.start()
+    return job
+
+
+def test_iter_tasks_yields_completion_without_time_updated_change():
+    client = StubClient(
+        [{'tasks': [task(1.0, None)]}, {'tasks': [task(1.0, 5.0)]}],
+        [{'time_completed': None}])
+    tasks = list(started_job(client).iter_tasks(poll_interval=0.001))
+    assert tasks == [task(1.0, 5.0)]
+
+
+def test_iter_tasks_yields_each_task_once():
+    client = StubClient([{'tasks': [task(1.0, None)]},
+                         {'tasks': [task(2.0, 2.0)]},
+                         {'tasks': [task(2.0, 2.0)]}],
+                        [{'time_completed': None}, {'time_completed': 3.0}])
+    job = started_job(client)
+    job.targets = 2
+    assert list(job.iter_tasks(poll_interval=0.001)) == [task(2.0, 2.0)]
+
+
+@pytest.mark.parametrize('data', [{'message': 'Job not found'},
+                                  'Job not found'])
+def test_iter_tasks_error_message(data):
+    client = StubClient([{'error': True, 'code': 404, 'data': data}])
+    with pytest.raises(RPCException) as e:
+        list(started_job(client).iter_tasks(poll_interval=0.001))
+    assert str(e.value) == 'Job not found'
+
+
+def test_join_raises_status_errors():
+    client = StubClient([], [{'error': True, 'code': 404,
+                              'data': {'message': 'Job not found'}}])
+    with pytest.raises(RPCException) as e:
+        started_job(client).join(poll_interval=0.001)
+    assert str(e.value) == 'Job not found'
+
+
+def test_iter_tasks_raises_status_errors():
+    client = StubClient([{'tasks': []}],
+                        [{'error': True, 'code': 500, 'data': 'down'}])
+    with pytest.raises(RPCException) as e:
+        list(started_job(client).iter_tasks(poll_interval=0.001))
+    assert str(e.value) == 'down'
@@ -0,0 +1,56 @@
+import pytest
+
+from mercury_sdk.mcli.auth import keystone
+
+
+def retry_of(session):
+    return session.get_adapter('https://keystone').max_retries
+
+
+@pytest.fixture
+def posted(monkeypatch):
+    posted = []
+
+    class Session(object):
+        def __init__(self, replayable):
+            self.replayable = replayable
+
+        def post(self, url, json=None, timeout=None):
+            posted.append((self.replayable, json))
+            raise keystone.requests.exceptions.ConnectionError('down')
+
+    monkeypatch.setattr(keystone, 'get_session', Session)
+    monkeypatch.setattr(keystone.getpass, 'getpass', lambda prompt='': 'pin')
+    return posted
+
+
+def test_password_sessions_retry_post():
+    retry = retry_of(keystone.get_session(replayable=True))
+    assert retry.is_retry('POST', 503)
+    assert keystone.get_session(True) is keystone.get_session(True)
+
+
+def test_one_time_passcode_sessions_only_retry_connect_errors():
+    retry = retry_of(keystone.get_session(replayable=False))
+    assert not retry.is_retry('POST', 503)
+    assert retry.connect == keystone.DEFAULT_RETRIES
+
+
+@pytest.mark.parametrize('auth_type, replayable', [
+    ('password', True), ('rax-rsa', False)])
+def test_authenticate_session_by_type(posted, auth_type, replayable):
+    configuration = {'auth': {'type': auth_type, 'username': 'user',
+                              'password': 'secret', 'url': 'http://ks'}}
+    with pytest.raises(Exception) as e:
+        keystone.authenticate(configuration)
+    assert 'Error authenticating' in str(e.value)
+    assert [r for r, _ in posted] == [replayable]
+
+
+@pytest.mark.parametrize('auth_config, expected', [
+    ({'type': 'password', 'password': 'secret'}, False),
+    ({'type': 'password'}, True),
+    ({'type': 'rax-rsa'}, True),
+])
+def test_requires_input(auth_config, expected):
+    assert keystone.requires_input({'auth': auth_config}) is expected
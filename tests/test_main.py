@@ -0,0 +1,28 @@
+import subprocess
+import sys
+
+SCRIPT = '''
+from mercury_sdk.mcli import main, operations
+main.run = lambda: operations.write_items(
+    ({{'mercury_id': i}} for i in range(100000)), fmt={!r})
+main.main()
+'''
+
+
+def run_into_head(fmt):
+    writer = subprocess.Popen([sys.executable, '-c', SCRIPT.format(fmt)],
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Read one line, then go away like head -1
+    line = writer.stdout.readline()
+    writer.stdout.close()
+    stderr = writer.stderr.read()
+    writer.wait(timeout=30)
+    return line, writer.returncode, stderr
+
+
+def test_broken_pipe_exits_quietly():
+    for fmt in ('ndjson', 'pretty'):
+        line, code, stderr = run_into_head(fmt)
+        assert line
+        assert code == 1
+        assert stderr == b''
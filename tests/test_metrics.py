@@ -0,0 +1,196 @@
+import socket
+
+import pytest
+
+from mercury_sdk.metrics.collector import Histogram, MetricsCollector
+from mercury_sdk.metrics.exporters import (StatsdHook, _format_labels,
+                                           prometheus_text)
+
+
+def request_end(**fields):
+    event = {
+        'service': '/api/inventory/computers',
+        'method': 'post',
+        'url': 'http://mercury/api/inventory/computers/query',
+        'status': 200,
+        'elapsed': .25,
+        'bytes_out': 40,
+        'bytes_in': 1200,
+        'retries': 0,
+        'error': None
+    }
+    event.update(fields)
+    return event
+
+
+def test_empty_histogram_has_no_quantiles():
+    assert Histogram().quantile(.5) is None
+
+
+def test_quantile_interpolates_within_the_bucket():
+    histogram = Histogram(buckets=(1, 2, 4))
+    for value in (.5, 1.5, 1.5, 3):
+        histogram.observe(value)
+
+    assert histogram.quantile(.5) == pytest.approx(1.5)
+    # The lower end of the first bucket is bounded by the minimum
+    assert histogram.quantile(.25) == pytest.approx(1.0)
+    # The upper end of the last populated bucket is bounded by the maximum
+    assert histogram.quantile(1) == pytest.approx(3)
+
+
+def test_quantile_in_the_inf_bucket_is_the_maximum():
+    histogram = Histogram(buckets=(1,))
+    histogram.observe(10)
+    assert histogram.quantile(.5) == 10
+
+
+def test_cumulative_counts_include_the_bound():
+    histogram = Histogram(buckets=(1, 2))
+    for value in (1, 2, 5):
+        histogram.observe(value)
+    assert list(histogram.cumulative()) == [
+        (1, 1), (2, 2), (float('inf'), 3)]
+    assert histogram.sum == 8
+    assert (histogram.min, histogram.max) == (1, 5)
+
+
+def test_collector_counts_request_events():
+    collector = MetricsCollector()
+    collector('request_start', service='/api/inventory/computers',
+              method='post', url='')
+    collector('request_end', **request_end())
+    collector('request_end', **request_end(status=None, retries=2,
+                                           error='ReadTimeout'))
+
+    labels = (('method', 'POST'), ('service', '/api/inventory/computers'))
+    assert collector.counters[
+        ('mercury_request_retries_total', labels)] == 2
+    assert collector.counters[
+        ('mercury_request_errors_total',
+         (('error', 'ReadTimeout'),) + labels)] == 1
+    assert collector.counters[
+        ('mercury_sent_bytes_total',
+         (('service', '/api/inventory/computers'),))] == 80
+    assert collector.counters[
+        ('mercury_received_bytes_total',
+         (('service', '/api/inventory/computers'),))] == 2400
+
+    # Only the request with a response is timed
+    histogram = collector.histograms[
+        ('mercury_request_seconds', labels + (('status', '200'),))]
+    assert histogram.count == 1
+
+
+def test_collector_job_events():
+    collector = MetricsCollector()
+    collector('job_submit', job_id='a', elapsed=.1, targets=2, error=None)
+    collector('job_submit', job_id=None, elapsed=.1, targets=2,
+              error='HTTPError')
+    collector('job_poll', job_id='a')
+    collector('job_poll', job_id='a')
+    collector('job_complete', job_id='a', polls=2, elapsed=3,
+              time_to_complete=None)
+
+    assert collector.counters[('mercury_job_polls_total', ())] == 2
+    assert collector.counters[('mercury_job_submit_errors_total', ())] == 1
+    assert collector.histograms[('mercury_job_submit_seconds', ())].count == 1
+    assert ('mercury_job_completion_seconds', ()) not in \
+        collector.histograms
+
+    histograms, counters = collector.summary()
+    assert ('mercury_job_wait_seconds', {}, 1, 3, 3, 3, 3.0) in histograms
+    assert ('mercury_job_polls_total', {}, 2) in counters
+
+
+def test_unknown_events_are_ignored():
+    collector = MetricsCollector()
+    collector('something_new', value=1)
+    assert collector.summary() == ([], [])
+
+
+def test_format_labels():
+    assert _format_labels({}) == ''
+    assert _format_labels({'b': 1, 'a': 'x'}) == '{a="x",b="1"}'
+    assert _format_labels({'a': 'x'}, [('le', '+Inf')]) == \
+        '{a="x",le="+Inf"}'
+    assert _format_labels({'error': 'say "hi"\\\n'}) == \
+        '{error="say \\"hi\\"\\\\\\n"}'
+
+
+def test_prometheus_text():
+    collector = MetricsCollector(buckets=(.1, 1))
+    collector('request_end', **request_end(elapsed=.05))
+    collector('request_end', **request_end(elapsed=.5))
+    collector('job_poll', job_id='a')
+
+    labels = 'method="POST",service="/api/inventory/computers",status="200"'
+    assert prometheus_text(collector).splitlines() == [
+        '# TYPE mercury_request_seconds histogram',
+        'mercury_request_seconds_bucket{%s,le="0.1"} 1' % labels,
+        'mercury_request_seconds_bucket{%s,le="1.0"} 2' % labels,
+        'mercury_request_seconds_bucket{%s,le="+Inf"} 2' % labels,
+        'mercury_request_seconds_sum{%s} 0.55' % labels,
+        'mercury_request_seconds_count{%s} 2' % labels,
+        '# TYPE mercury_job_polls_total counter',
+        'mercury_job_polls_total 1',
+        '# TYPE mercury_received_bytes_total counter',
+        'mercury_received_bytes_total'
+        '{service="/api/inventory/computers"} 2400',
+        '# TYPE mercury_sent_bytes_total counter',
+        'mercury_sent_bytes_total{service="/api/inventory/computers"} 80',
+    ]
+
+
+def test_prometheus_text_declares_each_metric_once():
+    collector = MetricsCollector()
+    collector('decode', service='/a', url='', elapsed=.01, bytes_in=1)
+    collector('decode', service='/b', url='', elapsed=.01, bytes_in=1)
+    text = prometheus_text(collector)
+    assert text.count('# TYPE mercury_decode_seconds histogram') == 1
+    assert text.endswith('\n')
+
+
+@pytest.fixture
+def statsd():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(('127.0.0.1', 0))
+    server.settimeout(5)
+    hook = StatsdHook(port=server.getsockname()[1])
+
+    def receive():
+        return server.recv(65536).decode('utf-8').splitlines()
+
+    yield hook, receive
+    hook.close()
+    server.close()
+
+
+def test_statsd_request_end(statsd):
+    hook, receive = statsd
+    hook('request_end', **request_end(retries=1, error='ReadTimeout'))
+    name = 'mercury_sdk.request.api_inventory_computers.post'
+    assert receive() == [
+        name + '.bytes_out:40|c',
+        name + '.bytes_in:1200|c',
+        name + '.200:250.000|ms',
+        name + '.retries:1|c',
+        name + '.errors.readtimeout:1|c',
+    ]
+
+
+def test_statsd_job_events(statsd):
+    hook, receive = statsd
+    hook('job_submit', job_id=None, elapsed=.1, targets=1, error='HTTPError')
+    assert receive() == ['mercury_sdk.job.submit.errors:1|c']
+    hook('job_complete', job_id='a', polls=1, elapsed=1.5,
+         time_to_complete=2)
+    assert receive() == ['mercury_sdk.job.wait:1500.000|ms',
+                         'mercury_sdk.job.completion:2000.000|ms']
+
+
+def test_statsd_send_failures_are_ignored():
+    hook = StatsdHook()
+    hook.close()
+    # Sending on a closed socket is logged, not raised
+    hook('job_poll', job_id='a')
@@ -0,0 +1,78 @@
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from mercury_sdk.rpc.job import Job, RPCException
+from mercury_sdk.rpc.monitor import JobMonitor
+
+
+class StubRPCClient(object):
+    """ Each job completes after a number of status requests """
+    def __init__(self, polls_to_complete):
+        self.polls_to_complete = dict(polls_to_complete)
+        self.polls = dict((job_id, 0) for job_id in polls_to_complete)
+
+    def status(self, job_id):
+        self.polls[job_id] += 1
+        done = self.polls[job_id] >= self.polls_to_complete[job_id]
+        return {'job_id': job_id, 'time_completed': 1.0 if done else None}
+
+
+def started(client, job_id):
+    job = Job(client, {}, {})
+    job.job_id = job_id
+    return job
+
+
+def monitor(client, **kwargs):
+    return JobMonitor([started(client, job_id)
+                       for job_id in client.polls_to_complete],
+                      poll_interval=0.001, max_interval=0.01, **kwargs)
+
+
+def test_as_completed_yields_in_completion_order():
+    client = StubRPCClient({'slow': 3, 'fast': 1, 'medium': 2})
+    m = monitor(client)
+    assert [job.job_id for job in m.as_completed()] == \
+        ['fast', 'medium', 'slow']
+    assert set(m.statuses) == {'slow', 'fast', 'medium'}
+    assert len(m) == 0
+    # Completed jobs are not polled again
+    assert client.polls == {'slow': 3, 'fast': 1, 'medium': 2}
+
+
+def test_as_completed_timeout_leaves_jobs_pending():
+    client = StubRPCClient({'done': 1, 'never': float('inf')})
+    m = monitor(client)
+    completed = []
+    with pytest.raises(TimeoutError):
+        for job in m.as_completed(timeout=0.05):
+            completed.append(job.job_id)
+    assert completed == ['done']
+    assert list(m.pending) == ['never']
+
+
+def test_batch_status_makes_one_request_per_round():
+    client = StubRPCClient({'a': 2, 'b': 2})
+    calls = []
+
+    def batch_status(job_ids):
+        calls.append(list(job_ids))
+        return dict((job_id, client.status(job_id)) for job_id in job_ids)
+
+    assert len(monitor(client, batch_status=batch_status).wait()) == 2
+    assert calls == [['a', 'b'], ['a', 'b']]
+
+
+def test_errors_are_polled_again():
+    client = StubRPCClient({'a': 1})
+    responses = [{'error': True, 'code': 503}]
+    status = client.status
+    client.status = lambda job_id: responses.pop() if responses \
+        else status(job_id)
+    assert [job.job_id for job in monitor(client).wait()] == ['a']
+
+
+def test_unstarted_jobs_are_refused():
+    with pytest.raises(RPCException):
+        JobMonitor([Job(None, {}, {})])
@@ -0,0 +1,29 @@
+from importlib import metadata
+
+import pytest
+
+from mercury_sdk.mcli import output
+
+
+@pytest.fixture(autouse=True)
+def program_version(monkeypatch):
+    monkeypatch.setattr(output, '_program_version', None)
+
+
+def test_installed_version_is_preferred(monkeypatch, tmp_path):
+    version_file = tmp_path / 'VERSION'
+    version_file.write_text('0.0.1\n')
+    monkeypatch.setattr(output, 'VERSION_FILE', str(version_file))
+    monkeypatch.setattr(metadata, 'version', lambda name: '1.2.3')
+    assert output.get_program_version() == '1.2.3'
+
+
+def test_version_file_is_used_when_not_installed(monkeypatch, tmp_path):
+    def version(name):
+        raise metadata.PackageNotFoundError(name)
+
+    version_file = tmp_path / 'VERSION'
+    version_file.write_text('0.0.1\n')
+    monkeypatch.setattr(output, 'VERSION_FILE', str(version_file))
+    monkeypatch.setattr(metadata, 'version', version)
+    assert output.get_program_version() == '0.0.1'
@@ -0,0 +1,115 @@
+import threading
+
+import pytest
+
+from mercury_sdk.rpc.job import RPCException, SimpleJob
+from mercury_sdk.rpc.rollout import (FAILED, SUCCEEDED, TIMED_OUT, Rollout,
+                                     RolloutHalted)
+
+
+class StubRPCClient(object):
+    """ In memory jobs endpoint. Jobs complete on the first status request,
+    failing for devices in failing and never completing for devices in
+    hanging.
+    """
+    def __init__(self, failing=(), hanging=()):
+        self.failing = set(failing)
+        self.hanging = set(hanging)
+        self.submitted = []
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def post(self, data):
+        mercury_id = data['query']['mercury_id']
+        with self._lock:
+            job_id = 'job-{}'.format(len(self.submitted))
+            self.submitted.append(mercury_id)
+            self.jobs[job_id] = mercury_id
+        return {'job_id': job_id, 'targets': 1}
+
+    def status(self, job_id):
+        mercury_id = self.jobs[job_id]
+        if mercury_id in self.hanging:
+            return {'job_id': job_id, 'time_completed': None}
+        return {'job_id': job_id, 'time_completed': 1.0,
+                'has_failures': mercury_id in self.failing}
+
+
+def make_job(rpc_client, mercury_id):
+    return SimpleJob(rpc_client, {'mercury_id': mercury_id}, 'press')
+
+
+def rollout(client, targets, **kwargs):
+    kwargs.setdefault('poll_interval', 0.001)
+    kwargs.setdefault('max_interval', 0.01)
+    return Rollout(client, targets, make_job, **kwargs)
+
+
+TARGETS = ['device-{}'.format(i) for i in range(10)]
+
+
+def test_waves():
+    client = StubRPCClient()
+    events = []
+    r = rollout(client, TARGETS, wave_size=4,
+                progress=lambda state, mercury_id, entry: events.append(
+                    (state, mercury_id)))
+    assert [len(wave) for wave in r.waves()] == [4, 4, 2]
+    assert r.run() == 0
+    assert sorted(client.submitted) == sorted(TARGETS)
+    assert r.summary()[SUCCEEDED] == 10
+    # Every device of a wave completes before the next wave starts
+    completed = [mercury_id for state, mercury_id in events
+                 if state == SUCCEEDED]
+    assert set(completed[:4]) == set(TARGETS[:4])
+    assert set(completed[4:8]) == set(TARGETS[4:8])
+
+
+def test_halts_on_failure_rate(tmp_path):
+    state_file = str(tmp_path / 'state.json')
+    client = StubRPCClient(failing=TARGETS[4:6])
+    r = rollout(client, TARGETS, wave_size=4, max_failure_rate=0.2,
+                state_file=state_file, fingerprint='press')
+    with pytest.raises(RolloutHalted) as e:
+        r.run()
+    assert (e.value.failed, e.value.attempted) == (2, 8)
+    assert r.summary() == {'pending': 2, 'running': 0, SUCCEEDED: 6,
+                           FAILED: 2, TIMED_OUT: 0}
+
+    # Resuming skips the devices which succeeded and retries the failures
+    client.failing.clear()
+    client.submitted = []
+    resumed = rollout(client, TARGETS, wave_size=4, state_file=state_file,
+                      fingerprint='press')
+    assert resumed.run() == 0
+    assert sorted(client.submitted) == sorted(TARGETS[4:6] + TARGETS[8:])
+    assert resumed.summary()[SUCCEEDED] == 10
+
+
+def test_timed_out_devices_are_not_pressed_twice(tmp_path):
+    state_file = str(tmp_path / 'state.json')
+    client = StubRPCClient(hanging=TARGETS[:1])
+    r = rollout(client, TARGETS[:3], wave_size=3, timeout=0.05,
+                max_failure_rate=0.5, state_file=state_file,
+                fingerprint='press')
+    r.run()
+    assert r.devices[TARGETS[0]]['state'] == TIMED_OUT
+    assert r.failed == 1
+
+    client.hanging.clear()
+    client.submitted = []
+    resumed = rollout(client, TARGETS[:3], wave_size=3,
+                      state_file=state_file, fingerprint='press')
+    assert resumed.pending == []
+    resumed.run()
+    assert client.submitted == []
+    assert resumed.devices[TARGETS[0]]['state'] == SUCCEEDED
+
+
+def test_refuses_state_of_another_rollout(tmp_path):
+    state_file = str(tmp_path / 'state.json')
+    rollout(StubRPCClient(), TARGETS[:2], state_file=state_file,
+            fingerprint='press').run()
+    with pytest.raises(RPCException):
+        rollout(StubRPCClient(), TARGETS[:2], state_file=state_file,
+                fingerprint='other')
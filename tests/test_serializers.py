@@ -0,0 +1,67 @@
+import pytest
+
+from mercury_sdk.http import serializers
+from mercury_sdk.http.serializers import (JSONSerializer, ORJSONSerializer,
+                                          Truncated, get_serializer)
+
+
+class Custom(object):
+    @staticmethod
+    def dumps(data):
+        return repr(data)
+
+    @staticmethod
+    def loads(data):
+        return data
+
+
+def test_get_serializer_defaults_to_the_stdlib():
+    assert get_serializer() is JSONSerializer
+    assert get_serializer('json') is JSONSerializer
+
+
+def test_get_serializer_accepts_objects():
+    assert get_serializer(Custom) is Custom
+
+
+def test_get_serializer_rejects_unknown_names():
+    with pytest.raises(ValueError):
+        get_serializer('yaml')
+
+
+def test_auto_falls_back_to_the_stdlib(monkeypatch):
+    monkeypatch.setattr(serializers, 'orjson', None)
+    assert get_serializer('auto') is JSONSerializer
+    with pytest.raises(ValueError):
+        get_serializer('orjson')
+
+
+def test_orjson():
+    pytest.importorskip('orjson')
+    assert get_serializer('auto') is ORJSONSerializer
+    serializer = get_serializer('orjson')
+    assert serializer.loads(serializer.dumps({'a': [1, 'b']})) == \
+        {'a': [1, 'b']}
+
+
+@pytest.mark.parametrize('payload', ['x' * 10, b'x' * 10])
+def test_truncated_short_payloads_are_unchanged(payload):
+    assert str(Truncated(payload, limit=10)) == 'x' * 10
+
+
+@pytest.mark.parametrize('payload', ['x' * 25, b'x' * 25,
+                                     bytearray(b'x' * 25)])
+def test_truncated_caps_long_payloads(payload):
+    assert str(Truncated(payload, limit=10)) == \
+        'xxxxxxxxxx... (15 bytes truncated)'
+
+
+def test_truncated_formats_other_objects():
+    assert str(Truncated({'a': 1}, limit=3)) == \
+        "{'a... (5 bytes truncated)"
+    assert str(Truncated(None)) == 'None'
+
+
+def test_truncated_replaces_split_characters():
+    text = str(Truncated('é'.encode('utf-8') * 2, limit=3))
+    assert text.startswith('é�')
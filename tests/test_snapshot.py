@@ -0,0 +1,108 @@
+import copy
+
+import pytest
+
+from mercury_sdk.http.inventory import InventoryComputers
+from mercury_sdk.inventory.snapshot import (FieldChange, InventorySnapshot,
+                                            SnapshotDiff, diff_records,
+                                            record_hash)
+
+
+def test_diff_records_uses_dotted_paths():
+    old = {'dmi': {'sys_vendor': 'HP'}, 'cpu': [{'cores': 4}, {'cores': 4}]}
+    new = {'dmi': {'sys_vendor': 'Dell Inc.'},
+           'cpu': [{'cores': 4}, {'cores': 8}]}
+    assert diff_records(old, new) == [
+        FieldChange('cpu.1.cores', 4, 8),
+        FieldChange('dmi.sys_vendor', 'HP', 'Dell Inc.')]
+
+
+def test_diff_records_missing_values_are_none():
+    assert diff_records({'a': 1}, {'b': 2}) == [FieldChange('a', 1, None),
+                                                FieldChange('b', None, 2)]
+
+
+def test_diff_records_compares_resized_lists_whole():
+    assert diff_records({'disks': [1]}, {'disks': [1, 2]}) == [
+        FieldChange('disks', [1], [1, 2])]
+
+
+def test_diff_records_ignores_volatile_fields_at_the_top_level():
+    old = {'_id': 1, 'time_updated': 1, 'nested': {'time_updated': 1}}
+    new = {'_id': 2, 'time_updated': 2, 'nested': {'time_updated': 2}}
+    assert diff_records(old, new) == [
+        FieldChange('nested.time_updated', 1, 2)]
+    assert record_hash({'_id': 1, 'time_updated': 1, 'a': 1}) == \
+        record_hash({'a': 1, '_id': 2, 'time_updated': 2})
+
+
+def test_snapshot_diff():
+    assert not SnapshotDiff()
+    diff = SnapshotDiff(added={'b': {}, 'a': {}},
+                        changed={'c': [FieldChange('x', 1, 2)]})
+    assert diff
+    assert diff.to_dict() == {
+        'added': ['a', 'b'],
+        'removed': [],
+        'changed': {'c': [{'path': 'x', 'old': 1, 'new': 2}]}}
+
+
+@pytest.fixture
+def snapshot(inventory_session):
+    return InventorySnapshot(
+        InventoryComputers('http://mercury', session=inventory_session))
+
+
+def test_first_refresh_adds_every_record(snapshot, inventory_records):
+    diff = snapshot.refresh()
+    assert sorted(diff.added) == sorted(
+        record['mercury_id'] for record in inventory_records)
+    assert len(snapshot) == len(inventory_records)
+
+
+def test_refresh_fetches_only_updated_records(snapshot, inventory_session,
+                                              inventory_records):
+    snapshot.refresh()
+    changed, touched, removed = inventory_records[:3]
+    changed['dmi']['sys_vendor'] = 'Lenovo'
+    changed['time_updated'] += 10
+    # A new time_updated without a change in content is not reported
+    touched['time_updated'] += 10
+    inventory_records.remove(removed)
+    added = copy.deepcopy(inventory_records[-1])
+    added['_id'] = '{:024x}'.format(100)
+    added['mercury_id'] = 'new'
+    inventory_records.append(added)
+    del inventory_session.requests[:]
+
+    diff = snapshot.refresh()
+
+    assert list(diff.added) == ['new']
+    assert list(diff.removed) == [removed['mercury_id']]
+    assert diff.changed == {changed['mercury_id']: [
+        FieldChange('dmi.sys_vendor', 'HP', 'Lenovo')]}
+    fetched = [body['query']['mercury_id']['$in']
+               for _, _, _, body, _ in inventory_session.requests
+               if 'mercury_id' in body['query']]
+    assert sorted(fetched[0]) == sorted(
+        ['new', changed['mercury_id'], touched['mercury_id']])
+    assert snapshot.get(changed['mercury_id'])['dmi']['sys_vendor'] == \
+        'Lenovo'
+    assert removed['mercury_id'] not in snapshot
+
+
+def test_snapshot_is_saved_and_loaded(inventory_session, tmp_path):
+    client = InventoryComputers('http://mercury', session=inventory_session)
+    path = str(tmp_path / 'snapshot.json')
+    snapshot = InventorySnapshot(client, path=path)
+    snapshot.refresh()
+    snapshot.save()
+
+    assert InventorySnapshot(client, path=path).records == snapshot.records
+    # A snapshot of another query is discarded
+    assert len(InventorySnapshot(client, query={'a': 1}, path=path)) == 0
+
+
+def test_save_without_a_path_raises(snapshot):
+    with pytest.raises(ValueError):
+        snapshot.save()
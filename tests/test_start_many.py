@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from mercury_sdk.aio.job import AsyncJob
+from mercury_sdk.aio.job import start_many as async_start_many
+from mercury_sdk.http.rpc import JobInterfaceBase
+from mercury_sdk.rpc.job import Job, RPCException, SubmissionError, start_many
+
+from tests.conftest import StubSession
+
+
+class Submissions(object):
+    """ The jobs endpoint, queries naming a device in failing are refused.
+    Tracks the number of submissions in flight.
+    """
+    def __init__(self, failing=(), delay=0.01):
+        self.failing = failing
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, method, url, params, body, headers):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        mercury_id = body['query']['mercury_id']
+        if mercury_id in self.failing:
+            return 500, {'message': 'Could not start {}'.format(mercury_id)}
+        return 200, {'job_id': 'job-{}'.format(mercury_id), 'targets': 1}
+
+
+def submissions(count):
+    return [({'mercury_id': str(i)}, {'method': 'echo'})
+            for i in range(count)]
+
+
+def client(handler):
+    return JobInterfaceBase('http://mercury', session=StubSession(handler))
+
+
+def test_submit_many_keeps_order_and_bounds_concurrency():
+    handler = Submissions()
+    jobs = client(handler).submit_many(submissions(10), concurrency=3)
+    assert [job.job_id for job in jobs] == \
+        ['job-{}'.format(i) for i in range(10)]
+    assert all(job.targets == 1 for job in jobs)
+    assert handler.max_in_flight <= 3
+
+
+def test_submit_many_attempts_every_job():
+    handler = Submissions(failing=('1', '3'))
+    with pytest.raises(SubmissionError) as e:
+        client(handler).submit_many(submissions(5))
+    error = e.value
+    assert len(error.jobs) == 5
+    assert [job.query['mercury_id'] for job in error.started] == \
+        ['0', '2', '4']
+    assert [job.query['mercury_id'] for job, _ in error.failures] == \
+        ['1', '3']
+    assert str(error).startswith('2 of 5 jobs could not be started')
+
+
+def test_start_many_leaves_started_jobs_alone():
+    handler = Submissions()
+    rpc_client = client(handler)
+    jobs = [Job(rpc_client, {'mercury_id': str(i)}, {}) for i in range(2)]
+    jobs[0].job_id = 'existing'
+    start_many(jobs)
+    assert [job.job_id for job in jobs] == ['existing', 'job-1']
+    assert len(rpc_client.session.requests) == 1
+
+
+def test_start_many_bulk_submit():
+    batches = []
+
+    def bulk_submit(payloads):
+        batches.append(payloads)
+        return [{'error': True, 'code': 400, 'data': 'Bad query'}
+                if payload['query']['mercury_id'] == '1' else
+                {'job_id': 'job-{}'.format(payload['query']['mercury_id']),
+                 'targets': 2} for payload in payloads]
+
+    jobs = [Job(None, {'mercury_id': str(i)}, {'method': 'echo'})
+            for i in range(3)]
+    with pytest.raises(SubmissionError) as e:
+        start_many(jobs, bulk_submit=bulk_submit)
+    assert len(batches) == 1
+    assert batches[0][2] == {'query': {'mercury_id': '2'},
+                             'instruction': {'method': 'echo'}}
+    assert [job.job_id for job in jobs] == ['job-0', None, 'job-2']
+    assert e.value.failures[0][0] is jobs[1]
+    assert isinstance(e.value.failures[0][1], RPCException)
+
+
+class AsyncJobs(object):
+    def __init__(self, failing=()):
+        self.failing = failing
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def post(self, data, timeout=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        mercury_id = data['query']['mercury_id']
+        if mercury_id in self.failing:
+            raise RPCException('Could not start {}'.format(mercury_id))
+        return {'job_id': 'job-{}'.format(mercury_id), 'targets': 1}
+
+
+def test_async_start_many():
+    rpc_client = AsyncJobs(failing=('2',))
+    jobs = [AsyncJob(rpc_client, {'mercury_id': str(i)}, {})
+            for i in range(6)]
+    with pytest.raises(SubmissionError) as e:
+        asyncio.run(async_start_many(jobs, concurrency=2))
+    assert [job.job_id for job in e.value.started] == \
+        ['job-0', 'job-1', 'job-3', 'job-4', 'job-5']
+    assert e.value.failures[0][0] is jobs[2]
+    assert rpc_client.max_in_flight <= 2
+
+
+def test_start_many_jobs_without_a_bulk_response_fail():
+    jobs = [Job(None, {'mercury_id': str(i)}, {}) for i in range(3)]
+    with pytest.raises(SubmissionError) as e:
+        start_many(jobs, bulk_submit=lambda payloads: [
+            {'job_id': 'job-0', 'targets': 1}])
+    assert [job.started for job in jobs] == [True, False, False]
+    assert [job for job, _ in e.value.failures] == jobs[1:]
+    assert e.value.started == jobs[:1]
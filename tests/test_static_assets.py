@@ -0,0 +1,124 @@
+import os
+
+import pytest
+
+from mercury_sdk.mcli.deploy import static_assets
+
+
+class TemplateSyntaxError(Exception):
+    def __init__(self, message, lineno):
+        super(TemplateSyntaxError, self).__init__(message)
+        self.message = message
+        self.lineno = lineno
+
+
+class StubJinja2(object):
+    """ Counts parses, templates containing {% bad %} are invalid """
+    TemplateSyntaxError = TemplateSyntaxError
+
+    def __init__(self):
+        self.parsed = 0
+
+    def Environment(self):
+        return self
+
+    def parse(self, template_data):
+        self.parsed += 1
+        if '{% bad %}' in template_data:
+            raise TemplateSyntaxError("Encountered unknown tag 'bad'", 2)
+
+
+@pytest.fixture(autouse=True)
+def templates(monkeypatch):
+    templates = {}
+    monkeypatch.setattr(static_assets, '_templates', templates)
+    return templates
+
+
+@pytest.fixture
+def jinja2(monkeypatch):
+    jinja2 = StubJinja2()
+    monkeypatch.setattr(static_assets, 'jinja2', jinja2)
+    return jinja2
+
+
+@pytest.fixture
+def template(tmp_path):
+    path = tmp_path / 'template.j2'
+    path.write_text('hostname {{ hostname }}\nip {{ ip }}\n')
+    return str(path)
+
+
+def test_chunk_assets_keeps_order_and_size():
+    assets = dict(('m{}'.format(i), {'ip': i}) for i in range(7))
+    chunks = static_assets.chunk_assets(assets, 3)
+    assert [list(chunk) for chunk in chunks] == [
+        ['m0', 'm1', 'm2'], ['m3', 'm4', 'm5'], ['m6']]
+    assert chunks[2]['m6'] == {'ip': 6}
+
+
+@pytest.mark.parametrize('chunk_size, expected', [
+    (10, 1), (0, 3), ('2', 2)])
+def test_chunk_assets_sizes(chunk_size, expected):
+    assets = {'a': 1, 'b': 2, 'c': 3}
+    assert len(static_assets.chunk_assets(assets, chunk_size)) == expected
+
+
+def test_chunk_assets_of_nothing():
+    assert static_assets.chunk_assets({}) == []
+
+
+def test_load_template(template, jinja2):
+    digest, lines = static_assets.load_template(template)
+    assert lines == ['hostname {{ hostname }}', 'ip {{ ip }}']
+    with open(template) as fp:
+        assert digest == static_assets.template_digest(fp.read())
+
+
+def test_templates_are_parsed_once_per_process(template, jinja2):
+    first = static_assets.load_template(template)
+    assert static_assets.load_template(template) == first
+    assert jinja2.parsed == 1
+
+
+def test_valid_templates_are_remembered_on_disk(template, jinja2, tmp_path,
+                                                templates):
+    cache_path = str(tmp_path / 'cache')
+    digest, _ = static_assets.load_template(template, cache_path)
+    assert os.path.exists(os.path.join(cache_path, digest))
+
+    # Another process finds the marker and does not parse again
+    templates.clear()
+    static_assets.load_template(template, cache_path)
+    assert jinja2.parsed == 1
+
+
+def test_changed_templates_are_parsed_again(template, jinja2, tmp_path):
+    cache_path = str(tmp_path / 'cache')
+    static_assets.load_template(template, cache_path)
+    with open(template, 'a') as fp:
+        fp.write('gateway {{ gateway }}\n')
+    _, lines = static_assets.load_template(template, cache_path)
+    assert lines[-1] == 'gateway {{ gateway }}'
+    assert jinja2.parsed == 2
+
+
+def test_invalid_templates_raise_and_are_not_remembered(tmp_path, jinja2,
+                                                        templates):
+    path = tmp_path / 'invalid.j2'
+    path.write_text('line\n{% bad %}\n')
+    cache_path = str(tmp_path / 'cache')
+    with pytest.raises(ValueError) as e:
+        static_assets.load_template(str(path), cache_path)
+    assert str(e.value) == "line 2: Encountered unknown tag 'bad'"
+    assert not templates
+    assert not os.path.exists(cache_path)
+
+
+def test_without_jinja2_templates_are_not_validated(template, tmp_path,
+                                                    monkeypatch):
+    monkeypatch.setattr(static_assets, 'jinja2', None)
+    cache_path = str(tmp_path / 'cache')
+    digest, _ = static_assets.load_template(template, cache_path)
+    # Nothing was validated, so nothing is recorded as valid
+    assert not os.path.exists(os.path.join(cache_path, digest))
@@ -0,0 +1,61 @@
+import pytest
+
+from mercury_sdk.rpc.task import Task, TaskSet
+
+from tests.conftest import load_resource
+
+
+@pytest.fixture
+def tasks_response():
+    return load_resource('tasks.json')
+
+
+@pytest.mark.parametrize('lazy', [True, False])
+def test_task_is_immutable(tasks_response, lazy):
+    task = Task.from_dict(tasks_response['tasks'][0], lazy=lazy)
+    with pytest.raises(AttributeError):
+        task.status = 'ERROR'
+    with pytest.raises(AttributeError):
+        del task.status
+    with pytest.raises(AttributeError):
+        task.extra = 1
+    assert task.status == 'SUCCESS'
+
+
+def test_task_lazy_fields_resolve_on_access(tasks_response):
+    record = tasks_response['tasks'][2]
+    task = Task.from_dict(record, lazy=True)
+    assert task.traceback == 'Traceback ...'
+    assert task.to_dict() == record
+
+
+def test_task_requires_every_key(tasks_response):
+    record = dict(tasks_response['tasks'][0])
+    del record['message']
+    with pytest.raises(ValueError):
+        Task(**record)
+    # Lazy tasks only require the eagerly loaded keys
+    assert Task.from_dict(record, lazy=True).message is None
+
+
+def test_task_set_filter(tasks_response):
+    task_set = TaskSet.from_response(tasks_response)
+    assert len(task_set) == 4
+    assert task_set.filter(status='SUCCESS').column('task_id') == \
+        ['task-0', 'task-1']
+    assert task_set.filter(returncode=0).column('task_id') == ['task-0']
+    assert task_set.filter(status=['ERROR', 'DISPATCHED']).column(
+        'task_id') == ['task-2', 'task-3']
+    assert task_set.filter(completed=False).column('task_id') == ['task-3']
+    assert task_set.filter(status='SUCCESS', returncode=(1, 2)).column(
+        'task_id') == ['task-1']
+
+
+def test_task_set_filters_chain_and_share_records(tasks_response):
+    task_set = TaskSet.from_response(tasks_response)
+    completed = task_set.filter(completed=True)
+    failed = completed.filter(status='ERROR')
+    assert len(completed) == 3
+    assert [record['task_id'] for record in failed] == ['task-2']
+    assert failed.tasks()[0].task_id == 'task-2'
+    assert next(iter(failed)) is tasks_response['tasks'][2]
@@ -0,0 +1,168 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from urllib3.exceptions import MaxRetryError, ReadTimeoutError
+
+from mercury_sdk.http.base import (MIN_TIMEOUT, MercuryClientException,
+                                   RequestTimeout, bound_timeout, is_timeout)
+from mercury_sdk.http.rpc import JobInterfaceBase
+from mercury_sdk.rpc.job import JobCancelled, JobTimeout, SimpleJob
+from mercury_sdk.rpc.monitor import JobMonitor
+
+from tests.conftest import StubSession
+
+
+class RecordingSession(StubSession):
+    """ Records the timeout of every request """
+    def __init__(self, handler):
+        super(RecordingSession, self).__init__(handler)
+        self.timeouts = []
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                verify=True, timeout=None):
+        self.timeouts.append(timeout)
+        return super(RecordingSession, self).request(
+            method, url, params=params, data=data, headers=headers,
+            verify=verify, timeout=timeout)
+
+
+class Jobs(object):
+    """ The jobs endpoint, jobs never complete unless listed in completed """
+    def __init__(self, completed=(), stall=None):
+        self.completed = completed
+        self.stall = stall
+
+    def __call__(self, method, url, params, body, headers):
+        if method == 'post':
+            return 200, {'job_id': 'job', 'targets': 1}
+        if self.stall:
+            raise self.stall
+        if url.endswith('/status'):
+            return 200, {'job_id': 'job', 'time_completed':
+                         5.0 if 'job' in self.completed else None}
+        return 200, {'tasks': [{'task_id': 'task', 'time_updated': 1.0,
+                                'time_completed': None}]}
+
+
+def started_job(handler, **kwargs):
+    session = RecordingSession(handler)
+    client = JobInterfaceBase('http://mercury', session=session, **kwargs)
+    job = SimpleJob(client, {}, 'echo')
+    job.start()
+    return job, session
+
+
+def test_bound_timeout():
+    assert bound_timeout(None, 5) == 5
+    assert bound_timeout(10, 5) == 5
+    assert bound_timeout(3, 5) == 3
+    assert bound_timeout((10, 60), 5) == (5, 5)
+    assert bound_timeout((1, None), 5) == (1, 5)
+    assert bound_timeout(10, -1) == MIN_TIMEOUT
+
+
+def test_is_timeout():
+    assert is_timeout(requests.exceptions.ReadTimeout())
+    assert is_timeout(requests.exceptions.ConnectTimeout())
+    exhausted = MaxRetryError(None, '/', reason=ReadTimeoutError(
+        None, '/', 'read timed out'))
+    assert is_timeout(requests.exceptions.ConnectionError(exhausted))
+    assert not is_timeout(requests.exceptions.ConnectionError('refused'))
+
+
+def test_request_timeout_carries_408():
+    def stalled(method, url, params, body, headers):
+        raise requests.exceptions.ReadTimeout('read timed out')
+
+    client = JobInterfaceBase('http://mercury',
+                              session=RecordingSession(stalled))
+    with pytest.raises(RequestTimeout) as e:
+        client.status('job')
+    assert isinstance(e.value, MercuryClientException)
+    assert e.value.error['code'] == 408
+
+
+def test_per_call_timeout_overrides_the_client_timeout():
+    job, session = started_job(Jobs(completed=('job',)), timeout=(1, 2))
+    job.rpc_client.status('job')
+    job.rpc_client.status('job', timeout=5)
+    assert session.timeouts == [(1, 2), (1, 2), 5]
+
+
+def test_join_returns_none_at_the_deadline():
+    job, session = started_job(Jobs(), retries=2)
+    started = time.time()
+    assert job.join(timeout=0.3, poll_interval=0.01) is None
+    assert time.time() - started < 1
+    # Each status request is bounded by the time left, split over attempts
+    assert all(max(timeout) <= 0.3 / 3 + 0.01
+               for timeout in session.timeouts[1:])
+
+
+def test_join_raise_timeout_keeps_the_last_status():
+    job, _ = started_job(Jobs())
+    with pytest.raises(JobTimeout) as e:
+        job.join(timeout=0.1, poll_interval=0.01, raise_timeout=True)
+    assert e.value.job_id == 'job'
+    assert e.value.status['time_completed'] is None
+
+
+def test_join_raises_request_timeouts_before_the_deadline():
+    job, _ = started_job(Jobs(stall=requests.exceptions.ReadTimeout()))
+    with pytest.raises(RequestTimeout):
+        job.join(timeout=30, poll_interval=0.01)
+
+
+def test_join_completes():
+    job, _ = started_job(Jobs(completed=('job',)))
+    assert job.join(timeout=1)['time_completed'] == 5.0
+
+
+def test_iter_tasks_stops_at_the_deadline():
+    job, _ = started_job(Jobs())
+    assert list(job.iter_tasks(timeout=0.1, poll_interval=0.01)) == []
+    with pytest.raises(JobTimeout):
+        list(job.iter_tasks(timeout=0.1, poll_interval=0.01,
+                            raise_timeout=True))
+
+
+def test_cancel_wakes_join():
+    job, _ = started_job(Jobs())
+    errors = []
+
+    def join():
+        try:
+            job.join(poll_interval=10)
+        except JobCancelled as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=join)
+    thread.start()
+    time.sleep(0.05)
+    started = time.time()
+    job.cancel()
+    thread.join(5)
+    assert time.time() - started < 1
+    assert job.cancelled
+    assert errors and errors[0].job_id == 'job'
+
+
+def test_join_async_is_cancelled():
+    job, _ = started_job(Jobs())
+    future = job.join_async(poll_interval=10)
+    job.cancel()
+    with pytest.raises(JobCancelled):
+        future.result(5)
+
+
+def test_monitor_cancel_stops_as_completed():
+    job, _ = started_job(Jobs())
+    monitor = JobMonitor([job], poll_interval=10)
+    threading.Timer(0.05, monitor.cancel).start()
+    started = time.time()
+    assert monitor.wait() == []
+    assert time.time() - started < 1
+    assert 'job' in monitor.pending
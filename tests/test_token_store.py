@@ -0,0 +1,179 @@
+import threading
+import time
+
+from datetime import datetime, timezone
+
+import pytest
+
+from mercury_sdk.mcli.auth import auth
+from mercury_sdk.mcli.auth.store import TokenStore, get_token_store
+
+URL = 'http://mercury'
+OTHER_URL = 'http://other'
+
+
+def expires_at(seconds):
+    return datetime.fromtimestamp(time.time() + seconds, timezone.utc) \
+        .strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def token(name, seconds):
+    return {'token': name, 'expires_at': expires_at(seconds)}
+
+
+class StubHandler(object):
+    def __init__(self, delay=0, error=None, prompts=False):
+        self.delay = delay
+        self.error = error
+        self.prompts = prompts
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def authenticate(self, configuration):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return token('token-{}'.format(calls), 3600)
+
+    def requires_input(self, configuration):
+        return self.prompts
+
+
+@pytest.fixture
+def token_path(tmp_path):
+    return str(tmp_path / 'tokens.json')
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    handler = StubHandler()
+    monkeypatch.setattr(auth, 'get_auth_handler', lambda name: handler)
+    return handler
+
+
+def configuration(**kwargs):
+    return dict({'mercury_url': URL, 'auth_handler': 'stub'}, **kwargs)
+
+
+def test_tokens_are_stored_per_url(token_path):
+    store = TokenStore(token_path)
+    stored = store.put(URL, token('a', 3600))
+    store.put(OTHER_URL, token('b', 3600))
+    assert store.get(URL) == stored
+    assert store.get(URL)['expires'] == pytest.approx(time.time() + 3600,
+                                                      abs=2)
+    assert store.get(OTHER_URL)['token'] == 'b'
+    store.delete(OTHER_URL)
+    assert store.get(OTHER_URL) is None
+    # Another instance reads the same document
+    assert TokenStore(token_path).get(URL)['token'] == 'a'
+
+
+def test_changes_by_other_processes_are_read(token_path):
+    store = TokenStore(token_path)
+    store.put(URL, token('a', 3600))
+    TokenStore(token_path).put(URL, token('b', 7200))
+    assert store.get(URL)['token'] == 'b'
+
+
+def test_put_prunes_expired_tokens_of_other_urls(token_path):
+    store = TokenStore(token_path)
+    store.put(OTHER_URL, token('old', -10))
+    store.put('http://third', token('current', 3600))
+    store.put(URL, token('expired', -10))
+    assert store.get(OTHER_URL) is None
+    assert store.get('http://third')['token'] == 'current'
+    assert store.get(URL)['token'] == 'expired'
+
+
+def test_needs_refresh_within_margin(token_path):
+    store = TokenStore(token_path, refresh_margin=300)
+    due = store.put(URL, token('a', 100))
+    assert store.is_valid(due)
+    assert store.needs_refresh(due)
+    current = store.put(URL, token('a', 3600))
+    assert not store.needs_refresh(current)
+    expired = store.put(URL, token('a', -10))
+    assert not store.is_valid(expired)
+    assert store.needs_refresh(None) and not store.is_valid(None)
+
+
+def test_lock_is_exclusive(token_path):
+    store = TokenStore(token_path)
+    with store.lock() as locked:
+        assert locked
+        with TokenStore(token_path).lock(blocking=False) as other:
+            assert other is False
+    with TokenStore(token_path).lock(blocking=False) as other:
+        assert other is True
+
+
+def test_get_token_authenticates_once_for_concurrent_callers(token_path,
+                                                            handler):
+    handler.delay = 0.2
+    results = []
+
+    def worker():
+        results.append(auth.get_token(configuration(), token_path))
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert handler.calls == 1
+    assert [result['token'] for result in results] == ['token-1'] * 5
+    assert get_token_store(token_path).get(URL)['token'] == 'token-1'
+
+
+def test_get_token_serves_current_tokens(token_path, handler):
+    get_token_store(token_path).put(URL, token('current', 3600))
+    assert auth.get_token(configuration(), token_path)['token'] == 'current'
+    assert handler.calls == 0
+
+
+def test_get_token_renews_tokens_due_for_refresh(token_path, handler):
+    get_token_store(token_path).put(URL, token('due', 60))
+    assert auth.get_token(configuration(), token_path)['token'] == 'token-1'
+    assert get_token_store(token_path).get(URL)['token'] == 'token-1'
+
+
+def test_failed_renewal_keeps_the_valid_token(token_path, handler):
+    handler.error = RuntimeError('auth is down')
+    get_token_store(token_path).put(URL, token('due', 60))
+    assert auth.get_token(configuration(), token_path)['token'] == 'due'
+
+
+def test_failed_authentication_without_a_valid_token_raises(token_path,
+                                                           handler):
+    handler.error = RuntimeError('auth is down')
+    with pytest.raises(RuntimeError):
+        auth.get_token(configuration(), token_path)
+
+
+def test_no_store_does_not_write(token_path, handler):
+    token_data = auth.get_token(configuration(no_store=True), token_path)
+    assert token_data['token'] == 'token-1'
+    assert get_token_store(token_path).get(URL) is None
+
+
+def test_prompting_handlers_renew_at_expiry(token_path, handler):
+    handler.prompts = True
+    get_token_store(token_path).put(URL, token('due', 60))
+    assert auth.get_token(configuration(), token_path)['token'] == 'due'
+    assert handler.calls == 0
+
+    get_token_store(token_path).put(URL, token('expired', -10))
+    assert auth.get_token(configuration(), token_path)['token'] == 'token-1'
+
+
+def test_token_requires_input(token_path, handler):
+    assert not auth.token_requires_input(configuration(), token_path)
+    handler.prompts = True
+    assert auth.token_requires_input(configuration(), token_path)
+    get_token_store(token_path).put(URL, token('due', 60))
+    assert not auth.token_requires_input(configuration(), token_path)